@@ -2,7 +2,25 @@
 Multi-Agent System for Intelligent Data Room
 """
 
-from .planner_agent import PlannerAgent
-from .executor_agent import ExecutorAgent
+import importlib
 
-__all__ = ['PlannerAgent', 'ExecutorAgent']
+from .sandbox import SandboxExecutor
+from .fast_path import FastPathEngine
+from .llm_client import GeminiClient, CircuitOpenError
+
+# The agents import pandas and google-genai; load them on first access
+_LAZY_EXPORTS = {
+    'PlannerAgent': '.planner_agent',
+    'ExecutorAgent': '.executor_agent',
+}
+
+__all__ = ['PlannerAgent', 'ExecutorAgent', 'SandboxExecutor', 'FastPathEngine',
+           'GeminiClient', 'CircuitOpenError']
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,15 +4,207 @@ Executes the plan using PandasAI and generates code/results.
 """
 
 import pandas as pd
-from google import genai
 from google.genai import types
-from typing import Dict, Optional, Any
+from types import CodeType
+from typing import Dict, Optional, Any, Tuple
+import builtins
+import functools
 import json
+import os
 import re
 import io
 import sys
+import time
 import traceback
 
+from utils.code_store import CodeStore
+from utils.compiled_code_cache import CompiledCodeCache
+from utils.dataset_store import DatasetStore
+from utils.figure_compactor import FigureCompactor
+from utils.lazy import Lazy
+from utils.metrics import metrics
+from utils.prompt_builder import PromptBuilder
+from utils.query_engine import QueryEngine
+from utils.relationships import join_tables
+from utils.result_store import ResultStore
+from .llm_client import GeminiClient
+from .planner_agent import REQUIRED_PLAN_KEYS
+from .sandbox import SandboxExecutor
+
+
+def build_namespace_template() -> Dict:
+    """
+    Import the libraries generated code commonly uses.
+    Every execution namespace starts as a copy of this template, so code that
+    uses np or px, or imports them again, does not pay for loading them.
+    
+    Returns:
+        Mapping of names bound in every execution namespace
+    """
+    import datetime
+    import math
+    import numpy as np
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    return {
+        '__builtins__': builtins,
+        'pd': pd,
+        'np': np,
+        'px': px,
+        'go': go,
+        'math': math,
+        'datetime': datetime
+    }
+
+
+# Built once per process; the sandbox's fork server preloads the modules
+NAMESPACE_TEMPLATE = Lazy(build_namespace_template)
+
+
+def build_execution_namespace(namespace_template: Dict, inputs: Dict) -> Dict:
+    """
+    Build the namespace generated code runs in.
+    
+    Args:
+        namespace_template: Pre-imported names from build_namespace_template
+        inputs: Data from ExecutorAgent._execution_inputs; frames given as
+            paths are memory-mapped from the dataset store
+            
+    Returns:
+        Namespace with df (or the query engine's names), the other tables and join()
+    """
+    # Copy-on-Write (always on in pandas 3) makes a shallow copy of a shared
+    # frame safe to hand out: writes copy only the columns they touch
+    def frame(source):
+        if isinstance(source, str):
+            return DatasetStore.read(source)
+        return source.copy(deep=False)
+        
+    # Start from the pre-imported libraries and add a lazy copy of the
+    # dataframe, or the query engine's names for a dataset out of core
+    namespace = {
+        **namespace_template,
+        'result': None,
+        'fig': None
+    }
+    if inputs["query"] is not None:
+        engine, path = inputs["query"]
+        namespace.update(engine.bind(path))
+    else:
+        namespace['df'] = frame(inputs["df"])
+        
+    # Other tables are only merged when the code asks for them
+    if inputs["tables"] is not None:
+        tables = {name: frame(source) for name, source in inputs["tables"].items()}
+        namespace['tables'] = tables
+        namespace['join'] = functools.partial(join_tables, tables, inputs["relationships"])
+        
+    return namespace
+
+
+def prepare_sandboxed_code(
+    code: str, 
+    inputs: Dict, 
+    result_store: Optional[ResultStore], 
+    figure_compactor: Optional[FigureCompactor]
+) -> Tuple:
+    """
+    Sandbox prepare step: compile the code and load its data in the child.
+    
+    Returns:
+        Arguments for run_compiled_code
+    """
+    namespace = build_execution_namespace(NAMESPACE_TEMPLATE.get(), inputs)
+    return compile(code, '<string>', 'exec'), namespace, result_store, figure_compactor
+
+
+def run_compiled_code(
+    compiled: CodeType, 
+    namespace: Dict, 
+    result_store: Optional[ResultStore] = None, 
+    figure_compactor: Optional[FigureCompactor] = None
+) -> Dict:
+    """
+    Execute compiled generated code and convert its result and figure to JSON.
+    
+    Args:
+        compiled: Compiled generated code
+        namespace: Namespace from build_execution_namespace
+        result_store: Optional store that pages large table results
+        figure_compactor: Optional compactor that downsamples large figures
+        
+    Returns:
+        Dict with execution results
+    """
+    try:
+        # Execute the code
+        stage_start = time.perf_counter()
+        exec(compiled, namespace)
+        timings = {"exec": time.perf_counter() - stage_start}
+        
+        # Extract results
+        result = namespace.get('result')
+        fig = namespace.get('fig')
+        
+        # Convert result to JSON-serializable format; large tables are
+        # stored and only their first page is returned
+        stage_start = time.perf_counter()
+        result_info = None
+        if (isinstance(result, pd.Series) and result_store is not None
+                and len(result) > result_store.page_rows):
+            result = result.to_frame(name=result.name if result.name is not None else 'value')
+            
+        if isinstance(result, pd.DataFrame):
+            if result_store is not None:
+                paged = result_store.paginate(result)
+                result, result_info = paged["result"], paged["result_info"]
+            else:
+                result = result.to_dict('records')
+        elif isinstance(result, pd.Series):
+            result = result.to_dict()
+        elif hasattr(result, 'to_dict'):
+            result = result.to_dict()
+        timings["serialize"] = time.perf_counter() - stage_start
+        
+        # Convert plotly figure to JSON if present, downsampling oversized traces
+        visualization = None
+        visualization_info = None
+        if fig is not None:
+            stage_start = time.perf_counter()
+            try:
+                if figure_compactor is not None:
+                    visualization, visualization_info = figure_compactor.to_json(fig)
+                else:
+                    visualization = fig.to_json()
+            except:
+                visualization = None
+            timings["figure_json"] = time.perf_counter() - stage_start
+            
+        return {
+            "status": "success",
+            "result": result,
+            "result_info": result_info,
+            "visualization": visualization,
+            "visualization_info": visualization_info,
+            "timings": timings
+        }
+        
+    except Exception as e:
+        return execution_error(e)
+
+
+def execution_error(error: Exception) -> Dict:
+    """
+    Build the result of generated code that raised.
+    The type names errors such as MemoryError whose message is empty.
+    """
+    return {
+        "status": "error",
+        "error": f"{type(error).__name__}: {error}",
+        "traceback": traceback.format_exc()
+    }
+
 
 class ExecutorAgent:
     """
@@ -20,58 +212,354 @@ class ExecutorAgent:
     It generates Python code, executes it safely, and returns results.
     """
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self, 
+        api_key: str, 
+        code_store: Optional[CodeStore] = None, 
+        sandbox: Optional[SandboxExecutor] = None, 
+        prompt_builder: Optional[PromptBuilder] = None, 
+        llm_client: Optional[GeminiClient] = None, 
+        result_store: Optional[ResultStore] = None, 
+        figure_compactor: Optional[FigureCompactor] = None, 
+        compiled_code_cache: Optional[CompiledCodeCache] = None, 
+        query_engine: Optional[QueryEngine] = None
+    ):
         """
         Initialize the Executor Agent with Google Gemini API.
         
         Args:
             api_key: Google Gemini API key
+            code_store: Optional store of previously generated working code
+            sandbox: Optional sandbox that runs generated code in a child process
+            prompt_builder: Builder fitting the data context into the prompt budget
+            llm_client: Shared Gemini client; one is created from api_key if omitted
+            result_store: Optional store that pages large table results
+            figure_compactor: Optional compactor that downsamples large figures
+            compiled_code_cache: Optional cache of compiled code shared across sessions
+            query_engine: Optional engine for datasets queried out of core
         """
-        self.client = genai.Client(api_key=api_key)
+        self.client = llm_client or GeminiClient(api_key=api_key)
         self.model_name = 'gemini-flash-latest'
         self.current_df: Optional[pd.DataFrame] = None
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.related_tables: Optional[Dict] = None
+        self.query_dataset: Optional[Dict] = None
+        self.stored_paths: Dict = {"df": None, "tables": {}}
+        self.code_store = code_store
+        self.sandbox = sandbox
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.result_store = result_store
+        self.figure_compactor = figure_compactor
+        self.compiled_code_cache = compiled_code_cache
+        self.query_engine = query_engine
+        self.run_id = f"executor-{id(self)}"
         
-    def load_data(self, dataframe: pd.DataFrame):
+    def load_data(
+        self, 
+        dataframe: pd.DataFrame, 
+        tables: Optional[Dict[str, pd.DataFrame]] = None, 
+        related_tables: Optional[Dict] = None, 
+        query_dataset: Optional[Dict] = None, 
+        stored_paths: Optional[Dict] = None
+    ):
         """
         Load the dataframe for execution.
+        The frames are shared with the DataManager, not copied.
         
         Args:
             dataframe: Pandas DataFrame to work with
+            tables: Every table of a multi-table dataset by name, from DataManager.get_tables
+            related_tables: Other tables and relationships, from DataManager.get_related_tables
+            query_dataset: Dataset queried out of core, from DataManager.get_query_dataset;
+                generated code then targets the query engine instead of df
+            stored_paths: Dataset store files holding the frames, from
+                DataManager.get_stored_paths; sandbox children memory-map
+                these instead of receiving the frames pickled
         """
-        self.current_df = dataframe.copy()
+        self.current_df = dataframe
+        self.tables = tables or {}
+        self.related_tables = related_tables
+        self.query_dataset = query_dataset if self.query_engine is not None else None
+        self.stored_paths = stored_paths or {"df": None, "tables": {}}
         
-    def execute_plan(self, plan: Dict, user_question: str) -> Dict:
+    def execute_plan(
+        self, 
+        plan: Dict, 
+        user_question: str, 
+        data_schema: Optional[Dict] = None
+    ) -> Dict:
         """
         Execute the plan created by the Planner Agent.
         
         Args:
             plan: Execution plan from Planner Agent
             user_question: Original user question
+            data_schema: Schema from DataManager.get_schema, used to reuse stored code
             
         Returns:
             Dict containing execution results, code, and any visualizations
         """
         
-        if self.current_df is None:
+        if self.current_df is None and self.query_dataset is None:
             return {
                 "status": "error",
                 "error": "No data loaded. Please upload a CSV file first."
             }
+            
+        store_key, stored_result = self.run_stored_code(plan, data_schema)
+        if stored_result:
+            return stored_result
+            
+        code_response = self.generate_code(plan, user_question)
+        if code_response["status"] == "error":
+            return code_response
+            
+        return self.run_code(
+            code_response["code"], 
+            code_response["explanation"], 
+            plan, 
+            store_key
+        )
+        
+    def run_stored_code(
+        self, 
+        plan: Dict, 
+        data_schema: Optional[Dict] = None
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Re-run stored code for a structurally identical plan on the same schema.
+        
+        Args:
+            plan: Execution plan from Planner Agent
+            data_schema: Schema from DataManager.get_schema
+            
+        Returns:
+            Tuple of (store key, execution result or None on a miss)
+        """
+        if self.code_store is None or not data_schema:
+            return None, None
+            
+        # Code written for joins only fits the same set of tables
+        if self.related_tables:
+            data_schema = {
+                **data_schema,
+                **{
+                    f"{name}.{col}": dtype
+                    for name, table in self.related_tables["tables"].items()
+                    for col, dtype in table["schema"].items()
+                }
+            }
+            
+        store_key = self.code_store.make_key(data_schema, plan)
+        stored = self.code_store.get(store_key)
+        
+        if not stored:
+            return store_key, None
+            
+        execution_result = self._execute_code(stored["code"])
+        
+        if execution_result["status"] != "success":
+            # Stored code no longer works on this data
+            self.code_store.evict(store_key)
+            return store_key, None
+            
+        return store_key, {
+            "status": "success",
+            "result": execution_result["result"],
+            "result_info": execution_result.get("result_info"),
+            "visualization": execution_result.get("visualization"),
+            "visualization_info": execution_result.get("visualization_info"),
+            "code": stored["code"],
+            "explanation": stored["explanation"],
+            "plan_used": plan,
+            "code_cached": True
+        }
+        
+    def generate_code(self, plan: Dict, user_question: str) -> Dict:
+        """
+        Ask Gemini for code that carries out the plan.
+        
+        Args:
+            plan: Execution plan from Planner Agent
+            user_question: Original user question
+            
+        Returns:
+            Dict with the generated code and explanation
+        """
+        try:
+            # Generate the code using Gemini
+            response = self.client.generate(
+                model=self.model_name,
+                contents=self._build_prompt(plan, user_question)
+            )
+            return self._parse_code_response(response.text)
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"Execution error: {str(e)}",
+                "traceback": traceback.format_exc()
+            }
+            
+    async def agenerate_code(self, plan: Dict, user_question: str) -> Dict:
+        """
+        Async variant of generate_code using the async Gemini client.
+        
+        Args:
+            plan: Execution plan from Planner Agent
+            user_question: Original user question
+            
+        Returns:
+            Dict with the generated code and explanation
+        """
+        try:
+            response = await self.client.agenerate(
+                model=self.model_name,
+                contents=self._build_prompt(plan, user_question)
+            )
+            return self._parse_code_response(response.text)
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"Execution error: {str(e)}",
+                "traceback": traceback.format_exc()
+            }
+            
+    def plan_and_generate_code(
+        self, 
+        user_question: str, 
+        data_schema: Dict, 
+        conversation_context: str = ""
+    ) -> Dict:
+        """
+        Ask Gemini for the plan and the code in a single call.
+        
+        Args:
+            user_question: The user's natural language question
+            data_schema: Schema information about the uploaded dataset
+            conversation_context: Summaries of relevant previous turns
+            
+        Returns:
+            Dict with the plan, code and explanation, or an error if the
+            response failed validation and the two-agent flow should be used
+        """
+        try:
+            response = self.client.generate(
+                model=self.model_name,
+                contents=self._build_plan_and_code_prompt(user_question, data_schema, conversation_context),
+                config=types.GenerateContentConfig(response_mime_type='application/json')
+            )
+            return self._parse_plan_and_code_response(response.text, user_question)
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"Plan and code error: {str(e)}"
+            }
+            
+    async def aplan_and_generate_code(
+        self, 
+        user_question: str, 
+        data_schema: Dict, 
+        conversation_context: str = ""
+    ) -> Dict:
+        """
+        Async variant of plan_and_generate_code using the async Gemini client.
+        
+        Args:
+            user_question: The user's natural language question
+            data_schema: Schema information about the uploaded dataset
+            conversation_context: Summaries of relevant previous turns
+            
+        Returns:
+            Dict with the plan, code and explanation, or an error if the
+            response failed validation and the two-agent flow should be used
+        """
+        try:
+            response = await self.client.agenerate(
+                model=self.model_name,
+                contents=self._build_plan_and_code_prompt(user_question, data_schema, conversation_context),
+                config=types.GenerateContentConfig(response_mime_type='application/json')
+            )
+            return self._parse_plan_and_code_response(response.text, user_question)
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"Plan and code error: {str(e)}"
+            }
+            
+    def run_code(
+        self, 
+        code: str, 
+        explanation: str, 
+        plan: Dict, 
+        store_key: Optional[str] = None
+    ) -> Dict:
+        """
+        Execute generated code and remember it in the code store if it works.
+        
+        Args:
+            code: Generated Python code
+            explanation: Model explanation of the code
+            plan: Execution plan from Planner Agent
+            store_key: Code store key from run_stored_code, if any
+            
+        Returns:
+            Dict containing execution results, code, and any visualizations
+        """
+        execution_result = self._execute_code(code)
+        
+        if execution_result["status"] == "success":
+            if store_key is not None:
+                self.code_store.put(store_key, code, explanation)
+                
+            return {
+                "status": "success",
+                "result": execution_result["result"],
+                "result_info": execution_result.get("result_info"),
+                "visualization": execution_result.get("visualization"),
+                "visualization_info": execution_result.get("visualization_info"),
+                "code": code,
+                "explanation": explanation,
+                "plan_used": plan,
+                "code_cached": False
+            }
+        else:
+            return {
+                "status": "error",
+                "error": execution_result.get("error", "Execution failed"),
+                "code": code,
+                "explanation": explanation
+            }
+            
+    def _build_prompt(self, plan: Dict, user_question: str) -> str:
+        """
+        Build the code generation prompt.
         
-        # Get data info for context
-        data_info = self._get_data_info()
+        Args:
+            plan: Execution plan from Planner Agent
+            user_question: Original user question
+            
+        Returns:
+            Prompt text for the model
+        """
+        # Rank columns by the question and the plan steps, which name the columns used
+        compact_plan = self.prompt_builder.compact_plan(plan)
+        relevance_text = f"{user_question} {' '.join(map(str, compact_plan.get('steps', [])))}"
         
         # Build the execution prompt
         prompt = f"""Write Python code to answer the question.
 
-Plan: {json.dumps(plan)}
+Plan: {json.dumps(compact_plan)}
 Question: {user_question}
-Data: {data_info}
-Preview:
-{self.current_df.head(3).to_string()}
+Data: {self._get_data_info(relevance_text)}
+Preview (CSV):
+{self.prompt_builder.encode_preview(self._preview_frame(), relevance_text)}
 
 Requirements:
-- df is loaded dataframe
+- {self._code_requirements()}
 - Assign answer to variable 'result'
 - For visualization, assign plotly figure to 'fig'
 - Code must start at column 0
@@ -82,64 +570,138 @@ Return JSON:
     "explanation": "brief explanation",
     "returns_visualization": true/false
 }}"""
+        return self.prompt_builder.record("executor", prompt)
+        
+    def _build_plan_and_code_prompt(
+        self, 
+        user_question: str, 
+        data_schema: Dict, 
+        conversation_context: str = ""
+    ) -> str:
+        """
+        Build the prompt asking for the plan and the code together.
+        
+        Args:
+            user_question: The user's natural language question
+            data_schema: Schema information about the uploaded dataset
+            conversation_context: Summaries of relevant previous turns
+            
+        Returns:
+            Prompt text for the model
+        """
+        # Same turn summaries as the Planner Agent uses
+        context = f"Previous turns:\n{conversation_context}\n\n" if conversation_context else ""
+        
+        prompt = f"""Plan how to answer the question, then write Python code for the plan.
 
+{context}Question: {user_question}
+Data: {self._get_data_info(user_question, data_schema)}
+Preview (CSV):
+{self.prompt_builder.encode_preview(self._preview_frame(), user_question)}
+
+Code requirements:
+- {self._code_requirements()}
+- Assign answer to variable 'result'
+- For visualization, assign plotly figure to 'fig'
+- Code must start at column 0
+
+Return JSON only:
+{{
+    "plan": {{
+        "question_analysis": "what user wants",
+        "requires_visualization": true/false,
+        "visualization_type": "bar/line/pie/scatter/none",
+        "steps": ["step 1", "step 2"],
+        "data_operations": ["operation"],
+        "expected_output": "output description",
+        "reasoning": "why this plan"
+    }},
+    "code": "python code here",
+    "explanation": "brief explanation",
+    "returns_visualization": true/false
+}}"""
+        return self.prompt_builder.record("plan_and_code", prompt)
+        
+    def _parse_plan_and_code_response(self, response_text: str, user_question: str) -> Dict:
+        """
+        Parse and validate a combined plan and code response.
+        
+        Args:
+            response_text: Raw text returned by the model
+            user_question: The user's natural language question
+            
+        Returns:
+            Dict with the plan, code and explanation, or an error describing
+            why validation failed
+        """
+        code_response = self._parse_code_response(response_text)
+        if code_response["status"] == "error":
+            return code_response
+            
+        plan = code_response.pop("plan")
+        if not isinstance(plan, dict) or not all(key in plan for key in REQUIRED_PLAN_KEYS):
+            return {
+                "status": "error",
+                "error": "Combined response is missing a valid plan"
+            }
+            
+        if not code_response["code"].strip():
+            return {
+                "status": "error",
+                "error": "Combined response is missing code"
+            }
+            
         try:
-            # Generate the code using Gemini
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
-            response_text = response.text.strip()
+            self._compile(code_response["code"])
+        except SyntaxError as se:
+            return {
+                "status": "error",
+                "error": f"Syntax error in generated code: {str(se)}"
+            }
+            
+        plan["status"] = "success"
+        plan["original_question"] = user_question
+        
+        return {**code_response, "plan": plan}
+        
+    def _parse_code_response(self, response_text: str) -> Dict:
+        """
+        Parse the model's code response.
+        
+        Args:
+            response_text: Raw text returned by the model
             
-            # Extract JSON from potential markdown code blocks
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
+        Returns:
+            Dict with the cleaned code and explanation
+        """
+        response_text = response_text.strip()
+        
+        # Extract JSON from potential markdown code blocks
+        if "```json" in response_text:
+            response_text = response_text.split("```json")[1].split("```")[0].strip()
+        elif "```" in response_text:
+            response_text = response_text.split("```")[1].split("```")[0].strip()
             
+        try:
             # Parse the JSON response
             code_response = json.loads(response_text)
-            generated_code = code_response.get("code", "")
-            explanation = code_response.get("explanation", "")
-            returns_viz = code_response.get("returns_visualization", False)
-            
-            # Clean the code (remove markdown code blocks if present)
-            generated_code = self._clean_code(generated_code)
-            
-            # Execute the generated code
-            execution_result = self._execute_code(generated_code)
-            
-            if execution_result["status"] == "success":
-                return {
-                    "status": "success",
-                    "result": execution_result["result"],
-                    "visualization": execution_result.get("visualization"),
-                    "code": generated_code,
-                    "explanation": explanation,
-                    "plan_used": plan
-                }
-            else:
-                return {
-                    "status": "error",
-                    "error": execution_result.get("error", "Execution failed"),
-                    "code": generated_code,
-                    "explanation": explanation
-                }
-                
         except json.JSONDecodeError as e:
             return {
                 "status": "error",
                 "error": f"Failed to parse code response: {str(e)}",
-                "raw_response": response_text if 'response_text' in locals() else ""
+                "raw_response": response_text
             }
+            
+        return {
+            "status": "success",
+            # Clean the code (remove markdown code blocks if present)
+            "code": self._clean_code(code_response.get("code", "")),
+            "explanation": code_response.get("explanation", ""),
+            "returns_visualization": code_response.get("returns_visualization", False),
+            # Only present in combined plan and code responses
+            "plan": code_response.get("plan")
+        }
         
-        except Exception as e:
-            return {
-                "status": "error",
-                "error": f"Execution error: {str(e)}",
-                "traceback": traceback.format_exc()
-            }
-    
     def _clean_code(self, code: str) -> str:
         """
         Clean the generated code by removing markdown formatting.
@@ -155,21 +717,32 @@ Return JSON:
             code = code.split("```python")[1].split("```")[0].strip()
         elif "```" in code:
             code = code.split("```")[1].split("```")[0].strip()
-        
+            
         # Remove any leading/trailing whitespace from each line but preserve structure
         lines = code.split('\n')
         cleaned_lines = []
         for line in lines:
             # Keep the line as is, just remove trailing whitespace
             cleaned_lines.append(line.rstrip())
-        
+            
         code = '\n'.join(cleaned_lines)
         
         return code
-    
+        
+    def cancel(self) -> bool:
+        """
+        Cancel code currently running in the sandbox for this agent.
+        
+        Returns:
+            True if a run was cancelled
+        """
+        if self.sandbox is None:
+            return False
+        return self.sandbox.cancel(self.run_id)
+        
     def _execute_code(self, code: str) -> Dict:
         """
-        Safely execute the generated Python code.
+        Safely execute the generated Python code, in the sandbox if one is configured.
         
         Args:
             code: Python code to execute
@@ -177,73 +750,151 @@ Return JSON:
         Returns:
             Dict with execution results
         """
+        stage_start = time.perf_counter()
         try:
-            # Create a namespace with necessary imports and the dataframe
-            namespace = {
-                'df': self.current_df.copy(),
-                'pd': pd,
-                'result': None,
-                'fig': None
+            compiled = self._compile(code)
+        except SyntaxError as se:
+            return {
+                "status": "error",
+                "error": f"Syntax error in generated code: {str(se)}",
+                "traceback": traceback.format_exc(),
+                "code": code
             }
+        metrics.record_stage("compile", time.perf_counter() - stage_start)
+        
+        start = time.perf_counter()
+        
+        if self.sandbox is not None and self.sandbox.available:
+            # The child compiles the code again and loads the data itself;
+            # only the source and references to the data are pickled
+            execution_result = self.sandbox.run(
+                run_compiled_code, 
+                code, 
+                self._execution_inputs(stored=True), 
+                self.result_store, 
+                self.figure_compactor, 
+                run_id=self.run_id, 
+                prepare=prepare_sandboxed_code
+            )
+        else:
+            execution_result = self._execute_code_in_process(compiled)
             
-            # Try to compile first to catch syntax errors early
-            try:
-                compile(code, '<string>', 'exec')
-            except SyntaxError as se:
-                return {
-                    "status": "error",
-                    "error": f"Syntax error in generated code: {str(se)}",
-                    "traceback": traceback.format_exc(),
-                    "code": code
-                }
-            
-            # Execute the code
-            exec(code, namespace)
+        # Stage timings are measured where the code ran, which may be a sandbox child
+        stage_timings = execution_result.pop("timings", {})
+        for stage, seconds in stage_timings.items():
+            metrics.record_stage(stage, seconds)
+        if self.sandbox is not None and self.sandbox.available and stage_timings:
+            metrics.record_stage("sandbox_overhead", time.perf_counter() - start - sum(stage_timings.values()))
             
-            # Extract results
-            result = namespace.get('result')
-            fig = namespace.get('fig')
+        return execution_result
+        
+    def _compile(self, code: str) -> CodeType:
+        """
+        Compile generated code, reusing the shared cache if one is configured.
+        
+        Args:
+            code: Python code to compile
             
-            # Convert result to JSON-serializable format
-            if isinstance(result, pd.DataFrame):
-                result = result.to_dict('records')
-            elif isinstance(result, pd.Series):
-                result = result.to_dict()
-            elif hasattr(result, 'to_dict'):
-                result = result.to_dict()
-            
-            # Convert plotly figure to JSON if present
-            visualization = None
-            if fig is not None:
-                try:
-                    visualization = fig.to_json()
-                except:
-                    visualization = None
+        Returns:
+            Compiled code object
             
-            return {
-                "status": "success",
-                "result": result,
-                "visualization": visualization
-            }
+        Raises:
+            SyntaxError: If the code does not compile
+        """
+        if self.compiled_code_cache is not None:
+            return self.compiled_code_cache.compile(code)
+        return compile(code, '<string>', 'exec')
+        
+    def _execute_code_in_process(self, compiled: CodeType) -> Dict:
+        """
+        Execute compiled generated code in the current process.
+        
+        Args:
+            compiled: Code object from _compile
             
+        Returns:
+            Dict with execution results
+        """
+        try:
+            namespace = build_execution_namespace(NAMESPACE_TEMPLATE.get(), self._execution_inputs())
         except Exception as e:
-            return {
-                "status": "error",
-                "error": str(e),
-                "traceback": traceback.format_exc()
+            return execution_error(e)
+            
+        return run_compiled_code(compiled, namespace, self.result_store, self.figure_compactor)
+        
+    def _execution_inputs(self, stored: bool = False) -> Dict:
+        """
+        Collect the data generated code runs against.
+        
+        Args:
+            stored: Refer to frames kept in the dataset store by path, so a
+                sandbox child memory-maps them instead of unpickling them
+                
+        Returns:
+            Dict with "df", "tables", "relationships" and "query" (the engine
+            and Parquet path of a dataset queried out of core)
+        """
+        paths = self.stored_paths if stored else {"df": None, "tables": {}}
+        inputs = {"df": None, "tables": None, "relationships": None, "query": None}
+        
+        def source(path: Optional[str], frame: pd.DataFrame):
+            # An append in another worker may have removed a superseded version
+            return path if path is not None and os.path.exists(path) else frame
+            
+        if self.query_dataset is not None:
+            inputs["query"] = (self.query_engine, self.query_dataset["path"])
+        else:
+            inputs["df"] = source(paths["df"], self.current_df)
+            
+        if self.related_tables:
+            inputs["tables"] = {
+                name: source(paths["tables"].get(name), table)
+                for name, table in self.tables.items()
             }
-    
-    def _get_data_info(self) -> str:
+            inputs["relationships"] = self.related_tables["relationships"]
+            
+        return inputs
+        
+    def _preview_frame(self) -> Optional[pd.DataFrame]:
+        """
+        Get the rows shown in prompt previews: the first rows of a dataset
+        queried out of core, or the dataframe.
+        """
+        if self.query_dataset is not None:
+            return self.query_dataset["preview"]
+        return self.current_df
+        
+    def _code_requirements(self) -> str:
+        """
+        Get the prompt line telling the model what the data is, in the active engine's dialect.
+        """
+        if self.query_dataset is not None:
+            return self.query_engine.code_requirements
+        return "df is loaded dataframe; pd, np, px and go are imported"
+        
+    def _get_data_info(self, question: str = "", data_schema: Optional[Dict] = None) -> str:
         """
         Get information about the current dataframe.
         
+        Args:
+            question: Text used to pick which columns to describe in full
+            data_schema: Schema from DataManager.get_schema, read from the dataframe if omitted
+            
         Returns:
             String description of the dataframe
         """
+        if self.query_dataset is not None:
+            schema = data_schema or self.query_dataset["schema"]
+            columns = self.prompt_builder.encode_schema(schema, question)
+            return f"Shape: {self.query_dataset['rows']} rows x {len(schema)} cols\nColumns by type: {columns}"
+            
         if self.current_df is None:
             return "No data"
+            
+        schema = data_schema or {col: str(dtype) for col, dtype in self.current_df.dtypes.items()}
+        columns = self.prompt_builder.encode_schema(schema, question)
         
-        cols = ', '.join(self.current_df.columns.tolist())
-        types = ', '.join([f"{c}: {str(d)}" for c, d in self.current_df.dtypes.items()])
-        
-        return f"Shape: {self.current_df.shape[0]} rows x {self.current_df.shape[1]} cols\nColumns: {cols}\nTypes: {types}"
+        info = f"Shape: {self.current_df.shape[0]} rows x {self.current_df.shape[1]} cols\nColumns by type: {columns}"
+        if self.related_tables:
+            info += "\n" + self.prompt_builder.encode_tables(self.related_tables, question)
+        return info
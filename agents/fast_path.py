@@ -0,0 +1,436 @@
+"""
+Fast Path: answers common aggregation questions without calling the LLM
+"""
+
+from typing import Dict, List, Optional, Tuple
+import re
+import threading
+
+
+AGGREGATIONS = {
+    "total": "sum", "sum": "sum", "sum of": "sum",
+    "average": "mean", "avg": "mean", "mean": "mean",
+    "median": "median",
+    "maximum": "max", "max": "max", "highest": "max", "largest": "max",
+    "minimum": "min", "min": "min", "lowest": "min", "smallest": "min",
+    "count": "count", "number of": "count"
+}
+
+AGGREGATION_LABELS = {
+    "sum": "Total", "mean": "Average", "median": "Median",
+    "max": "Maximum", "min": "Minimum", "count": "Count"
+}
+
+# Leading phrases that carry no meaning for the query
+FILLER_PATTERN = re.compile(
+    r"^(please |can you |could you )?"
+    r"(what is |what's |what are |show me |show |give me |get |calculate |compute |"
+    r"find |list |display |tell me )?(the )?"
+)
+
+CHART_PATTERN = re.compile(
+    r"^(create |make |draw |plot |show |visualize |visualise )?(a |an )?"
+    r"(?:(bar|line|pie|horizontal bar) )?(chart|plot|graph)( of| showing| for)? (the )?"
+)
+
+# Words that signal analysis the fast path cannot express
+COMPLEX_WORDS = {
+    "correlation", "correlate", "trend", "trends", "compare", "comparison",
+    "why", "predict", "forecast", "growth", "percentage", "percent", "ratio",
+    "distribution", "over time", "change", "changed", "versus", "vs", "and"
+}
+
+GROUP_SEPARATORS = r"(?:by|per|for each|for every|across|in each)"
+
+# Nouns that count rows rather than values of a column
+ROW_NOUNS = r"(?:rows|records|entries|lines)"
+
+
+class FastPathEngine:
+    """
+    Deterministic intent matcher for simple aggregation questions.
+    Recognizes group-by/aggregate, top-k, filter and count questions using
+    the column names from the data schema and compiles them straight to
+    vectorized pandas code. Questions it cannot map with high confidence are
+    left to the Planner and Executor agents.
+    """
+    
+    def __init__(self, min_confidence: float = 0.8):
+        """
+        Initialize the Fast Path Engine.
+        
+        Args:
+            min_confidence: Confidence below which questions fall back to the agents
+        """
+        self.min_confidence = min_confidence
+        self.lookups = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        
+    def match(self, user_question: str, data_schema: Dict) -> Optional[Dict]:
+        """
+        Try to answer a question on the fast path.
+        
+        Args:
+            user_question: The user's natural language question
+            data_schema: Mapping of column names to dtype strings
+            
+        Returns:
+            Dict with plan, code, explanation and confidence, or None if the
+            question should go to the agents
+        """
+        with self._lock:
+            self.lookups += 1
+            
+        compiled = self._compile(user_question, data_schema)
+        if compiled is None or compiled["confidence"] < self.min_confidence:
+            return None
+            
+        with self._lock:
+            self.hits += 1
+        return compiled
+        
+    def record_fallback(self):
+        """
+        Record that a fast-path answer failed to execute and the agents took over.
+        """
+        with self._lock:
+            self.hits -= 1
+            self.fallbacks += 1
+            
+    def get_stats(self) -> Dict:
+        """
+        Get fast path hit counters.
+        
+        Returns:
+            Dictionary with fast path statistics
+        """
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0
+            }
+            
+    def _compile(self, user_question: str, data_schema: Dict) -> Optional[Dict]:
+        """
+        Parse the question and build pandas code for it.
+        """
+        question = re.sub(r"[?!.]+$", "", user_question.strip().lower())
+        question = re.sub(r"\s+", " ", question)
+        
+        if any(re.search(rf"\b{re.escape(word)}\b", question) for word in COMPLEX_WORDS):
+            return None
+            
+        # Chart requests
+        chart_type = None
+        chart_match = CHART_PATTERN.match(question)
+        if chart_match and chart_match.group(4):
+            chart_type = (chart_match.group(3) or "bar").replace("horizontal ", "")
+            question = question[chart_match.end():]
+        question = FILLER_PATTERN.sub("", question, count=1).strip()
+        
+        # Filters: "... where <column> is <value>" / "... where <column> > <number>"
+        filters = []
+        scores = []
+        filter_match = re.search(
+            r" where (.+?) "
+            r"(is|=|==|equals|>|<|>=|<=|greater than|less than|above|below) (.+)$",
+            question
+        )
+        if filter_match:
+            column = self._resolve_column(filter_match.group(1), data_schema, scores)
+            if column is None:
+                return None
+            operator = {
+                "is": "==", "=": "==", "==": "==", "equals": "==",
+                "greater than": ">", "above": ">", "less than": "<", "below": "<"
+            }.get(filter_match.group(2), filter_match.group(2))
+            value = self._parse_value(filter_match.group(3), data_schema[column])
+            if value is None or (isinstance(value, str) and operator != "=="):
+                return None
+            filters.append((column, operator, value))
+            question = question[:filter_match.start()].strip()
+            
+        query = (
+            self._match_row_count(question, scores) or
+            self._match_unique_count(question, data_schema, scores) or
+            self._match_top_k(question, data_schema, scores) or
+            self._match_aggregation(question, data_schema, scores)
+        )
+        if query is None:
+            return None
+            
+        compiled = self._build(user_question, query, filters, chart_type)
+        # Confidence is that of the weakest match; a query nothing vouched for has none
+        compiled["confidence"] = min(scores) if scores else 0.0
+        return compiled
+        
+    def _match_row_count(self, question: str, scores: List[float]) -> Optional[Dict]:
+        """
+        "how many rows", "number of records"
+        """
+        if re.fullmatch(rf"(how many|number of|count of|count) {ROW_NOUNS}( are there| in the (data|dataset|table))?", question):
+            scores.append(1.0)
+            return {"kind": "row_count"}
+        return None
+        
+    def _match_unique_count(self, question: str, data_schema: Dict, scores: List[float]) -> Optional[Dict]:
+        """
+        "how many unique customers", "number of distinct regions"
+        """
+        match = re.fullmatch(r"(?:how many|number of|count of|count) (?:unique|distinct|different) (.+?)( are there)?", question)
+        if not match:
+            return None
+        column = self._resolve_column(match.group(1), data_schema, scores)
+        if column is None:
+            return None
+        return {"kind": "unique_count", "column": column}
+        
+    def _match_top_k(self, question: str, data_schema: Dict, scores: List[float]) -> Optional[Dict]:
+        """
+        "top 5 products by profit", "bottom 3 regions by total sales"
+        """
+        match = re.fullmatch(
+            r"(top|bottom|best|worst|highest|lowest) (\d+) (.+?) (?:by|in terms of|based on) (?:(total|average|avg|mean|sum of) )?(.+)",
+            question
+        )
+        if not match:
+            return None
+            
+        group = self._resolve_column(match.group(3), data_schema, scores)
+        metric = self._resolve_column(match.group(5), data_schema, scores)
+        if group is None or metric is None or not self._is_numeric(data_schema[metric]):
+            return None
+            
+        return {
+            "kind": "top_k",
+            "group": group,
+            "metric": metric,
+            "aggregation": AGGREGATIONS.get(match.group(4) or "total", "sum"),
+            "n": int(match.group(2)),
+            "ascending": match.group(1) in ("bottom", "worst", "lowest")
+        }
+        
+    def _match_aggregation(self, question: str, data_schema: Dict, scores: List[float]) -> Optional[Dict]:
+        """
+        "total sales by region", "average profit per category", "max discount",
+        "number of rows by region", "number of customers per region"
+        """
+        aggregation_words = "|".join(
+            re.escape(word) for word in sorted(AGGREGATIONS, key=len, reverse=True)
+        )
+        match = re.fullmatch(
+            rf"({aggregation_words}) (?:of )?(?:the )?(.+?)(?: {GROUP_SEPARATORS} (.+))?",
+            question
+        )
+        if not match:
+            return None
+            
+        aggregation = AGGREGATIONS[match.group(1)]
+        group = None
+        if match.group(3):
+            group = self._resolve_column(match.group(3), data_schema, scores)
+            if group is None:
+                return None
+                
+        if aggregation == "count":
+            # "number of rows" counts rows; "number of customers" counts the
+            # distinct values of the column the noun names, not the rows
+            if re.fullmatch(ROW_NOUNS, match.group(2)):
+                scores.append(1.0)
+                return {"kind": "aggregate", "aggregation": "count", "metric": None, "group": group}
+            column = self._resolve_column(match.group(2), data_schema, scores)
+            if column is None:
+                return None
+            return {"kind": "unique_count", "column": column, "group": group}
+            
+        metric = self._resolve_column(match.group(2), data_schema, scores)
+        if metric is None or not self._is_numeric(data_schema[metric]):
+            return None
+            
+        return {"kind": "aggregate", "aggregation": aggregation, "metric": metric, "group": group}
+        
+    def _build(
+        self,
+        user_question: str,
+        query: Dict,
+        filters: List[Tuple[str, str, object]],
+        chart_type: Optional[str]
+    ) -> Dict:
+        """
+        Turn a parsed query into pandas code and a plan.
+        """
+        lines = []
+        steps = []
+        
+        for column, operator, value in filters:
+            if isinstance(value, str):
+                # The question is lowercased, so compare text case-insensitively
+                lines.append(f"df = df[df[{column!r}].astype(str).str.lower() == {value!r}]")
+            else:
+                lines.append(f"df = df[df[{column!r}] {operator} {value!r}]")
+            steps.append(f"Filter rows where {column} {operator} {value}")
+            
+        kind = query["kind"]
+        group = query.get("group")
+        metric = query.get("metric")
+        x_label = group
+        y_label = metric
+        
+        if kind == "row_count":
+            lines.append("result = len(df)")
+            steps.append("Count the rows")
+            description = "Number of rows"
+            chart_type = None
+            
+        elif kind == "unique_count":
+            column = query["column"]
+            y_label = column
+            if group:
+                lines.append(f"result = df.groupby({group!r}, observed=True)[{column!r}].nunique()")
+                steps.append(f"Group by {group} and count distinct values of {column}")
+                description = f"Number of distinct {column} values for each {group}"
+            else:
+                lines.append(f"result = df[{column!r}].nunique()")
+                steps.append(f"Count distinct values of {column}")
+                description = f"Number of distinct {column} values"
+                chart_type = None
+                
+        elif kind == "top_k":
+            label = AGGREGATION_LABELS[query["aggregation"]]
+            order = "nsmallest" if query["ascending"] else "nlargest"
+            lines.append(
+                f"result = df.groupby({group!r}, observed=True)[{metric!r}]"
+                f".{query['aggregation']}().{order}({query['n']})"
+            )
+            steps.append(f"Group by {group} and compute the {label.lower()} {metric}")
+            steps.append(f"Keep the {'bottom' if query['ascending'] else 'top'} {query['n']}")
+            description = (
+                f"{'Bottom' if query['ascending'] else 'Top'} {query['n']} {group} "
+                f"by {label.lower()} {metric}"
+            )
+            
+        else:
+            aggregation = query["aggregation"]
+            label = AGGREGATION_LABELS[aggregation]
+            
+            if aggregation == "count":
+                y_label = "count"
+                if group:
+                    lines.append(f"result = df.groupby({group!r}, observed=True).size().rename('count')")
+                    description = f"Number of rows for each {group}"
+                else:
+                    lines.append("result = len(df)")
+                    description = "Number of rows"
+            elif group:
+                lines.append(
+                    f"result = df.groupby({group!r}, observed=True)[{metric!r}].{aggregation}()"
+                )
+                description = f"{label} {metric} for each {group}"
+            else:
+                lines.append(f"result = df[{metric!r}].{aggregation}()")
+                description = f"{label} {metric}"
+                
+            steps.append(description)
+            if not group:
+                chart_type = None
+                
+        if chart_type:
+            lines.append("import plotly.express as px")
+            chart_df = "result.reset_index()"
+            if chart_type == "pie":
+                lines.append(
+                    f"fig = px.pie({chart_df}, names={x_label!r}, values={y_label!r}, title={description!r})"
+                )
+            else:
+                chart_function = "line" if chart_type == "line" else "bar"
+                lines.append(
+                    f"fig = px.{chart_function}({chart_df}, x={x_label!r}, y={y_label!r}, title={description!r})"
+                )
+            steps.append(f"Plot a {chart_type} chart")
+            
+        code = "\n".join(lines)
+        plan = {
+            "question_analysis": description,
+            "requires_visualization": chart_type is not None,
+            "visualization_type": chart_type or "none",
+            "steps": steps,
+            "data_operations": [kind] + (["filter"] if filters else []),
+            "expected_output": "Chart and table" if chart_type else "Table or value",
+            "reasoning": "Matched a common aggregation pattern and compiled it to pandas without the LLM",
+            "status": "success",
+            "original_question": user_question,
+            "fast_path": True
+        }
+        
+        return {
+            "plan": plan,
+            "code": code,
+            "explanation": f"{description}."
+        }
+        
+    @staticmethod
+    def _normalize(name: str) -> str:
+        """
+        Normalize a column name or phrase for matching.
+        """
+        name = re.sub(r"[_\-\s]+", " ", str(name).lower()).strip()
+        return re.sub(r"^the ", "", name)
+        
+    @classmethod
+    def _singular(cls, name: str) -> str:
+        """
+        Strip a simple English plural from the last word.
+        """
+        if name.endswith("ies"):
+            return name[:-3] + "y"
+        if name.endswith("ses") or name.endswith("xes"):
+            return name[:-2]
+        if name.endswith("s") and not name.endswith("ss"):
+            return name[:-1]
+        return name
+        
+    def _resolve_column(self, phrase: str, data_schema: Dict, scores: List[float]) -> Optional[str]:
+        """
+        Map a phrase from the question to exactly one column, recording how
+        confident the match is: 1.0 for the exact name, 0.85 for a plural form.
+        """
+        phrase = self._normalize(phrase)
+        
+        exact = [column for column in data_schema if self._normalize(column) == phrase]
+        if len(exact) == 1:
+            scores.append(1.0)
+            return exact[0]
+            
+        plural = [
+            column for column in data_schema
+            if self._singular(self._normalize(column)) == self._singular(phrase)
+        ]
+        if len(plural) == 1:
+            scores.append(0.85)
+            return plural[0]
+            
+        return None
+        
+    @staticmethod
+    def _is_numeric(dtype: str) -> bool:
+        """
+        Check whether a schema dtype string is numeric.
+        """
+        return dtype.startswith(("int", "uint", "float", "Int", "UInt", "Float"))
+        
+    def _parse_value(self, text: str, dtype: str):
+        """
+        Convert a filter value to the column's type.
+        """
+        text = text.strip().strip("'\"")
+        if self._is_numeric(dtype):
+            try:
+                number = float(text.replace(",", ""))
+            except ValueError:
+                return None
+            return int(number) if number.is_integer() else number
+        return text
@@ -0,0 +1,409 @@
+"""
+Shared Gemini client with rate limiting, retries and a circuit breaker
+"""
+
+from typing import Dict, Optional
+import asyncio
+import os
+import random
+import threading
+import time
+
+from utils.metrics import metrics
+
+# HTTP status codes worth retrying: rate limited, or a temporary server failure
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without calling the API while the circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter shared by threads and coroutines.
+    Callers reserve a token and are told how long to wait for it, so a burst
+    of requests is spread out at the refill rate instead of being rejected.
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize the bucket full.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        
+    def reserve(self) -> float:
+        """
+        Take one token, going into debt if none is left.
+        
+        Returns:
+            Seconds the caller must wait before using the token
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class GeminiClient:
+    """
+    One Gemini client shared by all agents and sessions.
+    Reuses a single genai.Client (and its HTTP connection pool) and wraps
+    every call with a token-bucket rate limit, a cap on concurrent calls,
+    a per-call timeout, retries with jittered exponential backoff on rate
+    limits and server errors, and a circuit breaker that fails fast while
+    the API keeps failing. google-genai is imported and the underlying
+    client created on the first call in each process, so the client can be
+    built before a fork (gunicorn --preload) without sharing connections.
+    """
+    
+    def __init__(
+        self,
+        api_key: str,
+        requests_per_second: float = 5.0,
+        burst: int = 10,
+        max_concurrency: int = 8,
+        timeout_seconds: float = 60.0,
+        max_retries: int = 4,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 20.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0
+    ):
+        """
+        Initialize the shared client.
+        
+        Args:
+            api_key: Google Gemini API key
+            requests_per_second: Sustained request rate
+            burst: Requests allowed at once before the rate applies
+            max_concurrency: Maximum calls in flight
+            timeout_seconds: Timeout of a single attempt
+            max_retries: Retries after the first attempt
+            backoff_base_seconds: Backoff before the first retry (doubles each time)
+            backoff_max_seconds: Upper bound of the backoff
+            failure_threshold: Consecutive failed calls that open the circuit
+            reset_seconds: Time the circuit stays open before a trial call
+        """
+        self.api_key = api_key
+        self._client = None
+        self._client_pid: Optional[int] = None
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.throttled_seconds = 0.0
+        
+    @property
+    def client(self):
+        """
+        The genai.Client of this process, created on first use.
+        """
+        with self._lock:
+            if self._client is None or self._client_pid != os.getpid():
+                from google import genai
+                from google.genai import types
+                
+                self._client = genai.Client(
+                    api_key=self.api_key,
+                    http_options=types.HttpOptions(timeout=int(self.timeout_seconds * 1000))
+                )
+                self._client_pid = os.getpid()
+            return self._client
+            
+    def generate(self, model: str, contents, config=None):
+        """
+        Call models.generate_content with limits, retries and the circuit breaker.
+        
+        Args:
+            model: Model name
+            contents: Prompt contents
+            config: Optional GenerateContentConfig
+            
+        Returns:
+            The generate_content response
+            
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The last error once retries are exhausted
+        """
+        start = time.perf_counter()
+        try:
+            response = self._generate(model, contents, config)
+        except Exception:
+            metrics.record_llm_call(model, time.perf_counter() - start, "error")
+            raise
+        metrics.record_llm_call(model, time.perf_counter() - start, "success", getattr(response, 'usage_metadata', None))
+        return response
+        
+    def _generate(self, model: str, contents, config=None):
+        """
+        Make the call of generate, retrying as configured.
+        """
+        self._before_call()
+        attempt = 0
+        
+        while True:
+            self._wait(self.bucket.reserve())
+            self._slots.acquire()
+            try:
+                self._started()
+                response = self.client.models.generate_content(
+                    model=model, contents=contents, config=config
+                )
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return response
+            finally:
+                self._finished()
+                self._slots.release()
+                
+            # Back off without holding a concurrency slot
+            attempt += 1
+            time.sleep(delay)
+            
+    async def agenerate(self, model: str, contents, config=None):
+        """
+        Async variant of generate using the async Gemini client.
+        
+        Args:
+            model: Model name
+            contents: Prompt contents
+            config: Optional GenerateContentConfig
+            
+        Returns:
+            The generate_content response
+            
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The last error once retries are exhausted
+        """
+        start = time.perf_counter()
+        try:
+            response = await self._agenerate(model, contents, config)
+        except Exception:
+            metrics.record_llm_call(model, time.perf_counter() - start, "error")
+            raise
+        metrics.record_llm_call(model, time.perf_counter() - start, "success", getattr(response, 'usage_metadata', None))
+        return response
+        
+    async def _agenerate(self, model: str, contents, config=None):
+        """
+        Make the call of agenerate, retrying as configured.
+        """
+        self._before_call()
+        attempt = 0
+        
+        while True:
+            await self._await(self.bucket.reserve())
+            await self._acquire_slot()
+            try:
+                self._started()
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=model, contents=contents, config=config
+                    ),
+                    self.timeout_seconds
+                )
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success()
+                return response
+            finally:
+                self._finished()
+                self._slots.release()
+                
+            # Back off without holding a concurrency slot
+            attempt += 1
+            await asyncio.sleep(delay)
+            
+    def get_stats(self) -> Dict:
+        """
+        Get call counters and the circuit state.
+        
+        Returns:
+            Dictionary with client statistics
+        """
+        with self._lock:
+            return {
+                "circuit": self._circuit_state(),
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rate_limited": self.rate_limited,
+                "rejected": self.rejected,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "throttled_seconds": round(self.throttled_seconds, 3)
+            }
+            
+    def _circuit_state(self) -> str:
+        """
+        Describe the circuit: "closed", "open" or "half_open" (caller holds the lock).
+        """
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+        
+    def _before_call(self):
+        """
+        Fail fast while the circuit is open; let one trial call through once
+        the reset time has passed.
+        """
+        with self._lock:
+            state = self._circuit_state()
+            if state == "closed":
+                return
+            # A trial that has not finished within the timeout was lost (e.g. cancelled)
+            now = time.monotonic()
+            if state == "half_open" and (
+                self._trial_started is None or now - self._trial_started > self.timeout_seconds
+            ):
+                self._trial_started = now
+                return
+            self.rejected += 1
+            
+        raise CircuitOpenError("Gemini API is unavailable; try again shortly")
+        
+    def _wait(self, seconds: float):
+        """
+        Sleep for a rate-limit delay.
+        """
+        if seconds > 0:
+            with self._lock:
+                self.throttled_seconds += seconds
+            time.sleep(seconds)
+            
+    async def _await(self, seconds: float):
+        """
+        Async sleep for a rate-limit delay.
+        """
+        if seconds > 0:
+            with self._lock:
+                self.throttled_seconds += seconds
+            await asyncio.sleep(seconds)
+            
+    async def _acquire_slot(self):
+        """
+        Take a concurrency slot without blocking the event loop.
+        The slots are shared with synchronous callers, so poll with a short sleep.
+        """
+        delay = 0.005
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            
+    def _started(self):
+        """
+        Count an attempt going out.
+        """
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            
+    def _finished(self):
+        """
+        Count an attempt coming back.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            
+    def _on_success(self):
+        """
+        Close the circuit after a successful call.
+        """
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_started = None
+            
+    def _on_error(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Decide whether to retry a failed attempt.
+        
+        Args:
+            error: Exception raised by the attempt
+            attempt: Number of retries already made
+            
+        Returns:
+            Seconds to back off before retrying, or None to give up
+        """
+        code = getattr(error, 'code', None) if isinstance(error, _api_error_type()) else None
+        retryable = code in RETRYABLE_CODES or isinstance(error, (asyncio.TimeoutError, *_transient_errors()))
+        
+        with self._lock:
+            if code == 429:
+                self.rate_limited += 1
+                
+            if retryable and attempt < self.max_retries and self._opened_at is None:
+                self.retries += 1
+                # Full jitter keeps retrying clients from synchronizing
+                return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+                
+            self.failures += 1
+            self._trial_started = None
+            
+            if retryable:
+                # Only API-side failures count toward opening the circuit
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= self.failure_threshold or self._opened_at is not None:
+                    self._opened_at = time.monotonic()
+                    
+        return None
+
+
+def _api_error_type() -> type:
+    """
+    google.genai's APIError, imported when the first error is classified.
+    """
+    from google.genai import errors
+    return errors.APIError
+
+
+def _transient_errors() -> tuple:
+    """
+    Transport errors worth retrying.
+    """
+    try:
+        import httpx
+        return (TimeoutError, ConnectionError, httpx.TransportError)
+    except ImportError:
+        return (TimeoutError, ConnectionError)
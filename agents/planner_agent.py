@@ -3,11 +3,21 @@ Agent 1: The Planner
 Analyzes user questions and data schema to create step-by-step execution plans.
 """
 
-from google import genai
 from google.genai import types
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 import json
 
+from utils.prompt_builder import PromptBuilder
+from .llm_client import GeminiClient
+
+# Keys every plan must contain
+REQUIRED_PLAN_KEYS = [
+    "question_analysis", 
+    "requires_visualization", 
+    "steps", 
+    "expected_output"
+]
+
 
 class PlannerAgent:
     """
@@ -15,21 +25,30 @@ class PlannerAgent:
     It understands the data schema and breaks down complex questions into actionable steps.
     """
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self, 
+        api_key: str, 
+        prompt_builder: Optional[PromptBuilder] = None, 
+        llm_client: Optional[GeminiClient] = None
+    ):
         """
         Initialize the Planner Agent with Google Gemini API.
         
         Args:
             api_key: Google Gemini API key
+            prompt_builder: Builder fitting the schema into the prompt budget
+            llm_client: Shared Gemini client; one is created from api_key if omitted
         """
-        self.client = genai.Client(api_key=api_key)
+        self.client = llm_client or GeminiClient(api_key=api_key)
         self.model_name = 'gemini-flash-latest'
+        self.prompt_builder = prompt_builder or PromptBuilder()
         
     def create_plan(
         self, 
         user_question: str, 
         data_schema: Dict, 
-        conversation_history: Optional[List[Dict]] = None
+        conversation_context: str = "", 
+        related_tables: Optional[Dict] = None
     ) -> Dict:
         """
         Analyze the user's question and create an execution plan.
@@ -37,22 +56,83 @@ class PlannerAgent:
         Args:
             user_question: The user's natural language question
             data_schema: Schema information about the uploaded dataset
-            conversation_history: Previous conversation context
+            conversation_context: Summaries of relevant previous turns
+            related_tables: Other tables and relationships of a multi-table dataset
+            
+        Returns:
+            Dict containing the execution plan with steps and reasoning
+        """
+        prompt = self._build_prompt(user_question, data_schema, conversation_context, related_tables)
+        
+        try:
+            # Generate the plan using Gemini
+            response = self.client.generate(
+                model=self.model_name,
+                contents=prompt
+            )
+            return self._parse_plan(response.text, user_question)
+            
+        except Exception as e:
+            return self._error_plan(e, user_question)
+            
+    async def acreate_plan(
+        self, 
+        user_question: str, 
+        data_schema: Dict, 
+        conversation_context: str = "", 
+        related_tables: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Async variant of create_plan using the async Gemini client.
+        
+        Args:
+            user_question: The user's natural language question
+            data_schema: Schema information about the uploaded dataset
+            conversation_context: Summaries of relevant previous turns
+            related_tables: Other tables and relationships of a multi-table dataset
             
         Returns:
             Dict containing the execution plan with steps and reasoning
         """
+        prompt = self._build_prompt(user_question, data_schema, conversation_context, related_tables)
         
-        # Build context from conversation history
-        context = ""
-        if conversation_history:
-            for msg in conversation_history[-2:]:
-                context += f"{msg['role']}: {msg['content'][:60]}\n"
+        try:
+            response = await self.client.agenerate(
+                model=self.model_name,
+                contents=prompt
+            )
+            return self._parse_plan(response.text, user_question)
+            
+        except Exception as e:
+            return self._error_plan(e, user_question)
+            
+    def _build_prompt(
+        self, 
+        user_question: str, 
+        data_schema: Dict, 
+        conversation_context: str = "", 
+        related_tables: Optional[Dict] = None
+    ) -> str:
+        """
+        Build the planning prompt.
+        
+        Args:
+            user_question: The user's natural language question
+            data_schema: Schema information about the uploaded dataset
+            conversation_context: Summaries of relevant previous turns
+            related_tables: Other tables and relationships of a multi-table dataset
+            
+        Returns:
+            Prompt text for the model
+        """
+        context = f"Previous turns:\n{conversation_context}\n\n" if conversation_context else ""
+        tables = f"\n{self.prompt_builder.encode_tables(related_tables, user_question)}" if related_tables else ""
         
         # Create the planning prompt
         prompt = f"""Analyze user question and create execution plan.
 
-{context}Data Schema: {json.dumps(data_schema)}
+{context}Data Schema ({len(data_schema)} columns, by type):
+{self.prompt_builder.encode_schema(data_schema, user_question)}{tables}
 Question: {user_question}
 
 Return JSON only:
@@ -65,41 +145,31 @@ Return JSON only:
     "expected_output": "output description",
     "reasoning": "why this plan"
 }}"""
-
-        try:
-            # Generate the plan using Gemini
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
-            plan_text = response.text.strip()
+        return self.prompt_builder.record("planner", prompt)
+        
+    def _parse_plan(self, response_text: str, user_question: str) -> Dict:
+        """
+        Parse and validate the model's plan response.
+        
+        Args:
+            response_text: Raw text returned by the model
+            user_question: The user's natural language question
             
-            # Extract JSON from potential markdown code blocks
-            if "```json" in plan_text:
-                plan_text = plan_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in plan_text:
-                plan_text = plan_text.split("```")[1].split("```")[0].strip()
+        Returns:
+            Validated plan, or a fallback plan if the JSON cannot be parsed
+        """
+        plan_text = response_text.strip()
+        
+        # Extract JSON from potential markdown code blocks
+        if "```json" in plan_text:
+            plan_text = plan_text.split("```json")[1].split("```")[0].strip()
+        elif "```" in plan_text:
+            plan_text = plan_text.split("```")[1].split("```")[0].strip()
             
+        try:
             # Parse the JSON response
             plan = json.loads(plan_text)
             
-            # Validate the plan structure
-            required_keys = [
-                "question_analysis", 
-                "requires_visualization", 
-                "steps", 
-                "expected_output"
-            ]
-            
-            if not all(key in plan for key in required_keys):
-                raise ValueError("Plan missing required keys")
-            
-            # Add metadata
-            plan["status"] = "success"
-            plan["original_question"] = user_question
-            
-            return plan
-            
         except json.JSONDecodeError as e:
             # Fallback plan if JSON parsing fails
             return {
@@ -117,21 +187,41 @@ Return JSON only:
                 "expected_output": "Data analysis result",
                 "reasoning": f"Fallback plan due to parsing error: {str(e)}",
                 "original_question": user_question,
-                "raw_response": response.text if 'response' in locals() else ""
+                "raw_response": response_text
             }
+            
+        # Validate the plan structure
+        if not all(key in plan for key in REQUIRED_PLAN_KEYS):
+            raise ValueError("Plan missing required keys")
+            
+        # Add metadata
+        plan["status"] = "success"
+        plan["original_question"] = user_question
+        
+        return plan
+        
+    def _error_plan(self, error: Exception, user_question: str) -> Dict:
+        """
+        Build the plan returned when planning fails.
+        
+        Args:
+            error: The exception raised while planning
+            user_question: The user's natural language question
+            
+        Returns:
+            Error plan
+        """
+        return {
+            "status": "error",
+            "error_type": "general",
+            "error_message": str(error),
+            "question_analysis": "Error creating plan",
+            "requires_visualization": False,
+            "steps": [],
+            "expected_output": "Error occurred",
+            "original_question": user_question
+        }
         
-        except Exception as e:
-            return {
-                "status": "error",
-                "error_type": "general",
-                "error_message": str(e),
-                "question_analysis": "Error creating plan",
-                "requires_visualization": False,
-                "steps": [],
-                "expected_output": "Error occurred",
-                "original_question": user_question
-            }
-    
     def refine_plan(self, original_plan: Dict, execution_result: Dict) -> Dict:
         """
         Refine the plan based on execution results (optional for advanced scenarios).
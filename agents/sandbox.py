@@ -0,0 +1,286 @@
+"""
+Sandbox for running generated code in child processes with resource limits
+"""
+
+from typing import Callable, Dict, List, Optional
+import io
+import multiprocessing
+import os
+import threading
+from multiprocessing import context, forkserver, reduction, spawn, util
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from multiprocessing import popen_forkserver
+except ImportError:  # No fork server on this platform
+    popen_forkserver = None
+
+
+if popen_forkserver is not None:
+    class _SandboxPopen(popen_forkserver.Popen):
+        """
+        Fork-server launcher that leaves the parent's __main__ alone.
+        multiprocessing runs the main script again in each child so targets
+        defined there can be unpickled; sandbox targets live in importable
+        modules, and re-running e.g. backend/app.py would rebuild the app in
+        every child. Otherwise identical to popen_forkserver.Popen._launch.
+        """
+        
+        def _launch(self, process_obj):
+            prep_data = spawn.get_preparation_data(process_obj._name)
+            prep_data.pop('init_main_from_name', None)
+            prep_data.pop('init_main_from_path', None)
+            buf = io.BytesIO()
+            context.set_spawning_popen(self)
+            try:
+                reduction.dump(prep_data, buf)
+                reduction.dump(process_obj, buf)
+            finally:
+                context.set_spawning_popen(None)
+                
+            self.sentinel, w = forkserver.connect_to_new_process(self._fds)
+            # The parent's duplicate of the data pipe tells the child it is alive
+            _parent_w = os.dup(w)
+            self.finalizer = util.Finalize(self, util.close_fds, (_parent_w, self.sentinel))
+            with open(w, 'wb', closefd=True) as f:
+                f.write(buf.getbuffer())
+            self.pid = forkserver.read_signed(self.sentinel)
+            
+    class _SandboxProcess(context.ForkServerProcess):
+        """
+        Fork-server process started with _SandboxPopen.
+        """
+        
+        @staticmethod
+        def _Popen(process_obj):
+            return _SandboxPopen(process_obj)
+
+
+class SandboxExecutor:
+    """
+    Runs generated code in child processes with resource limits.
+    Children are forked by a multiprocessing fork server: a single-threaded
+    interpreter started on the first run, which imports the preload modules
+    once. Forking the threaded web worker itself could leave a child stuck
+    on a lock another thread held at fork time; the fork server holds none.
+    Arguments are pickled to the child, so large inputs should be passed by
+    reference and loaded by the prepare step. Each run gets CPU-time,
+    wall-clock and memory limits and can be cancelled; a runaway query kills
+    only its child. Concurrent runs are capped at one per core by default.
+    """
+    
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        cpu_seconds: int = 30,
+        wall_seconds: int = 60,
+        memory_mb: int = 1024,
+        preload: Optional[List[str]] = None
+    ):
+        """
+        Initialize the Sandbox Executor.
+        
+        Args:
+            max_workers: Maximum concurrent child processes (defaults to CPU count)
+            cpu_seconds: CPU-time limit per run
+            wall_seconds: Wall-clock limit per run
+            memory_mb: Memory a run may allocate on top of its prepared inputs
+            preload: Modules the fork server imports before forking any child
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.memory_mb = memory_mb
+        self.available = (
+            popen_forkserver is not None
+            and 'forkserver' in multiprocessing.get_all_start_methods()
+        )
+        self._context = multiprocessing.get_context('forkserver') if self.available else None
+        if self._context is not None and preload:
+            self._context.set_forkserver_preload(preload)
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._active: Dict[str, multiprocessing.Process] = {}
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.cancellations = 0
+        
+    def run(
+        self, 
+        func: Callable, 
+        *args, 
+        run_id: Optional[str] = None, 
+        prepare: Optional[Callable] = None
+    ) -> Dict:
+        """
+        Run func(*args) in a child process and return its result dict.
+        
+        Args:
+            func: Module-level callable returning a picklable dict with a "status" key
+            *args: Picklable arguments passed to func, or to prepare if given
+            run_id: Identifier that can be passed to cancel
+            prepare: Module-level callable run in the child before the memory
+                limit applies, e.g. to memory-map stored data; it receives
+                args and returns the tuple of arguments passed to func
+                
+        Returns:
+            The dict returned by func, or an error dict if the child was
+            killed, timed out or crashed
+        """
+        if not self.available:
+            return func(*(prepare(*args) if prepare is not None else args))
+            
+        with self._slots:
+            receiver, sender = self._context.Pipe(duplex=False)
+            process = _SandboxProcess(
+                target=self._child_main,
+                args=(sender, func, args, prepare, self.cpu_seconds, self.memory_mb),
+                daemon=True
+            )
+            process.start()
+            sender.close()
+            
+            with self._lock:
+                self.runs += 1
+                if run_id is not None:
+                    self._active[run_id] = process
+                    
+            try:
+                if receiver.poll(self.wall_seconds):
+                    try:
+                        return receiver.recv()
+                    except EOFError:
+                        # Child died before sending (CPU or memory limit, or cancelled)
+                        process.join(1)
+                        with self._lock:
+                            cancelled = run_id is not None and run_id in self._cancelled
+                            if cancelled:
+                                self.cancellations += 1
+                            else:
+                                self.crashes += 1
+                        if cancelled:
+                            return self._error("Execution cancelled")
+                        return self._error(
+                            f"Execution aborted (exit code {process.exitcode}); "
+                            f"it may have exceeded the {self.cpu_seconds}s CPU "
+                            f"or {self.memory_mb} MB memory limit"
+                        )
+                        
+                with self._lock:
+                    self.timeouts += 1
+                return self._error(f"Execution timed out after {self.wall_seconds}s")
+                
+            finally:
+                if run_id is not None:
+                    with self._lock:
+                        self._active.pop(run_id, None)
+                        self._cancelled.discard(run_id)
+                if process.is_alive():
+                    process.kill()
+                process.join()
+                receiver.close()
+                
+    def cancel(self, run_id: str) -> bool:
+        """
+        Kill a running child process.
+        
+        Args:
+            run_id: Identifier passed to run
+            
+        Returns:
+            True if a run was cancelled
+        """
+        with self._lock:
+            process = self._active.get(run_id)
+            
+            if process is None or not process.is_alive():
+                return False
+                
+            self._cancelled.add(run_id)
+            process.kill()
+            return True
+            
+    def get_stats(self) -> Dict:
+        """
+        Get sandbox counters.
+        
+        Returns:
+            Dictionary with sandbox statistics
+        """
+        with self._lock:
+            return {
+                "enabled": self.available,
+                "max_workers": self.max_workers,
+                "active": len(self._active),
+                "runs": self.runs,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "cancellations": self.cancellations
+            }
+            
+    @staticmethod
+    def _child_main(
+        sender, 
+        func: Callable, 
+        args: tuple, 
+        prepare: Optional[Callable], 
+        cpu_seconds: int, 
+        memory_mb: int
+    ):
+        """
+        Entry point of the child process: prepare, apply limits, run, send the result.
+        """
+        try:
+            if resource is not None:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+            if prepare is not None:
+                args = prepare(*args)
+            SandboxExecutor._apply_memory_limit(memory_mb)
+            result = func(*args)
+        except BaseException as e:
+            result = SandboxExecutor._error(f"{type(e).__name__}: {e}")
+            
+        try:
+            sender.send(result)
+        except Exception as e:
+            # Result could not be pickled
+            sender.send(SandboxExecutor._error(f"Could not return result: {str(e)}"))
+        finally:
+            sender.close()
+            
+    @staticmethod
+    def _apply_memory_limit(memory_mb: int):
+        """
+        Limit the address space of the current process to its size now,
+        including memory-mapped inputs, plus memory_mb.
+        """
+        if resource is None:
+            return
+            
+        try:
+            with open('/proc/self/status') as status:
+                vm_kb = next(
+                    int(line.split()[1]) for line in status
+                    if line.startswith('VmSize:')
+                )
+        except (OSError, StopIteration):
+            return
+            
+        limit = vm_kb * 1024 + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        
+    @staticmethod
+    def _error(message: str) -> Dict:
+        """
+        Build an execution error result.
+        """
+        return {
+            "status": "error",
+            "error": message
+        }
@@ -2,25 +2,33 @@
 Flask Backend API for Intelligent Data Room
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
+import logging
+import time
 import traceback
 
-from agents import PlannerAgent, ExecutorAgent
-from utils import ContextManager, DataManager
+from agents import SandboxExecutor, FastPathEngine, GeminiClient
+from utils import AnswerCache, CodeStore, CompiledCodeCache, SessionManager, SessionStore, Lazy
+from utils.session_store import SESSION_BACKENDS
+from utils.query_engine import QUERY_ENGINES
+from utils.metrics import metrics
+from backend.chat_pipeline import AsyncRunner, ChatPipeline
 
 # Load environment variables
 load_dotenv()
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+CORS(app, expose_headers=['X-Session-Id'])  # Enable CORS for React frontend
 
 # Configuration
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
-app.config['UPLOAD_FOLDER'] = 'uploads'
+MAX_UPLOAD_SIZE_MB = int(os.getenv('MAX_UPLOAD_SIZE_MB', '10'))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE_MB * 1024 * 1024  # 10MB max file size by default
+app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
 
 # Get API key from environment
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -29,10 +37,228 @@ if not GEMINI_API_KEY:
     print("WARNING: GEMINI_API_KEY not found in environment variables!")
 
 # Initialize managers and agents
-data_manager = DataManager(upload_folder=app.config['UPLOAD_FOLDER'])
-context_manager = ContextManager(max_history=5)
-planner_agent = PlannerAgent(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
-executor_agent = ExecutorAgent(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+code_store = CodeStore(max_entries=int(os.getenv('CODE_STORE_MAX_ENTRIES', '512')))
+compiled_code_cache = CompiledCodeCache(max_entries=int(os.getenv('COMPILED_CODE_CACHE_MAX_ENTRIES', '256')))
+sandbox = SandboxExecutor(
+    max_workers=int(os.getenv('SANDBOX_MAX_WORKERS', '0')) or None,
+    cpu_seconds=int(os.getenv('SANDBOX_CPU_SECONDS', '30')),
+    wall_seconds=int(os.getenv('SANDBOX_WALL_SECONDS', '60')),
+    memory_mb=int(os.getenv('SANDBOX_MEMORY_MB', '1024')),
+    # Imported once by the sandbox's fork server instead of in every child
+    preload=['agents.executor_agent', 'plotly.express', 'plotly.graph_objects']
+) if os.getenv('SANDBOX_ENABLED', 'true').lower() == 'true' else None
+llm_client = GeminiClient(
+    api_key=GEMINI_API_KEY,
+    requests_per_second=float(os.getenv('GEMINI_REQUESTS_PER_SECOND', '5')),
+    burst=int(os.getenv('GEMINI_BURST', '10')),
+    max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', '8')),
+    timeout_seconds=float(os.getenv('GEMINI_TIMEOUT_SECONDS', '60')),
+    max_retries=int(os.getenv('GEMINI_MAX_RETRIES', '4')),
+    failure_threshold=int(os.getenv('GEMINI_CIRCUIT_FAILURES', '5')),
+    reset_seconds=float(os.getenv('GEMINI_CIRCUIT_RESET_SECONDS', '30'))
+) if GEMINI_API_KEY else None
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '256')),
+    ttl_seconds=int(os.getenv('ANSWER_CACHE_TTL_SECONDS', '3600')),
+    max_bytes=int(os.getenv('ANSWER_CACHE_MAX_MB', '64')) * 1024 * 1024
+)
+fast_path = FastPathEngine(
+    min_confidence=float(os.getenv('FAST_PATH_MIN_CONFIDENCE', '0.8'))
+) if os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true' else None
+
+
+# Components that import pandas, pyarrow, plotly or google-genai are built on
+# first use, so a worker can start and answer /api/health without them
+
+def build_prompt_builder():
+    """
+    Build the shared prompt builder.
+    """
+    from utils.prompt_builder import PromptBuilder
+    return PromptBuilder(
+        schema_token_budget=int(os.getenv('PROMPT_SCHEMA_TOKENS', '600')),
+        preview_token_budget=int(os.getenv('PROMPT_PREVIEW_TOKENS', '300'))
+    )
+
+
+def build_result_store():
+    """
+    Build the store of large query results.
+    """
+    from utils.result_store import ResultStore
+    return ResultStore(
+        root=os.path.join(app.config['UPLOAD_FOLDER'], 'results'),
+        page_rows=int(os.getenv('RESULT_PAGE_ROWS', '500')),
+        max_page_rows=int(os.getenv('RESULT_MAX_PAGE_ROWS', '10000')),
+        max_results=int(os.getenv('RESULT_STORE_MAX_RESULTS', '200')),
+        max_bytes=int(os.getenv('RESULT_STORE_MAX_MB', '512')) * 1024 * 1024,
+        ttl_seconds=int(os.getenv('RESULT_STORE_TTL_SECONDS', '3600'))
+    )
+
+
+def build_figure_compactor():
+    """
+    Build the figure compactor.
+    """
+    from utils.figure_compactor import FigureCompactor
+    return FigureCompactor(
+        max_points=int(os.getenv('FIGURE_MAX_POINTS', '5000')),
+        max_bytes=int(os.getenv('FIGURE_MAX_KB', '2048')) * 1024
+    )
+
+
+def build_executor_agent():
+    """
+    Build an Executor Agent for a new session.
+    """
+    from agents.executor_agent import ExecutorAgent
+    return ExecutorAgent(
+        api_key=GEMINI_API_KEY,
+        code_store=code_store,
+        sandbox=sandbox,
+        prompt_builder=prompt_builder.get(),
+        llm_client=llm_client,
+        result_store=result_store.get(),
+        figure_compactor=figure_compactor.get(),
+        compiled_code_cache=compiled_code_cache,
+        query_engine=query_engine
+    )
+
+
+def build_chat_pipeline():
+    """
+    Build the chat pipeline and its shared Planner Agent.
+    """
+    from agents.planner_agent import PlannerAgent
+    planner_agent = PlannerAgent(
+        api_key=GEMINI_API_KEY,
+        prompt_builder=prompt_builder.get(),
+        llm_client=llm_client
+    ) if GEMINI_API_KEY else None
+    
+    return ChatPipeline(
+        planner_agent=planner_agent,
+        answer_cache=answer_cache,
+        fast_path=fast_path,
+        mode=os.getenv('PIPELINE_MODE', 'single_call'),
+        result_store=result_store.get()
+    )
+
+
+def build_session_store():
+    """
+    Build the store that keeps sessions across worker restarts, or None if disabled.
+    """
+    backend_name = os.getenv('SESSION_STORE_BACKEND', 'sqlite').lower()
+    if backend_name == 'none':
+        return None
+    if backend_name not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_STORE_BACKEND: {backend_name}")
+        
+    backend = SESSION_BACKENDS[backend_name](
+        os.getenv('SESSION_STORE_PATH', os.path.join(app.config['UPLOAD_FOLDER'], 'sessions.db'))
+    )
+    return SessionStore(
+        backend,
+        flush_interval_seconds=int(os.getenv('SESSION_STORE_FLUSH_MS', '500')) / 1000,
+        retention_seconds=int(os.getenv('SESSION_STORE_RETENTION_HOURS', '168')) * 3600
+    )
+
+
+def build_query_engine():
+    """
+    Build the engine that queries large CSVs out of core, or None if disabled.
+    """
+    engine_name = os.getenv('QUERY_ENGINE', 'none').lower()
+    if engine_name == 'none':
+        return None
+    if engine_name not in QUERY_ENGINES:
+        raise ValueError(f"Unknown QUERY_ENGINE: {engine_name}")
+        
+    engine_class = QUERY_ENGINES[engine_name]
+    if not engine_class.is_available():
+        logging.getLogger(__name__).warning(
+            "QUERY_ENGINE=%s is not installed; large uploads are loaded into pandas", engine_name
+        )
+        return None
+        
+    return engine_class(
+        memory_limit_mb=int(os.getenv('QUERY_ENGINE_MEMORY_MB', '512')),
+        threads=int(os.getenv('QUERY_ENGINE_THREADS', '0')),
+        spill_directory=os.path.join(app.config['UPLOAD_FOLDER'], 'spill'),
+        max_result_rows=int(os.getenv('QUERY_ENGINE_MAX_RESULT_ROWS', '1000000'))
+    )
+
+
+query_engine = build_query_engine()
+prompt_builder = Lazy(build_prompt_builder)
+result_store = Lazy(build_result_store)
+figure_compactor = Lazy(build_figure_compactor)
+chat_pipeline = Lazy(build_chat_pipeline)
+session_manager = SessionManager(
+    upload_folder=app.config['UPLOAD_FOLDER'],
+    data_manager_options={
+        "max_size_mb": MAX_UPLOAD_SIZE_MB,
+        "csv_engine": os.getenv('CSV_ENGINE', 'c'),
+        "chunksize": int(os.getenv('CSV_CHUNK_ROWS', '100000')),
+        "query_engine": query_engine,
+        "query_engine_min_mb": int(os.getenv('QUERY_ENGINE_MIN_MB', '100'))
+    },
+    max_history=5,
+    context_options={
+        "memory_token_budget": int(os.getenv('MEMORY_TOKEN_BUDGET', '600')),
+        "prompt_token_budget": int(os.getenv('PROMPT_HISTORY_TOKENS', '150'))
+    },
+    executor_factory=build_executor_agent if GEMINI_API_KEY else None,
+    session_store=build_session_store(),
+    idle_timeout_seconds=int(os.getenv('SESSION_IDLE_TIMEOUT_SECONDS', '1800')),
+    max_total_bytes=int(os.getenv('SESSION_MEMORY_CAP_MB', '512')) * 1024 * 1024,
+    max_sessions=int(os.getenv('MAX_SESSIONS', '100')),
+    sync_interval_seconds=float(os.getenv('SESSION_STORE_SYNC_SECONDS', '2'))
+)
+async_runner = AsyncRunner()
+
+
+def get_session():
+    """
+    Get the session for the current request, creating one if needed.
+    """
+    if 'session' not in g:
+        g.session = session_manager.get_or_create(request.headers.get('X-Session-Id'))
+    return g.session
+
+
+@app.before_request
+def start_timer():
+    """
+    Note when the request started, for the latency metrics.
+    """
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def attach_session_id(response):
+    """
+    Return the session token so the client can send it back.
+    """
+    if 'session' in g:
+        response.headers['X-Session-Id'] = g.session.session_id
+    return response
+
+
+@app.after_request
+def record_request_latency(response):
+    """
+    Record the request latency by endpoint. For streamed chats this is the
+    time to the first byte; the stage metrics cover the full answer.
+    """
+    if 'request_started' in g:
+        metrics.record_http(
+            request.endpoint or 'unknown',
+            response.status_code,
+            time.perf_counter() - g.request_started
+        )
+    return response
 
 
 @app.route('/api/health', methods=['GET'])
@@ -42,14 +268,48 @@ def health_check():
     """
     return jsonify({
         "status": "healthy",
-        "api_key_configured": GEMINI_API_KEY is not None
+        "api_key_configured": GEMINI_API_KEY is not None,
+        "answer_cache": answer_cache.get_stats(),
+        "code_store": code_store.get_stats(),
+        "compiled_code_cache": compiled_code_cache.get_stats(),
+        "fast_path": fast_path.get_stats() if fast_path else {"enabled": False},
+        "pipeline": loaded_stats(chat_pipeline),
+        "prompts": loaded_stats(prompt_builder),
+        "gemini": llm_client.get_stats() if llm_client else {"configured": False},
+        "results": loaded_stats(result_store),
+        "sessions": session_manager.get_stats(),
+        "sandbox": sandbox.get_stats() if sandbox else {"enabled": False},
+        "query_engine": query_engine.get_stats() if query_engine else {"enabled": False}
     })
 
 
+def loaded_stats(component: Lazy) -> dict:
+    """
+    Get a lazily built component's stats without building it.
+    """
+    return component.peek().get_stats() if component.loaded else {"loaded": False}
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Latency, prompt-size and token histograms in Prometheus text format.
+    Each worker process keeps its own metrics.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """
     Handle file upload (CSV/XLSX).
+    
+    Form field "mode" picks what happens to the loaded dataset: "replace"
+    (default) loads the file as a new dataset, "append" adds its rows and
+    "upsert" overwrites the rows matching on "key_columns" (comma-separated)
+    and adds the rest. "table" adds the file as another table of the dataset,
+    named by form field "table" or after the file. Every mode except
+    "replace" keeps the conversation.
     """
     try:
         # Check if file is in request
@@ -58,7 +318,7 @@ def upload_file():
                 "success": False,
                 "error": "No file provided"
             }), 400
-        
+            
         file = request.files['file']
         
         # Check if file has a name
@@ -67,17 +327,45 @@ def upload_file():
                 "success": False,
                 "error": "No file selected"
             }), 400
+            
+        mode = request.form.get('mode', 'replace')
+        if mode not in ('replace', 'append', 'upsert', 'table'):
+            return jsonify({
+                "success": False,
+                "error": f"Unknown upload mode: {mode}"
+            }), 400
+            
+        session = get_session()
+        previous_fingerprint = session.data_manager.get_fingerprint()
         
         # Load the file
-        success, message, data_info = data_manager.load_file(file, file.filename)
-        
+        if mode == 'replace':
+            success, message, data_info = session.data_manager.load_file(file, file.filename)
+        elif mode == 'table':
+            success, message, data_info = session.data_manager.add_table(
+                file, file.filename, request.form.get('table', '').strip() or None
+            )
+        else:
+            key_columns = [
+                column.strip() for column in request.form.get('key_columns', '').split(',')
+                if column.strip()
+            ]
+            success, message, data_info = session.data_manager.append_file(
+                file, file.filename, mode, key_columns
+            )
+            
         if success:
             # Load data into executor agent
-            if executor_agent:
-                executor_agent.load_data(data_manager.get_dataframe())
+            session.reload_executor()
             
-            # Clear conversation history on new upload
-            context_manager.clear()
+            if mode == 'replace':
+                # Clear conversation history on new upload
+                session.context_manager.clear()
+            elif previous_fingerprint:
+                # Answers on the previous version can never be hit again
+                answer_cache.invalidate_dataset(previous_fingerprint)
+            session_manager.update_memory(session)
+            session_manager.persist(session)
             
             return jsonify({
                 "success": True,
@@ -104,101 +392,105 @@ def chat():
     Handle chat messages and execute multi-agent workflow.
     """
     try:
-        # Check if data is loaded
-        if data_manager.get_dataframe() is None:
-            return jsonify({
-                "success": False,
-                "error": "Please upload a dataset first"
-            }), 400
-        
-        # Check if agents are initialized
-        if not planner_agent or not executor_agent:
-            return jsonify({
-                "success": False,
-                "error": "API key not configured. Please set GEMINI_API_KEY environment variable."
-            }), 500
-        
-        # Get user message
+        session = get_session()
         data = request.json
         user_message = data.get('message', '').strip()
+        include_timings = bool(data.get('include_timings')) or request.args.get('timings') == 'true'
         
-        if not user_message:
-            return jsonify({
-                "success": False,
-                "error": "Empty message"
-            }), 400
+        # Run the pipeline to completion and return its final event
+        final_event = None
+        for event in async_runner.iterate(chat_pipeline.get().run(session, user_message, include_timings)):
+            final_event = event
+        session_manager.persist(session)
         
-        # Add user message to context
-        context_manager.add_message("user", user_message)
+        return jsonify(final_event["data"]), final_event["status_code"]
         
-        # Step 1: Planner Agent creates execution plan
-        data_schema = data_manager.get_schema()
-        conversation_history = context_manager.get_history()
-        
-        plan = planner_agent.create_plan(
-            user_question=user_message,
-            data_schema=data_schema,
-            conversation_history=conversation_history
-        )
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Chat failed: {str(e)}",
+            "traceback": traceback.format_exc()
+        }), 500
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handle chat messages, streaming each agent stage as a Server-Sent Event.
+    """
+    session = get_session()
+    data = request.json or {}
+    user_message = data.get('message', '').strip()
+    include_timings = bool(data.get('include_timings')) or request.args.get('timings') == 'true'
+    
+    def generate():
+        try:
+            for event in async_runner.iterate(chat_pipeline.get().run(session, user_message, include_timings)):
+                yield f"event: {event['event']}\ndata: {app.json.dumps(event['data'])}\n\n"
+        except GeneratorExit:
+            # Client disconnected: stop any generated code still running
+            if session.executor_agent:
+                session.executor_agent.cancel()
+            raise
+        except Exception as e:
+            error = app.json.dumps({
+                "success": False,
+                "error": f"Chat failed: {str(e)}"
+            })
+            yield f"event: error\ndata: {error}\n\n"
+        finally:
+            session_manager.persist(session)
+            
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/results/<result_id>', methods=['GET'])
+def get_result_page(result_id):
+    """
+    Get a page of a large query result.
+    Query parameters: offset, limit, format ("json" or "arrow") and, for
+    Arrow, compression ("lz4" or "zstd").
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "offset and limit must be integers"
+        }), 400
         
-        # Check if planning succeeded
-        if plan.get("status") == "error":
+    if request.args.get('format') == 'arrow':
+        compression = request.args.get('compression') or None
+        if compression not in (None, 'lz4', 'zstd'):
             return jsonify({
                 "success": False,
-                "error": "Planning failed",
-                "plan": plan
-            }), 500
-        
-        # Step 2: Executor Agent executes the plan
-        execution_result = executor_agent.execute_plan(plan, user_message)
-        
-        # Check if execution succeeded
-        if execution_result.get("status") == "error":
-            response_message = f"I encountered an error: {execution_result.get('error', 'Unknown error')}"
-            context_manager.add_message("assistant", response_message, {
-                "error": True,
-                "plan": plan,
-                "execution_result": execution_result
-            })
+                "error": "compression must be lz4 or zstd"
+            }), 400
             
+        payload = result_store.get().read_arrow(result_id, offset, limit, compression)
+        if payload is None:
             return jsonify({
                 "success": False,
-                "error": execution_result.get("error"),
-                "message": response_message,
-                "plan": plan,
-                "code": execution_result.get("code")
-            }), 500
-        
-        # Format the response
-        result = execution_result.get("result")
-        visualization = execution_result.get("visualization")
-        explanation = execution_result.get("explanation", "")
-        
-        # Create response message
-        response_message = explanation
-        
-        # Add assistant message to context
-        context_manager.add_message("assistant", response_message, {
-            "has_visualization": visualization is not None,
-            "plan": plan
-        })
-        
-        return jsonify({
-            "success": True,
-            "message": response_message,
-            "result": result,
-            "visualization": visualization,
-            "plan": plan,
-            "code": execution_result.get("code"),
-            "conversation_history": context_manager.get_history()
-        })
+                "error": "Result not found or expired"
+            }), 404
+        return Response(payload, mimetype='application/vnd.apache.arrow.stream')
         
-    except Exception as e:
+    page = result_store.get().read_page(result_id, offset, limit)
+    if page is None:
         return jsonify({
             "success": False,
-            "error": f"Chat failed: {str(e)}",
-            "traceback": traceback.format_exc()
-        }), 500
+            "error": "Result not found or expired"
+        }), 404
+        
+    return jsonify({
+        "success": True,
+        **page
+    })
 
 
 @app.route('/api/data-info', methods=['GET'])
@@ -207,7 +499,7 @@ def get_data_info():
     Get information about the currently loaded dataset.
     """
     try:
-        data_info = data_manager.get_data_info()
+        data_info = get_session().data_manager.get_data_info()
         
         if data_info:
             return jsonify({
@@ -227,6 +519,53 @@ def get_data_info():
         }), 500
 
 
+@app.route('/api/relationships', methods=['POST'])
+def set_relationships():
+    """
+    Declare how the dataset's tables relate, replacing earlier declarations.
+    Body: {"relationships": ["orders.customer_id = customers.id", ...]}, the
+    foreign key on the left. Pairs of tables without a declaration keep
+    their inferred relationship.
+    """
+    try:
+        session = get_session()
+        if not session.data_manager.has_data():
+            return jsonify({
+                "success": False,
+                "error": "Please upload a dataset first"
+            }), 400
+            
+        specs = (request.json or {}).get('relationships', [])
+        if not isinstance(specs, list):
+            return jsonify({
+                "success": False,
+                "error": "relationships must be a list"
+            }), 400
+            
+        previous_fingerprint = session.data_manager.get_fingerprint()
+        try:
+            relationships = session.data_manager.declare_relationships(specs)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+            
+        session.reload_executor()
+        answer_cache.invalidate_dataset(previous_fingerprint)
+        session_manager.persist(session)
+        
+        return jsonify({
+            "success": True,
+            "relationships": relationships
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """
@@ -235,7 +574,7 @@ def get_history():
     try:
         return jsonify({
             "success": True,
-            "history": context_manager.get_history()
+            "history": get_session().context_manager.get_history()
         })
     except Exception as e:
         return jsonify({
@@ -248,10 +587,11 @@ def get_history():
 def clear_session():
     """
     Clear the current session (data and conversation history).
+    The session is dropped everywhere and the client gets a new token.
     """
     try:
-        data_manager.clear_data()
-        context_manager.clear()
+        session_manager.remove(get_session().session_id)
+        g.session = session_manager.get_or_create()
         
         return jsonify({
             "success": True,
@@ -264,6 +604,29 @@ def clear_session():
         }), 500
 
 
+def preload():
+    """
+    Import the heavy modules and build the shared components now instead of
+    on first use. With gunicorn --preload this runs once in the master and
+    the forked workers share the loaded modules; the Gemini HTTP client is
+    still created in each worker on its first call.
+    """
+    import pandas
+    import plotly.express
+    import pyarrow
+    import google.genai
+    import agents.executor_agent
+    import utils.data_manager
+    
+    for component in (prompt_builder, result_store, figure_compactor, chat_pipeline):
+        component.get()
+    agents.executor_agent.NAMESPACE_TEMPLATE.get()
+
+
+if os.getenv('PRELOAD_APP', 'false').lower() == 'true':
+    preload()
+
+
 if __name__ == '__main__':
     # Create uploads folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
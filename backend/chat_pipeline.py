@@ -0,0 +1,565 @@
+"""
+Chat pipeline shared by the blocking and streaming chat endpoints
+"""
+
+from typing import AsyncIterator, Dict, Iterator, Optional
+import asyncio
+import os
+import threading
+import time
+
+from agents import FastPathEngine
+from utils import AnswerCache, ContextManager, Session, SingleFlight
+from utils.metrics import RequestTimings, metrics
+
+# Fields of a complete answer, shared through the answer cache and coalescing
+ANSWER_KEYS = ("message", "result", "result_info", "visualization", "visualization_info", "plan", "code")
+
+
+class AsyncRunner:
+    """
+    Runs coroutines on one background event loop shared by all request threads.
+    Model calls from many concurrent chats wait on this loop instead of each
+    holding a worker busy, and the async Gemini client stays bound to one loop.
+    """
+    
+    def __init__(self):
+        """
+        Initialize the runner. The loop thread starts on first use so that
+        forked workers each start their own.
+        """
+        self.loop = None
+        self.pid = None
+        self._lock = threading.Lock()
+        
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Start the background loop in this process if it is not running.
+        """
+        with self._lock:
+            if self.loop is None or self.pid != os.getpid():
+                self.loop = asyncio.new_event_loop()
+                self.pid = os.getpid()
+                threading.Thread(
+                    target=self.loop.run_forever,
+                    name="chat-pipeline-loop",
+                    daemon=True
+                ).start()
+            return self.loop
+            
+    def run(self, coro):
+        """
+        Run a coroutine on the background loop and wait for its result.
+        
+        Args:
+            coro: Coroutine to run
+            
+        Returns:
+            The coroutine's result
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+        
+    def iterate(self, async_iterator: AsyncIterator) -> Iterator:
+        """
+        Consume an async iterator from synchronous code.
+        
+        Args:
+            async_iterator: Async iterator to drain
+            
+        Yields:
+            Items produced by the async iterator
+        """
+        while True:
+            try:
+                yield self.run(async_iterator.__anext__())
+            except StopAsyncIteration:
+                break
+
+
+class ChatPipeline:
+    """
+    Runs a chat message through the answer cache, the fast path, and the
+    Planner and Executor Agents, yielding an event as each stage finishes.
+    
+    Identical questions on the same dataset that arrive while one is being
+    answered wait for that answer rather than running the agents again.
+    
+    In "single_call" mode one model call returns both the plan and the code;
+    if that response fails validation the message goes through the two-agent
+    flow ("two_agent" mode) instead. Both modes reuse stored code for a plan
+    seen before on the same schema. Time to answer is tracked per mode.
+    
+    Every event is a dict with "event" and "data" keys. The last event is
+    either "done" or "error" and also carries the HTTP "status_code" and the
+    full response body as "data".
+    """
+    
+    MODES = ("single_call", "two_agent")
+    
+    def __init__(
+        self, 
+        planner_agent, 
+        answer_cache: AnswerCache, 
+        fast_path: Optional[FastPathEngine] = None, 
+        mode: str = "single_call", 
+        single_flight: Optional[SingleFlight] = None, 
+        result_store=None
+    ):
+        """
+        Initialize the Chat Pipeline.
+        
+        Args:
+            planner_agent: Shared Planner Agent, or None without an API key
+            answer_cache: Cache of complete answers
+            fast_path: Engine answering simple questions without the LLM, or None
+            mode: "single_call" for one plan and code call, or "two_agent"
+            single_flight: Coalesces identical questions answered at the same time
+            result_store: Store holding the paged results of cached answers
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown pipeline mode: {mode}")
+            
+        self.planner_agent = planner_agent
+        self.answer_cache = answer_cache
+        self.fast_path = fast_path
+        self.mode = mode
+        self.single_flight = single_flight or SingleFlight()
+        self.result_store = result_store
+        self.fallbacks = 0
+        self._timings = {}
+        self._lock = threading.Lock()
+        
+    def get_stats(self) -> Dict:
+        """
+        Get answer counts and average time to answer per mode.
+        
+        Returns:
+            Dictionary with pipeline statistics
+        """
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "fallbacks": self.fallbacks,
+                "coalescing": self.single_flight.get_stats(),
+                "modes": {
+                    mode: {
+                        "answers": count,
+                        "avg_seconds": round(total / count, 4)
+                    }
+                    for mode, (count, total) in self._timings.items()
+                }
+            }
+            
+    def _record_timing(self, mode: str, seconds: float):
+        """
+        Add the time taken to answer a question in the given mode.
+        """
+        with self._lock:
+            count, total = self._timings.get(mode, (0, 0.0))
+            self._timings[mode] = (count + 1, total + seconds)
+        
+    async def run(
+        self, 
+        session: Session, 
+        user_message: str, 
+        include_timings: bool = False
+    ) -> AsyncIterator[Dict]:
+        """
+        Answer a chat message.
+        
+        Args:
+            session: Session owning the dataset and conversation
+            user_message: The user's question
+            include_timings: Add a per-stage timing breakdown to the final event
+            
+        Yields:
+            Stage events: plan, code, result, visualization, then done or error
+        """
+        timings = RequestTimings()
+        
+        async for event in self._run(session, user_message, timings):
+            if "status_code" in event:
+                metrics.record_chat(self._answer_source(event))
+                if include_timings:
+                    event["data"]["timings"] = timings.to_dict()
+            yield event
+            
+    async def _run(self, session: Session, user_message: str, timings: RequestTimings) -> AsyncIterator[Dict]:
+        """
+        Validate the message, then answer it from the answer cache, an
+        identical in-flight request, or the fast path and agents.
+        
+        Args:
+            session: Session owning the dataset and conversation
+            user_message: The user's question
+            timings: Breakdown the stages are recorded into
+            
+        Yields:
+            Stage events: plan, code, result, visualization, then done or error
+        """
+        data_manager = session.data_manager
+        context_manager = session.context_manager
+        executor_agent = session.executor_agent
+        
+        # Check if data is loaded
+        if not data_manager.has_data():
+            yield self._final("error", 400, {
+                "success": False,
+                "error": "Please upload a dataset first"
+            })
+            return
+            
+        # Check if agents are initialized
+        if not self.planner_agent or not executor_agent:
+            yield self._final("error", 500, {
+                "success": False,
+                "error": "API key not configured. Please set GEMINI_API_KEY environment variable."
+            })
+            return
+            
+        if not user_message:
+            yield self._final("error", 400, {
+                "success": False,
+                "error": "Empty message"
+            })
+            return
+            
+        # Summaries of the earlier turns relevant to this question; the
+        # agents see the same text, so follow-ups are cached against it
+        conversation_context = context_manager.get_prompt_context(user_message)
+        
+        # Serve repeated questions on the same dataset from the answer cache
+        with metrics.span("answer_cache", timings):
+            cache_key = self.answer_cache.make_key(
+                dataset_fingerprint=data_manager.get_fingerprint(),
+                question=user_message,
+                conversation_context=conversation_context
+            )
+            cached_answer = self.answer_cache.get(cache_key)
+            if cached_answer and not self._result_available(cached_answer):
+                # Its paged result was pruned, so the answer is computed again
+                self.answer_cache.discard(cache_key)
+                cached_answer = None
+        
+        # Add user message to context
+        context_manager.add_message("user", user_message)
+        
+        if cached_answer:
+            yield self._reuse_answer(session, cached_answer, cached=True)
+            return
+            
+        # Identical questions already being answered wait for that answer
+        # instead of running the agents again
+        leader, flight = self.single_flight.join(cache_key)
+        if not leader:
+            with metrics.span("coalesced_wait", timings):
+                shared_answer = await self.single_flight.wait(flight)
+            if shared_answer:
+                yield self._reuse_answer(session, shared_answer, coalesced=True)
+                return
+                
+        answer = None
+        try:
+            async for event in self._answer(session, user_message, conversation_context, cache_key, timings):
+                if event["event"] == "done":
+                    answer = {key: event["data"][key] for key in ANSWER_KEYS}
+                yield event
+        finally:
+            if leader:
+                self.single_flight.finish(cache_key, answer)
+                
+    async def _answer(
+        self, 
+        session: Session, 
+        user_message: str, 
+        conversation_context: str, 
+        cache_key: str, 
+        timings: RequestTimings
+    ) -> AsyncIterator[Dict]:
+        """
+        Answer a question that is not cached, via the fast path or the agents.
+        
+        Args:
+            session: Session owning the dataset and conversation
+            user_message: The user's question, already added to the context
+            conversation_context: Relevant previous turn summaries from the context manager
+            cache_key: Answer cache key to store the answer under
+            timings: Breakdown the stages are recorded into
+            
+        Yields:
+            Stage events: plan, code, result, visualization, then done or error
+        """
+        data_manager = session.data_manager
+        context_manager = session.context_manager
+        executor_agent = session.executor_agent
+        
+        data_schema = data_manager.get_schema()
+        execution_result = None
+        mode = None
+        started = time.perf_counter()
+        
+        # Simple questions are compiled straight to pandas without the LLM.
+        # Follow-ups depend on the conversation, so they always go to the agents,
+        # as do datasets queried out of core, which have no DataFrame.
+        fast_match = None
+        if (self.fast_path and data_manager.get_dataframe() is not None
+                and not AnswerCache.is_follow_up(user_message)):
+            with metrics.span("fast_path_match", timings):
+                fast_match = self.fast_path.match(user_message, data_schema)
+            
+        if fast_match:
+            plan = fast_match["plan"]
+            yield {"event": "plan", "data": {"plan": plan}}
+            yield {"event": "code", "data": {
+                "code": fast_match["code"],
+                "explanation": fast_match["explanation"],
+                "code_cached": False
+            }}
+            with metrics.span("execute", timings):
+                execution_result = await asyncio.to_thread(
+                    executor_agent.run_code,
+                    fast_match["code"],
+                    fast_match["explanation"],
+                    plan
+                )
+            
+            if execution_result.get("status") == "error":
+                # Fall back to the agents, e.g. when a column holds unexpected values
+                self.fast_path.record_fallback()
+                execution_result = None
+            else:
+                mode = "fast_path"
+                
+        if execution_result is None and self.mode == "single_call":
+            # One model call returns both the plan and the code
+            with metrics.span("plan_and_code", timings):
+                combined = await executor_agent.aplan_and_generate_code(
+                    user_question=user_message,
+                    data_schema=data_schema,
+                    conversation_context=conversation_context
+                )
+            
+            if combined["status"] == "success":
+                mode = "single_call"
+                plan = combined["plan"]
+                yield {"event": "plan", "data": {"plan": plan}}
+                
+                # The model call is already made, but code that worked for the
+                # same plan and schema gives the same answer every time, and
+                # new code is stored for the two-agent flow to reuse as well
+                with metrics.span("stored_code", timings):
+                    store_key, execution_result = await asyncio.to_thread(
+                        executor_agent.run_stored_code, plan, data_schema
+                    )
+                    
+                if execution_result is None:
+                    yield {"event": "code", "data": {
+                        "code": combined["code"],
+                        "explanation": combined["explanation"],
+                        "code_cached": False
+                    }}
+                    with metrics.span("execute", timings):
+                        execution_result = await asyncio.to_thread(
+                            executor_agent.run_code,
+                            combined["code"],
+                            combined["explanation"],
+                            plan,
+                            store_key
+                        )
+                else:
+                    yield {"event": "code", "data": {
+                        "code": execution_result["code"],
+                        "explanation": execution_result["explanation"],
+                        "code_cached": True
+                    }}
+            else:
+                # Invalid combined response: use the two-agent flow
+                with self._lock:
+                    self.fallbacks += 1
+                    
+        if execution_result is None:
+            mode = "two_agent"
+            
+            # Step 1: Planner Agent creates execution plan
+            with metrics.span("plan", timings):
+                plan = await self.planner_agent.acreate_plan(
+                    user_question=user_message,
+                    data_schema=data_schema,
+                    conversation_context=conversation_context,
+                    related_tables=data_manager.get_related_tables()
+                )
+            
+            # Check if planning succeeded
+            if plan.get("status") == "error":
+                yield self._final("error", 500, {
+                    "success": False,
+                    "error": "Planning failed",
+                    "plan": plan
+                })
+                return
+                
+            yield {"event": "plan", "data": {"plan": plan}}
+            
+            # Step 2: Executor Agent reuses stored code or generates new code, then runs it
+            with metrics.span("stored_code", timings):
+                store_key, execution_result = await asyncio.to_thread(
+                    executor_agent.run_stored_code, plan, data_schema
+                )
+            
+            if execution_result is None:
+                with metrics.span("generate_code", timings):
+                    code_response = await executor_agent.agenerate_code(plan, user_message)
+                
+                if code_response["status"] == "error":
+                    execution_result = code_response
+                else:
+                    yield {"event": "code", "data": {
+                        "code": code_response["code"],
+                        "explanation": code_response["explanation"],
+                        "code_cached": False
+                    }}
+                    with metrics.span("execute", timings):
+                        execution_result = await asyncio.to_thread(
+                            executor_agent.run_code,
+                            code_response["code"],
+                            code_response["explanation"],
+                            plan,
+                            store_key
+                        )
+            else:
+                yield {"event": "code", "data": {
+                    "code": execution_result["code"],
+                    "explanation": execution_result["explanation"],
+                    "code_cached": True
+                }}
+                
+        self._record_timing(mode, time.perf_counter() - started)
+        
+        # Check if execution succeeded
+        if execution_result.get("status") == "error":
+            response_message = f"I encountered an error: {execution_result.get('error', 'Unknown error')}"
+            context_manager.add_message("assistant", response_message, {
+                "error": True,
+                "plan": plan,
+                "code": execution_result.get("code")
+            }, columns=data_schema)
+            
+            yield self._final("error", 500, {
+                "success": False,
+                "error": execution_result.get("error"),
+                "message": response_message,
+                "plan": plan,
+                "code": execution_result.get("code")
+            })
+            return
+            
+        # Format the response
+        result = execution_result.get("result")
+        result_info = execution_result.get("result_info")
+        visualization = execution_result.get("visualization")
+        visualization_info = execution_result.get("visualization_info")
+        response_message = execution_result.get("explanation", "")
+        
+        yield {"event": "result", "data": {"result": result, "result_info": result_info}}
+        
+        if visualization is not None:
+            yield {"event": "visualization", "data": {
+                "visualization": visualization,
+                "visualization_info": visualization_info
+            }}
+            
+        answer = {
+            "message": response_message,
+            "result": result,
+            "result_info": result_info,
+            "visualization": visualization,
+            "visualization_info": visualization_info,
+            "plan": plan,
+            "code": execution_result.get("code")
+        }
+        self.answer_cache.put(cache_key, answer, data_manager.get_fingerprint())
+        
+        # Add assistant message to context
+        self._remember_answer(session, answer)
+        
+        yield self._final("done", 200, {
+            "success": True,
+            **answer,
+            "cached": False,
+            "coalesced": False,
+            "fast_path": mode == "fast_path",
+            "pipeline_mode": mode,
+            "conversation_history": context_manager.get_history()
+        })
+        
+    @staticmethod
+    def _remember_answer(session: Session, answer: Dict):
+        """
+        Add an answer to the session's conversation, summarized for the agents' memory.
+        
+        Args:
+            session: Session whose conversation the answer belongs to
+            answer: Complete answer with the ANSWER_KEYS fields
+        """
+        session.context_manager.add_message("assistant", answer["message"], {
+            "has_visualization": answer["visualization"] is not None,
+            "plan": answer["plan"],
+            "code": answer["code"],
+            "result_shape": ContextManager.describe_result(answer["result"], answer["result_info"]),
+            "result_id": (answer["result_info"] or {}).get("result_id")
+        }, columns=session.data_manager.get_schema())
+        
+    def _result_available(self, answer: Dict) -> bool:
+        """
+        Check that a cached answer's paged result can still be fetched, and
+        keep it in the result store for as long as the answer is served.
+        """
+        result_id = (answer.get("result_info") or {}).get("result_id")
+        if result_id is None or self.result_store is None:
+            return True
+        return self.result_store.touch(result_id)
+        
+    def _reuse_answer(self, session: Session, answer: Dict, cached: bool = False, coalesced: bool = False) -> Dict:
+        """
+        Record an answer computed elsewhere in this conversation and build its terminal event.
+        
+        Args:
+            session: Session whose conversation the answer is added to
+            answer: Answer from the cache or from a coalesced request
+            cached: Whether it came from the answer cache
+            coalesced: Whether it was shared by an identical in-flight request
+            
+        Returns:
+            The done event
+        """
+        self._remember_answer(session, answer)
+        
+        return self._final("done", 200, {
+            "success": True,
+            **answer,
+            "cached": cached,
+            "coalesced": coalesced,
+            "conversation_history": session.context_manager.get_history()
+        })
+        
+    @staticmethod
+    def _answer_source(final_event: Dict) -> str:
+        """
+        Name how a final event's answer was produced, for the chat metrics.
+        """
+        body = final_event["data"]
+        if final_event["event"] == "error":
+            return "error"
+        if body.get("cached"):
+            return "cache"
+        if body.get("coalesced"):
+            return "coalesced"
+        return body.get("pipeline_mode") or "unknown"
+        
+    @staticmethod
+    def _final(event: str, status_code: int, body: Dict) -> Dict:
+        """
+        Build the terminal event carrying the full response body.
+        """
+        return {"event": event, "status_code": status_code, "data": body}
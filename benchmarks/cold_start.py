@@ -0,0 +1,78 @@
+"""
+Measure a backend worker's cold start in a fresh interpreter
+
+Run by run_benchmarks.py as a subprocess; prints one JSON object with the
+time to import the app, answer the first /api/health (ready_seconds covers
+both), take the first upload and answer the first chat.
+"""
+
+import time
+
+STARTED = time.perf_counter()
+
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "plotly", "google.genai")
+
+
+def main():
+    """
+    Start the app and time its first requests.
+    """
+    csv_path = sys.argv[1]
+    
+    start = time.perf_counter()
+    from backend.app import app
+    import_seconds = time.perf_counter() - start
+    loaded_after_import = [name for name in HEAVY_MODULES if name in sys.modules]
+    
+    client = app.test_client()
+    
+    start = time.perf_counter()
+    client.get("/api/health")
+    health_seconds = time.perf_counter() - start
+    ready_seconds = time.perf_counter() - STARTED
+    
+    # Installed only now so the mock does not import google-genai ahead of the app
+    from benchmarks import mock_llm
+    mock_llm.install(0.0)
+    
+    with open(csv_path, "rb") as file:
+        content = file.read()
+        
+    start = time.perf_counter()
+    response = client.post(
+        "/api/upload",
+        data={"file": (io.BytesIO(content), os.path.basename(csv_path))},
+        content_type="multipart/form-data"
+    )
+    upload_seconds = time.perf_counter() - start
+    session_id = response.headers.get("X-Session-Id")
+    
+    # A chart question, so the first chat also pays for the plotting stack
+    start = time.perf_counter()
+    response = client.post(
+        "/api/chat",
+        json={"message": mock_llm.find_scenario("over time")["question"]},
+        headers={"X-Session-Id": session_id}
+    )
+    chat_seconds = time.perf_counter() - start
+    
+    print(json.dumps({
+        "ready_seconds": round(ready_seconds, 4),
+        "import_app_seconds": round(import_seconds, 4),
+        "first_health_seconds": round(health_seconds, 4),
+        "first_upload_seconds": round(upload_seconds, 4),
+        "first_chat_seconds": round(chat_seconds, 4),
+        "first_chat_ok": response.status_code == 200,
+        "heavy_modules_after_import": loaded_after_import
+    }))
+
+
+if __name__ == "__main__":
+    main()
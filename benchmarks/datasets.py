@@ -0,0 +1,96 @@
+"""
+Synthetic sales datasets for the benchmarks
+"""
+
+from typing import Dict
+import os
+
+import numpy as np
+import pandas as pd
+
+# Named dataset sizes accepted by --sizes
+SIZES: Dict[str, int] = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+REGIONS = ["Central", "East", "South", "West"]
+SEGMENTS = ["Consumer", "Corporate", "Home Office"]
+SHIP_MODES = ["First Class", "Second Class", "Standard Class", "Same Day"]
+CATEGORIES = {
+    "Furniture": ["Bookcases", "Chairs", "Furnishings", "Tables"],
+    "Office Supplies": ["Appliances", "Art", "Binders", "Paper", "Storage"],
+    "Technology": ["Accessories", "Copiers", "Machines", "Phones"],
+}
+
+# Rows generated and written at a time, so 10M rows never sit in memory as text
+WRITE_CHUNK_ROWS = 500_000
+
+
+def make_frame(rows: int, seed: int = 0, start_row: int = 0) -> pd.DataFrame:
+    """
+    Generate a block of sales orders shaped like the sample dataset.
+    
+    Args:
+        rows: Number of rows
+        seed: Random seed; the same seed and start_row give the same rows
+        start_row: Index of the first row, used for order ids and dates
+        
+    Returns:
+        DataFrame of orders
+    """
+    rng = np.random.default_rng([seed, start_row])
+    sub_categories = [(category, sub) for category, subs in CATEGORIES.items() for sub in subs]
+    sub_index = rng.integers(0, len(sub_categories), rows)
+    
+    quantity = rng.integers(1, 15, rows)
+    sales = np.round(rng.lognormal(4.0, 1.2, rows), 2)
+    discount = rng.choice([0.0, 0.1, 0.2, 0.3, 0.5, 0.8], rows, p=[0.5, 0.15, 0.15, 0.1, 0.06, 0.04])
+    profit = np.round(sales * (0.3 - discount) * rng.uniform(0.5, 1.5, rows), 2)
+    
+    # Orders are spread over four years, in row order
+    order_seconds = (np.arange(start_row, start_row + rows) * 7919) % (4 * 365 * 86400)
+    
+    return pd.DataFrame({
+        "Order ID": [f"ORD-{start_row + i:08d}" for i in range(rows)],
+        "Order Date": pd.Timestamp("2021-01-01") + pd.to_timedelta(np.sort(order_seconds), unit="s"),
+        "Ship Mode": np.take(SHIP_MODES, rng.integers(0, len(SHIP_MODES), rows)),
+        "Segment": np.take(SEGMENTS, rng.integers(0, len(SEGMENTS), rows)),
+        "Region": np.take(REGIONS, rng.integers(0, len(REGIONS), rows)),
+        "Category": [sub_categories[i][0] for i in sub_index],
+        "Sub-Category": [sub_categories[i][1] for i in sub_index],
+        "Product Name": [f"Product {i:04d}" for i in rng.zipf(1.3, rows) % 2000],
+        "Sales": sales,
+        "Quantity": quantity,
+        "Discount": discount,
+        "Profit": profit,
+    })
+
+
+def ensure_csv(rows: int, data_dir: str, seed: int = 0) -> str:
+    """
+    Write a synthetic CSV of the given size unless it already exists.
+    
+    Args:
+        rows: Number of rows
+        data_dir: Folder where generated files are kept between runs
+        seed: Random seed
+        
+    Returns:
+        Path of the CSV file
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"sales_{rows}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+        
+    temp_path = f"{path}.tmp"
+    for start_row in range(0, rows, WRITE_CHUNK_ROWS):
+        chunk = make_frame(min(WRITE_CHUNK_ROWS, rows - start_row), seed, start_row)
+        chunk.to_csv(temp_path, mode="w" if start_row == 0 else "a", header=start_row == 0, index=False)
+        
+    os.replace(temp_path, path)
+    return path
@@ -0,0 +1,239 @@
+"""
+Deterministic local stand-in for google.genai.Client
+"""
+
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import asyncio
+import json
+import threading
+import time
+
+# Canned answers, chosen by the first keyword found in the question
+SCENARIOS: List[Dict] = [
+    {
+        "name": "group_sum",
+        "keywords": ["by region"],
+        "question": "What are the total sales by region",
+        "visualization_type": "none",
+        "code": "result = df.groupby('Region', observed=True)['Sales'].sum().reset_index()"
+    },
+    {
+        "name": "top_n",
+        "keywords": ["top products"],
+        "question": "Which are the top products by profit",
+        "visualization_type": "none",
+        "code": "result = df.groupby('Product Name', observed=True)['Profit'].sum().nlargest(10).reset_index()"
+    },
+    {
+        "name": "bar_chart",
+        "keywords": ["bar chart"],
+        "question": "Show a bar chart of profit per category",
+        "visualization_type": "bar",
+        "code": (
+            "import plotly.express as px\n"
+            "result = df.groupby('Category', observed=True)['Profit'].sum().reset_index()\n"
+            "fig = px.bar(result, x='Category', y='Profit')"
+        )
+    },
+    {
+        "name": "line_chart",
+        "keywords": ["over time"],
+        "question": "Plot sales over time",
+        "visualization_type": "line",
+        "code": (
+            "import plotly.express as px\n"
+            "result = df[['Order Date', 'Sales']].sort_values('Order Date')\n"
+            "fig = px.line(result, x='Order Date', y='Sales')"
+        )
+    },
+    {
+        "name": "scatter",
+        "keywords": ["relationship"],
+        "question": "What is the relationship between discount and profit",
+        "visualization_type": "scatter",
+        "code": (
+            "import plotly.express as px\n"
+            "result = df['Discount'].corr(df['Profit'])\n"
+            "fig = px.scatter(df, x='Discount', y='Profit')"
+        )
+    },
+    {
+        "name": "large_filter",
+        "keywords": ["list orders"],
+        "question": "List orders with a loss",
+        "visualization_type": "none",
+        "code": "result = df[df['Profit'] < 0]"
+    },
+]
+
+DEFAULT_SCENARIO = {
+    "name": "describe",
+    "keywords": [],
+    "question": "Describe the numeric columns",
+    "visualization_type": "none",
+    "code": "result = df.describe().reset_index()"
+}
+
+
+def find_scenario(question: str) -> Dict:
+    """
+    Get the canned scenario for a question.
+    
+    Args:
+        question: User question
+        
+    Returns:
+        The first scenario whose keyword appears in the question, or the default
+    """
+    lowered = question.lower()
+    for scenario in SCENARIOS:
+        if any(keyword in lowered for keyword in scenario["keywords"]):
+            return scenario
+    return DEFAULT_SCENARIO
+
+
+def canned_response(prompt: str) -> str:
+    """
+    Build the response text for a prompt.
+    The same JSON satisfies the planner, code and combined plan-and-code
+    prompts: it has the plan keys at the top level and under "plan", plus
+    the code and explanation.
+    
+    Args:
+        prompt: Prompt sent to the model
+        
+    Returns:
+        JSON response text
+    """
+    # Every agent prompt ends its context with "Question: <user question>"
+    question = prompt.rsplit("Question:", 1)[-1].split("\n", 1)[0].strip()
+    scenario = find_scenario(question)
+    
+    plan = {
+        "question_analysis": f"Benchmark scenario {scenario['name']}",
+        "requires_visualization": scenario["visualization_type"] != "none",
+        "visualization_type": scenario["visualization_type"],
+        "steps": ["Select the relevant columns", "Compute the answer"],
+        "data_operations": [scenario["name"]],
+        "expected_output": "Table or chart",
+        "reasoning": "Canned benchmark response"
+    }
+    
+    return json.dumps({
+        **plan,
+        "plan": plan,
+        "code": scenario["code"],
+        "explanation": f"Answer computed by the {scenario['name']} scenario.",
+        "returns_visualization": plan["requires_visualization"]
+    })
+
+
+class MockResponse:
+    """
+    Minimal generate_content response.
+    """
+    
+    def __init__(self, text: str, prompt: str):
+        """
+        Initialize the response with rough token counts.
+        
+        Args:
+            text: Response text
+            prompt: Prompt it answers
+        """
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(text) // 4
+        )
+
+
+class MockModels:
+    """
+    Stand-in for client.models with a fixed simulated latency.
+    """
+    
+    def __init__(self, owner: "MockGenaiClient"):
+        """
+        Initialize the models namespace.
+        
+        Args:
+            owner: Client holding the latency setting and call counter
+        """
+        self.owner = owner
+        
+    def generate_content(self, model: str, contents, config=None) -> MockResponse:
+        """
+        Return the canned response for the prompt after the simulated latency.
+        """
+        self.owner.count_call()
+        if self.owner.latency_seconds:
+            time.sleep(self.owner.latency_seconds)
+        return MockResponse(canned_response(str(contents)), str(contents))
+
+
+class MockAsyncModels:
+    """
+    Stand-in for client.aio.models.
+    """
+    
+    def __init__(self, owner: "MockGenaiClient"):
+        """
+        Initialize the async models namespace.
+        
+        Args:
+            owner: Client holding the latency setting and call counter
+        """
+        self.owner = owner
+        
+    async def generate_content(self, model: str, contents, config=None) -> MockResponse:
+        """
+        Return the canned response for the prompt after the simulated latency.
+        """
+        self.owner.count_call()
+        if self.owner.latency_seconds:
+            await asyncio.sleep(self.owner.latency_seconds)
+        return MockResponse(canned_response(str(contents)), str(contents))
+
+
+class MockGenaiClient:
+    """
+    Deterministic replacement for genai.Client that answers every prompt
+    from SCENARIOS without network access. latency_seconds simulates the
+    model's response time so concurrency effects stay visible.
+    """
+    
+    latency_seconds = 0.0
+    calls = 0
+    _lock = threading.Lock()
+    
+    def __init__(self, *args, **kwargs):
+        """
+        Accept and ignore genai.Client arguments (api_key, http_options).
+        """
+        self.models = MockModels(self)
+        self.aio = SimpleNamespace(models=MockAsyncModels(self))
+        
+    @classmethod
+    def count_call(cls):
+        """
+        Count one model call across all client instances.
+        """
+        with cls._lock:
+            cls.calls += 1
+
+
+def install(latency_seconds: Optional[float] = None):
+    """
+    Replace google.genai.Client with MockGenaiClient.
+    Must run before the backend creates its Gemini client.
+    
+    Args:
+        latency_seconds: Simulated model latency per call
+    """
+    from google import genai
+    
+    if latency_seconds is not None:
+        MockGenaiClient.latency_seconds = latency_seconds
+    genai.Client = MockGenaiClient
@@ -0,0 +1,464 @@
+"""
+Benchmark the ingestion, execution and chat paths with a local mock LLM
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --sizes 1k,10k,100k,1m,10m --concurrency 1,8,32
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<earlier run>.json
+
+Results are written as JSON under benchmarks/results so runs from different
+versions can be compared with --compare.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running as a script as well as with -m
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import mock_llm
+from benchmarks.datasets import SIZES, ensure_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(latencies: List[float]) -> Dict:
+    """
+    Summarize request latencies in milliseconds.
+    
+    Args:
+        latencies: Latencies in seconds
+        
+    Returns:
+        Dict with mean, p50, p90, p95, p99 and max
+    """
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return {
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(p50), 2),
+        "p90_ms": round(float(p90), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(values.max()), 2)
+    }
+
+
+def timed(func, repeat: int) -> float:
+    """
+    Run a function several times and return the median duration in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return round(statistics.median(durations), 6)
+
+
+def bench_ingestion(path: str, work_dir: str, repeat: int) -> Dict:
+    """
+    Time parsing an upload, reloading it from the dataset store, profiling it
+    and serving get_data_info from the stored and the in-memory profile.
+    
+    Args:
+        path: CSV file to load
+        work_dir: Scratch folder for upload folders
+        repeat: Runs per measurement (the median is reported)
+        
+    Returns:
+        Ingestion measurements
+    """
+    from utils.data_manager import DataManager
+    from utils.profiler import build_profile
+    
+    def parse():
+        # A fresh upload folder so the dataset store cannot short-cut the parse
+        upload_folder = tempfile.mkdtemp(dir=work_dir)
+        manager = DataManager(upload_folder=upload_folder, max_size_mb=1_000_000)
+        with open(path, "rb") as file:
+            success, message, _ = manager.load_file(file, os.path.basename(path))
+        shutil.rmtree(upload_folder, ignore_errors=True)
+        if not success:
+            raise RuntimeError(message)
+            
+    store_folder = tempfile.mkdtemp(dir=work_dir)
+    manager = DataManager(upload_folder=store_folder, max_size_mb=1_000_000)
+    
+    def reload():
+        with open(path, "rb") as file:
+            manager.load_file(file, os.path.basename(path))
+            
+    def stored_profile():
+        # Profiles are kept in the dataset store once built
+        manager.profile = None
+        manager.get_data_info()
+        
+    parse_seconds = timed(parse, repeat)
+    reload()
+    store_reload_seconds = timed(reload, repeat)
+    df = manager.get_dataframe()
+    profile_seconds = timed(lambda: build_profile(df, approximate=manager.approximate_profile), repeat)
+    data_info_seconds = timed(stored_profile, repeat)
+    data_info_cached_seconds = timed(manager.get_data_info, repeat)
+    
+    return {
+        "file_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+        "parse_seconds": parse_seconds,
+        "rows_per_second": round(len(df) / parse_seconds) if parse_seconds else None,
+        "store_reload_seconds": store_reload_seconds,
+        "profile_build_seconds": profile_seconds,
+        "get_data_info_seconds": data_info_seconds,
+        "get_data_info_cached_seconds": data_info_cached_seconds,
+        "memory_mb": round(df.memory_usage(deep=True).sum() / 1024 / 1024, 2),
+        "_manager": manager
+    }
+
+
+def bench_execution(df: pd.DataFrame, work_dir: str, repeat: int) -> Dict:
+    """
+    Time executing each scenario's code on a dataset, with the stage breakdown.
+    
+    Args:
+        df: Dataset to run the code on
+        work_dir: Scratch folder for the result store
+        repeat: Runs per scenario (the median is reported)
+        
+    Returns:
+        Per-scenario measurements
+    """
+    from agents.executor_agent import ExecutorAgent
+    from utils.figure_compactor import FigureCompactor
+    from utils.metrics import RequestTimings, metrics
+    from utils.result_store import ResultStore
+    
+    executor = ExecutorAgent(
+        api_key="benchmark",
+        result_store=ResultStore(os.path.join(work_dir, "results")),
+        figure_compactor=FigureCompactor()
+    )
+    executor.load_data(df)
+    
+    results = {}
+    for scenario in mock_llm.SCENARIOS + [mock_llm.DEFAULT_SCENARIO]:
+        runs = []
+        for _ in range(repeat):
+            timings = RequestTimings()
+            with metrics.span("execute", timings):
+                execution_result = executor._execute_code(scenario["code"])
+            if execution_result["status"] != "success":
+                raise RuntimeError(f"{scenario['name']}: {execution_result.get('error')}")
+            runs.append((timings.to_dict()["stages_ms"], execution_result))
+            
+        stages = {
+            stage: round(statistics.median(run[0].get(stage, 0.0) for run in runs), 3)
+            for stage in runs[0][0]
+        }
+        execution_result = runs[-1][1]
+        results[scenario["name"]] = {
+            "execute_ms": stages.pop("execute"),
+            "stages_ms": stages,
+            "result_bytes": len(json.dumps(execution_result.get("result"), default=str)),
+            "visualization_bytes": len(execution_result.get("visualization") or "")
+        }
+        
+    return results
+
+
+def bench_chat(path: str, concurrency_levels: List[int], requests_per_level: int) -> Dict:
+    """
+    Measure end-to-end /api/chat latency and throughput under concurrency.
+    Every worker thread has its own session. Each level sends unique
+    questions (so every request runs the pipeline) and then repeats them
+    (so every request is an answer cache hit).
+    
+    Args:
+        path: CSV file uploaded to each session
+        concurrency_levels: Numbers of concurrent clients to test
+        requests_per_level: Requests sent per level and phase
+        
+    Returns:
+        Measurements per concurrency level and phase
+    """
+    from backend.app import app
+    
+    with open(path, "rb") as file:
+        content = file.read()
+        
+    def upload() -> str:
+        response = app.test_client().post(
+            "/api/upload",
+            data={"file": (io.BytesIO(content), os.path.basename(path))},
+            content_type="multipart/form-data"
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload failed: {response.get_json()}")
+        return response.headers["X-Session-Id"]
+        
+    def ask(session_id: str, question: str) -> Dict:
+        start = time.perf_counter()
+        response = app.test_client().post(
+            "/api/chat", json={"message": question}, headers={"X-Session-Id": session_id}
+        )
+        body = response.get_json() or {}
+        return {
+            "seconds": time.perf_counter() - start,
+            "ok": response.status_code == 200 and body.get("success", False),
+            "source": "cache" if body.get("cached") else body.get("pipeline_mode") or "error"
+        }
+        
+    scenarios = mock_llm.SCENARIOS
+    results = {}
+    
+    for level in concurrency_levels:
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            session_ids = list(pool.map(lambda _: upload(), range(level)))
+            questions = [
+                (session_ids[i % level], f"{scenarios[i % len(scenarios)]['question']} (benchmark {level}-{i})")
+                for i in range(requests_per_level)
+            ]
+            
+            level_results = {}
+            for phase in ("pipeline", "cached"):
+                calls_before = mock_llm.MockGenaiClient.calls
+                start = time.perf_counter()
+                outcomes = list(pool.map(lambda item: ask(*item), questions))
+                elapsed = time.perf_counter() - start
+                
+                sources: Dict[str, int] = {}
+                for outcome in outcomes:
+                    sources[outcome["source"]] = sources.get(outcome["source"], 0) + 1
+                    
+                level_results[phase] = {
+                    "requests": len(outcomes),
+                    "errors": sum(1 for outcome in outcomes if not outcome["ok"]),
+                    "throughput_rps": round(len(outcomes) / elapsed, 2),
+                    "latency": percentiles([outcome["seconds"] for outcome in outcomes]),
+                    "model_calls": mock_llm.MockGenaiClient.calls - calls_before,
+                    "sources": sources
+                }
+                
+        results[f"concurrency_{level}"] = level_results
+        
+    return results
+
+
+def bench_cold_start(path: str, runs: int) -> Dict:
+    """
+    Measure worker cold start in fresh interpreters, with lazy loading
+    (the default) and with PRELOAD_APP=true.
+    
+    Args:
+        path: CSV file for the first upload
+        runs: Interpreters started per mode (the median is reported)
+        
+    Returns:
+        Measurements per mode
+    """
+    results = {}
+    for mode, preload in (("lazy", "false"), ("preload", "true")):
+        env = {**os.environ, "PRELOAD_APP": preload, "LOG_LEVEL": "WARNING"}
+        samples = []
+        for _ in range(runs):
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.cold_start", path],
+                cwd=ROOT, env=env, capture_output=True, text=True, check=True
+            )
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            
+        results[mode] = {
+            key: round(statistics.median(sample[key] for sample in samples), 4)
+            for key in samples[0] if key.endswith("_seconds")
+        }
+        results[mode]["first_chat_ok"] = all(sample["first_chat_ok"] for sample in samples)
+        results[mode]["heavy_modules_after_import"] = samples[0]["heavy_modules_after_import"]
+        
+    return results
+
+
+def git_commit() -> Optional[str]:
+    """
+    Get the current commit, if the benchmark runs from a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(data, prefix: str = "") -> Dict[str, float]:
+    """
+    Flatten nested results into dotted keys with numeric values.
+    """
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix[:-1]] = data
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    List measurements that got worse by more than threshold between two runs.
+    Durations and latencies are worse when higher, throughput when lower.
+    
+    Args:
+        baseline: Earlier results
+        current: New results
+        threshold: Relative change to report, e.g. 0.1 for 10%
+        
+    Returns:
+        Human-readable regression lines
+    """
+    old = flatten(baseline.get("results", {}))
+    new = flatten(current.get("results", {}))
+    regressions = []
+    
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        if before <= 0:
+            continue
+        if key.endswith("_seconds") and max(before, after) < 0.001:
+            # Sub-millisecond timings are mostly noise
+            continue
+        if key.endswith("_ms") and max(before, after) < 1:
+            continue
+        if key.endswith(("_seconds", "_ms")):
+            change = (after - before) / before
+        elif key.endswith(("_rps", "rows_per_second")):
+            change = (before - after) / before
+        else:
+            continue
+        if change > threshold:
+            regressions.append(f"{key}: {before} -> {after} ({change:+.0%} worse)")
+            
+    return regressions
+
+
+def main():
+    """
+    Run the benchmarks and write the results file.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the Intelligent Data Room backend")
+    parser.add_argument("--sizes", default="1k,10k,100k,1m",
+                        help=f"Dataset sizes for ingestion and execution ({', '.join(SIZES)})")
+    parser.add_argument("--chat-size", default="100k", help="Dataset size used for the chat benchmark")
+    parser.add_argument("--concurrency", default="1,4,16", help="Concurrent clients for the chat benchmark")
+    parser.add_argument("--requests", type=int, default=48, help="Chat requests per concurrency level and phase")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per ingestion/execution measurement")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated model latency in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic datasets")
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "benchmarks", ".data"),
+                        help="Folder where generated datasets are kept between runs")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>_<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to report regressions against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported by --compare")
+    parser.add_argument("--skip-chat", action="store_true", help="Only run the ingestion and execution benchmarks")
+    parser.add_argument("--cold-start-runs", type=int, default=3, help="Fresh interpreters started per cold start mode")
+    args = parser.parse_args()
+    
+    sizes = [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes + [args.chat_size] if size not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(unknown)}")
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    
+    work_dir = tempfile.mkdtemp(prefix="dataroom-bench-")
+    
+    # The backend reads its configuration at import; keep anything set by the caller
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("UPLOAD_FOLDER", os.path.join(work_dir, "uploads"))
+    os.environ.setdefault("MAX_UPLOAD_SIZE_MB", "4096")
+    os.environ.setdefault("SESSION_MEMORY_CAP_MB", "8192")
+    os.environ.setdefault("GEMINI_REQUESTS_PER_SECOND", "10000")
+    os.environ.setdefault("GEMINI_BURST", "10000")
+    os.environ.setdefault("GEMINI_MAX_CONCURRENCY", "256")
+    mock_llm.install(args.llm_latency)
+    
+    results: Dict = {"datasets": {}}
+    try:
+        for size in sizes:
+            rows = SIZES[size]
+            print(f"[{size}] generating {rows:,} rows...", flush=True)
+            path = ensure_csv(rows, args.data_dir, args.seed)
+            
+            print(f"[{size}] ingestion", flush=True)
+            ingestion = bench_ingestion(path, work_dir, args.repeat)
+            manager = ingestion.pop("_manager")
+            
+            print(f"[{size}] execution", flush=True)
+            execution = bench_execution(manager.get_dataframe(), work_dir, args.repeat)
+            
+            results["datasets"][size] = {"rows": rows, "ingestion": ingestion, "execution": execution}
+            
+        print("[cold start]", flush=True)
+        results["cold_start"] = bench_cold_start(ensure_csv(SIZES["1k"], args.data_dir, args.seed), args.cold_start_runs)
+        
+        if not args.skip_chat:
+            print(f"[chat] {args.chat_size} rows, concurrency {args.concurrency}", flush=True)
+            path = ensure_csv(SIZES[args.chat_size], args.data_dir, args.seed)
+            results["chat"] = {
+                "dataset": args.chat_size,
+                **bench_chat(path, concurrency_levels, args.requests)
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "llm_latency_seconds": args.llm_latency,
+            "args": vars(args)
+        },
+        "results": results
+    }
+    
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{commit or 'local'}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, report, args.threshold)
+        print(f"{len(regressions)} regressions against {args.compare}")
+        for line in regressions:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
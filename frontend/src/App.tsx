@@ -53,7 +53,9 @@ function App() {
                         has_visualization: !!response.visualization,
                         plan: response.plan,
                         visualization: response.visualization,
+                        visualization_info: response.visualization_info,
                         result: response.result,
+                        result_info: response.result_info,
                     },
                 };
 
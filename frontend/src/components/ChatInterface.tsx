@@ -82,14 +82,20 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ messages, onSendMessage,
                                     {/* Display Result Data inline */}
                                     {message.metadata?.result && message.role === 'assistant' && (
                                         <div className="inline-result">
-                                            <ResultDisplay result={message.metadata.result} />
+                                            <ResultDisplay
+                                                result={message.metadata.result}
+                                                resultInfo={message.metadata.result_info}
+                                            />
                                         </div>
                                     )}
 
                                     {/* Display Visualization inline */}
-                                    {message.metadata?.visualization && message.role === 'assistant' && (
+                                    {(message.metadata?.visualization || message.metadata?.visualization_info?.dropped) && message.role === 'assistant' && (
                                         <div className="inline-visualization">
-                                            <Visualization visualizationData={message.metadata.visualization} />
+                                            <Visualization
+                                                visualizationData={message.metadata.visualization ?? null}
+                                                visualizationInfo={message.metadata.visualization_info}
+                                            />
                                         </div>
                                     )}
 
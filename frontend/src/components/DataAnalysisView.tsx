@@ -174,14 +174,20 @@ const DataAnalysisView: React.FC<DataAnalysisViewProps> = ({
                                             {/* Display Result Data */}
                                             {message.metadata?.result && message.role === 'assistant' && (
                                                 <div className="message-result">
-                                                    <ResultDisplay result={message.metadata.result} />
+                                                    <ResultDisplay
+                                                        result={message.metadata.result}
+                                                        resultInfo={message.metadata.result_info}
+                                                    />
                                                 </div>
                                             )}
 
                                             {/* Display Visualization */}
-                                            {message.metadata?.visualization && message.role === 'assistant' && (
+                                            {(message.metadata?.visualization || message.metadata?.visualization_info?.dropped) && message.role === 'assistant' && (
                                                 <div className="message-visualization">
-                                                    <Visualization visualizationData={message.metadata.visualization} />
+                                                    <Visualization
+                                                        visualizationData={message.metadata.visualization ?? null}
+                                                        visualizationInfo={message.metadata.visualization_info}
+                                                    />
                                                 </div>
                                             )}
                                         </div>
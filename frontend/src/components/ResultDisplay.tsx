@@ -2,33 +2,63 @@
  * Result Display Component
  */
 
-import React from 'react';
+import React, { useState } from 'react';
+import { apiService } from '../services/api';
+import { ResultInfo } from '../types';
 import '../styles/ResultDisplay.css';
 
 interface ResultDisplayProps {
     result: any;
+    resultInfo?: ResultInfo | null;
 }
 
-const ResultDisplay: React.FC<ResultDisplayProps> = ({ result }) => {
-    if (!result) {
+const ResultDisplay: React.FC<ResultDisplayProps> = ({ result, resultInfo }) => {
+    // Large results arrive one page at a time; later pages are fetched on demand
+    const [rows, setRows] = useState<any>(result);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
+    const [loadError, setLoadError] = useState<string | null>(null);
+
+    if (!rows) {
         return null;
     }
 
+    const loadedRows = Array.isArray(rows) ? rows.length : 0;
+    const canLoadMore = !!resultInfo?.result_id && loadedRows < resultInfo.total_rows;
+
+    const handleLoadMore = async () => {
+        if (!resultInfo?.result_id) return;
+
+        setIsLoadingMore(true);
+        setLoadError(null);
+        try {
+            const page = await apiService.getResultPage(resultInfo.result_id, loadedRows, resultInfo.page_rows);
+            if (page.success && page.rows) {
+                setRows((prev: any[]) => [...prev, ...page.rows!]);
+            } else {
+                setLoadError(page.error || 'Could not load more rows');
+            }
+        } catch (error: any) {
+            setLoadError(error.response?.data?.error || error.message);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     const renderResult = () => {
         // If result is an array of objects (table data)
-        if (Array.isArray(result) && result.length > 0) {
+        if (Array.isArray(rows) && rows.length > 0) {
             return (
                 <div className="table-container">
                     <table className="result-table">
                         <thead>
                             <tr>
-                                {Object.keys(result[0]).map((key) => (
+                                {Object.keys(rows[0]).map((key) => (
                                     <th key={key}>{key}</th>
                                 ))}
                             </tr>
                         </thead>
                         <tbody>
-                            {result.map((row, idx) => (
+                            {rows.map((row: Record<string, any>, idx: number) => (
                                 <tr key={idx}>
                                     {Object.values(row).map((value: any, colIdx) => (
                                         <td key={colIdx}>
@@ -44,10 +74,10 @@ const ResultDisplay: React.FC<ResultDisplayProps> = ({ result }) => {
         }
 
         // If result is a simple object
-        if (typeof result === 'object' && !Array.isArray(result)) {
+        if (typeof rows === 'object' && !Array.isArray(rows)) {
             return (
                 <div className="object-result">
-                    {Object.entries(result).map(([key, value]) => (
+                    {Object.entries(rows).map(([key, value]) => (
                         <div key={key} className="result-row">
                             <span className="result-key">{key}:</span>
                             <span className="result-value">
@@ -63,7 +93,7 @@ const ResultDisplay: React.FC<ResultDisplayProps> = ({ result }) => {
         return (
             <div className="simple-result">
                 <span className="result-value">
-                    {typeof result === 'number' ? result.toLocaleString() : String(result)}
+                    {typeof rows === 'number' ? rows.toLocaleString() : String(rows)}
                 </span>
             </div>
         );
@@ -77,6 +107,19 @@ const ResultDisplay: React.FC<ResultDisplayProps> = ({ result }) => {
             <div className="result-content">
                 {renderResult()}
             </div>
+            {resultInfo && (
+                <div className="result-footer">
+                    <span className="result-count">
+                        Showing {loadedRows.toLocaleString()} of {resultInfo.total_rows.toLocaleString()} rows
+                    </span>
+                    {canLoadMore && (
+                        <button className="load-more-btn" onClick={handleLoadMore} disabled={isLoadingMore}>
+                            {isLoadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    )}
+                    {loadError && <span className="result-error">{loadError}</span>}
+                </div>
+            )}
         </div>
     );
 };
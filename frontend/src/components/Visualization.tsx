@@ -4,13 +4,26 @@
 
 import React from 'react';
 import Plot from 'react-plotly.js';
+import { VisualizationInfo } from '../types';
 import '../styles/Visualization.css';
 
 interface VisualizationProps {
     visualizationData: string | null;
+    visualizationInfo?: VisualizationInfo | null;
 }
 
-const Visualization: React.FC<VisualizationProps> = ({ visualizationData }) => {
+const Visualization: React.FC<VisualizationProps> = ({ visualizationData, visualizationInfo }) => {
+    if (visualizationInfo?.dropped) {
+        return (
+            <div className="visualization-container error">
+                <p>
+                    The chart over {visualizationInfo.original_points.toLocaleString()} points was too large to
+                    display; try aggregating the data first.
+                </p>
+            </div>
+        );
+    }
+
     if (!visualizationData) {
         return null;
     }
@@ -40,6 +53,12 @@ const Visualization: React.FC<VisualizationProps> = ({ visualizationData }) => {
                         useResizeHandler={true}
                     />
                 </div>
+                {visualizationInfo && (
+                    <div className="visualization-note">
+                        Showing {visualizationInfo.points.toLocaleString()} of{' '}
+                        {visualizationInfo.original_points.toLocaleString()} points (downsampled)
+                    </div>
+                )}
             </div>
         );
     } catch (error) {
@@ -3,10 +3,12 @@
  */
 
 import axios from 'axios';
-import { ChatResponse, UploadResponse, DataInfo } from '../types';
+import { ChatResponse, ChatStreamEvent, UploadMode, UploadResponse, DataInfo, Relationship, ResultPage } from '../types';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
 
+const SESSION_STORAGE_KEY = 'dataRoomSessionId';
+
 const api = axios.create({
     baseURL: API_BASE_URL,
     headers: {
@@ -14,15 +16,48 @@ const api = axios.create({
     },
 });
 
+/**
+ * Send the session token with every request and keep the one the backend returns
+ */
+api.interceptors.request.use((config) => {
+    const sessionId = sessionStorage.getItem(SESSION_STORAGE_KEY);
+    if (sessionId) {
+        config.headers['X-Session-Id'] = sessionId;
+    }
+    return config;
+});
+
+api.interceptors.response.use((response) => {
+    const sessionId = response.headers['x-session-id'];
+    if (sessionId) {
+        sessionStorage.setItem(SESSION_STORAGE_KEY, sessionId);
+    }
+    return response;
+});
+
 export const apiService = {
     /**
-     * Upload a CSV or Excel file
+     * Upload a CSV or Excel file. 'append' and 'upsert' add its rows to the
+     * loaded dataset; upsert matches existing rows on keyColumns. 'table'
+     * adds it as another table, named tableName or after the file.
      */
-    uploadFile: async (file: File): Promise<UploadResponse> => {
+    uploadFile: async (
+        file: File,
+        mode: UploadMode = 'replace',
+        keyColumns: string[] = [],
+        tableName?: string
+    ): Promise<UploadResponse> => {
         const formData = new FormData();
         formData.append('file', file);
+        formData.append('mode', mode);
+        if (keyColumns.length > 0) {
+            formData.append('key_columns', keyColumns.join(','));
+        }
+        if (tableName) {
+            formData.append('table', tableName);
+        }
 
-        const response = await axios.post(`${API_BASE_URL}/api/upload`, formData, {
+        const response = await api.post('/api/upload', formData, {
             headers: {
                 'Content-Type': 'multipart/form-data',
             },
@@ -39,6 +74,65 @@ export const apiService = {
         return response.data;
     },
 
+    /**
+     * Send a chat message and receive each agent stage as it finishes.
+     * Resolves with the final response once the 'done' or 'error' event arrives.
+     */
+    streamMessage: async (
+        message: string,
+        onEvent: (event: ChatStreamEvent) => void
+    ): Promise<ChatResponse> => {
+        const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+        const sessionId = sessionStorage.getItem(SESSION_STORAGE_KEY);
+        if (sessionId) {
+            headers['X-Session-Id'] = sessionId;
+        }
+
+        const response = await fetch(`${API_BASE_URL}/api/chat/stream`, {
+            method: 'POST',
+            headers,
+            body: JSON.stringify({ message }),
+        });
+
+        const returnedSessionId = response.headers.get('X-Session-Id');
+        if (returnedSessionId) {
+            sessionStorage.setItem(SESSION_STORAGE_KEY, returnedSessionId);
+        }
+
+        const reader = response.body!.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let finalResponse: ChatResponse = { success: false, message: '', error: 'Stream ended unexpectedly' };
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Server-Sent Events are separated by a blank line
+            const chunks = buffer.split('\n\n');
+            buffer = chunks.pop() || '';
+
+            for (const chunk of chunks) {
+                const eventLine = chunk.split('\n').find((line) => line.startsWith('event: '));
+                const dataLine = chunk.split('\n').find((line) => line.startsWith('data: '));
+                if (!eventLine || !dataLine) continue;
+
+                const event: ChatStreamEvent = {
+                    event: eventLine.slice(7) as ChatStreamEvent['event'],
+                    data: JSON.parse(dataLine.slice(6)),
+                };
+                onEvent(event);
+
+                if (event.event === 'done' || event.event === 'error') {
+                    finalResponse = event.data;
+                }
+            }
+        }
+
+        return finalResponse;
+    },
+
     /**
      * Get data information
      */
@@ -47,6 +141,26 @@ export const apiService = {
         return response.data;
     },
 
+    /**
+     * Declare how the tables relate, e.g. 'orders.customer_id = customers.id'
+     */
+    setRelationships: async (
+        relationships: string[]
+    ): Promise<{ success: boolean; relationships?: Relationship[]; error?: string }> => {
+        const response = await api.post('/api/relationships', { relationships });
+        return response.data;
+    },
+
+    /**
+     * Get a page of a large result stored on the server
+     */
+    getResultPage: async (resultId: string, offset: number, limit?: number): Promise<ResultPage> => {
+        const response = await api.get(`/api/results/${resultId}`, {
+            params: { offset, limit },
+        });
+        return response.data;
+    },
+
     /**
      * Get conversation history
      */
@@ -10,13 +10,56 @@ export interface DataInfo {
     column_details: ColumnDetail[];
     memory_usage: string;
     preview: Record<string, any>[];
+    approximate?: boolean;
+    engine?: string;
+    disk_bytes?: number;
+    ingestion?: IngestionStats;
+    table?: string;
+    tables?: TableInfo[];
+    relationships?: Relationship[];
 }
 
+export interface TableInfo {
+    name: string;
+    filename: string;
+    rows: number;
+    columns: number;
+    memory_bytes: number;
+}
+
+export interface Relationship {
+    from_table: string;
+    from_column: string;
+    to_table: string;
+    to_column: string;
+    kind?: string;
+    declared: boolean;
+}
+
+export interface IngestionStats {
+    engine: string;
+    seconds?: number;
+    chunks?: number;
+    rows_per_second?: number;
+    memory_before_bytes?: number;
+    memory_after_bytes?: number;
+    memory_saved_bytes?: number;
+    category_columns?: string[];
+    mode?: UploadMode;
+    rows_appended?: number;
+    rows_updated?: number;
+    widened_columns?: string[];
+    previous_fingerprint?: string;
+}
+
+export type UploadMode = 'replace' | 'append' | 'upsert' | 'table';
+
 export interface ColumnDetail {
     name: string;
     type: string;
     null_count: number;
     unique_count: number;
+    memory_bytes?: number;
     sample_values?: any[];
 }
 
@@ -29,9 +72,26 @@ export interface Message {
         error?: boolean;
         visualization?: string;
         result?: any;
+        result_info?: ResultInfo | null;
+        visualization_info?: VisualizationInfo | null;
+        turn?: TurnSummary | null;
     };
 }
 
+export interface TurnSummary {
+    turn: number;
+    question: string;
+    answer: string;
+    columns: string[];
+    filters: string[];
+    operations: string[];
+    result_shape: string | null;
+    visualization: string | null;
+    error: boolean;
+    result_id?: string | null;
+    plan?: Partial<ExecutionPlan>;
+}
+
 export interface ExecutionPlan {
     question_analysis: string;
     requires_visualization: boolean;
@@ -47,11 +107,57 @@ export interface ChatResponse {
     success: boolean;
     message: string;
     result?: any;
+    result_info?: ResultInfo | null;
     visualization?: string;
+    visualization_info?: VisualizationInfo | null;
     plan?: ExecutionPlan;
     code?: string;
     error?: string;
     conversation_history?: Message[];
+    cached?: boolean;
+    coalesced?: boolean;
+    fast_path?: boolean;
+    pipeline_mode?: 'fast_path' | 'single_call' | 'two_agent' | null;
+    timings?: RequestTimings;
+}
+
+export interface ResultInfo {
+    result_id: string | null;
+    total_rows: number;
+    page_rows: number;
+    columns: string[];
+    truncated: boolean;
+}
+
+export interface ResultPage {
+    success: boolean;
+    rows?: Record<string, any>[];
+    offset?: number;
+    limit?: number;
+    total_rows?: number;
+    columns?: string[];
+    error?: string;
+}
+
+export interface VisualizationInfo {
+    original_points: number;
+    points: number;
+    downsampled_traces: number;
+    bytes: number;
+    dropped: boolean;
+}
+
+export interface RequestTimings {
+    total_ms: number;
+    stages_ms: Record<string, number>;
+    tokens: Record<string, number>;
+}
+
+export type ChatStreamEventName = 'plan' | 'code' | 'result' | 'visualization' | 'done' | 'error';
+
+export interface ChatStreamEvent {
+    event: ChatStreamEventName;
+    data: any;
 }
 
 export interface UploadResponse {
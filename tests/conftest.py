@@ -0,0 +1,8 @@
+"""
+Shared pytest setup: these tests run offline, without a Gemini API key
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+"""
+Tests for the answer cache keys and eviction
+"""
+
+from utils import answer_cache
+from utils.answer_cache import AnswerCache
+
+
+def test_trivially_different_questions_share_a_key():
+    cache = AnswerCache()
+    
+    assert cache.make_key("fp", "Total sales by region?") == cache.make_key("fp", "  total SALES by   region ")
+
+
+def test_key_depends_on_dataset():
+    cache = AnswerCache()
+    
+    assert cache.make_key("fp1", "Total sales") != cache.make_key("fp2", "Total sales")
+
+
+def test_context_only_keys_follow_up_questions():
+    cache = AnswerCache()
+    
+    # Self-contained questions hit whatever was asked before
+    assert cache.make_key("fp", "Total sales", "Q1") == cache.make_key("fp", "Total sales", "Q2")
+    # Follow-ups depend on the earlier turns
+    assert cache.make_key("fp", "Now by region", "Q1") != cache.make_key("fp", "Now by region", "Q2")
+
+
+def test_get_returns_stored_answer_and_counts_hits():
+    cache = AnswerCache()
+    cache.put("k", {"response": "42"})
+    
+    assert cache.get("k") == {"response": "42"}
+    assert cache.get("missing") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("k", {"response": "42"})
+    
+    now[0] += 59
+    assert cache.get("k") is not None
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", {"response": 1})
+    cache.put("b", {"response": 2})
+    cache.get("a")
+    cache.put("c", {"response": 3})
+    
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_memory_budget_evicts_entries():
+    cache = AnswerCache(max_bytes=100)
+    cache.put("a", {"response": "x" * 60})
+    cache.put("b", {"response": "y" * 60})
+    
+    assert cache.get("a") is None
+    assert cache.get_stats()["bytes"] <= 100
+
+
+def test_answer_larger_than_budget_is_not_stored():
+    cache = AnswerCache(max_bytes=10)
+    cache.put("a", {"response": "x" * 60})
+    
+    assert cache.get("a") is None
+
+
+def test_invalidate_dataset_drops_only_its_answers():
+    cache = AnswerCache()
+    cache.put("old", {"response": 1}, dataset_fingerprint="v1")
+    cache.put("new", {"response": 2}, dataset_fingerprint="v2")
+    
+    assert cache.invalidate_dataset("v1") == 1
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+
+
+def test_discarded_answer_counts_as_a_miss():
+    cache = AnswerCache()
+    cache.put("k", {"response": "42"})
+    cache.get("k")
+    
+    cache.discard("k")
+    
+    assert cache.get("k") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (0, 2, 1)
@@ -0,0 +1,131 @@
+"""
+Tests for appending and upserting rows into a loaded dataset
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from utils.data_manager import DataManager
+from utils.profiler import build_profile
+
+BASE = pd.DataFrame({
+    "id": [1, 2, 3],
+    "Region": ["North", "South", "North"],
+    "Qty": [10, 20, 30],
+    "Sales": [1.5, 2.5, 3.5]
+})
+
+
+def to_csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DataManager(upload_folder=str(tmp_path))
+    success, message, _ = manager.load_file(to_csv(BASE), "sales.csv")
+    assert success, message
+    return manager
+
+
+def assert_profile_matches_rebuild(manager: DataManager):
+    profile = manager.get_profile()
+    rebuilt = build_profile(manager.get_dataframe())
+    assert profile["rows"] == rebuilt["rows"]
+    for column, expected in zip(profile["column_details"], rebuilt["column_details"]):
+        for key in ("name", "type", "null_count", "unique_count"):
+            assert column[key] == expected[key], (column["name"], key)
+
+
+def test_append_adds_rows_and_changes_the_fingerprint(manager):
+    fingerprint = manager.get_fingerprint()
+    new_rows = pd.DataFrame({"id": [4], "Region": ["East"], "Qty": [40], "Sales": [4.5]})
+    
+    success, message, info = manager.append_file(to_csv(new_rows), "more.csv", "append")
+    
+    assert success, message
+    assert info["rows"] == 4
+    assert manager.get_fingerprint() != fingerprint
+    assert manager.get_dataframe()["Region"].tolist() == ["North", "South", "North", "East"]
+    assert_profile_matches_rebuild(manager)
+
+
+def test_upsert_overwrites_matching_rows_in_place_and_appends_the_rest(manager):
+    new_rows = pd.DataFrame({"id": [2, 4], "Region": ["West", "East"], "Qty": [25, 40], "Sales": [9.5, 4.5]})
+    
+    success, message, _ = manager.append_file(to_csv(new_rows), "more.csv", "upsert", ["id"])
+    
+    assert success, message
+    df = manager.get_dataframe()
+    assert df["id"].tolist() == [1, 2, 3, 4]
+    assert df["Region"].tolist() == ["North", "West", "North", "East"]
+    assert df["Qty"].tolist() == [10, 25, 30, 40]
+    assert manager.ingestion_stats["rows_updated"] == 1
+    assert_profile_matches_rebuild(manager)
+
+
+def test_superseded_appended_versions_are_removed_from_the_store(manager):
+    store = manager.dataset_store
+    uploaded = manager.get_fingerprint()
+    
+    assert manager.append_file(b"id,Region,Qty,Sales\n4,East,40,4.5\n", "more.csv", "append")[0]
+    first_append = manager.get_fingerprint()
+    assert manager.append_file(b"id,Region,Qty,Sales\n5,West,50,5.5\n", "more.csv", "append")[0]
+    
+    assert store.has(uploaded)
+    assert not store.has(first_append)
+    assert not os.path.exists(store.path_for(first_append) + ".profile.json")
+    assert store.load(manager.get_fingerprint())["id"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_upsert_leaves_the_previous_frame_untouched(manager):
+    previous = manager.get_dataframe()
+    snapshot = previous.copy(deep=True)
+    new_rows = pd.DataFrame({"id": [1], "Region": ["South"], "Qty": [99], "Sales": [9.9]})
+    
+    success, message, _ = manager.append_file(to_csv(new_rows), "more.csv", "upsert", ["id"])
+    
+    assert success, message
+    assert manager.get_dataframe()["Qty"].tolist()[0] == 99
+    pd.testing.assert_frame_equal(previous, snapshot)
+
+
+@pytest.mark.parametrize("qty", ["1.5", ""])
+def test_decimals_or_blanks_widen_an_integer_column(manager, qty):
+    content = f"id,Region,Qty,Sales\n4,East,{qty},4.5\n".encode()
+    
+    success, message, _ = manager.append_file(content, "more.csv", "append")
+    
+    assert success, message
+    qty_column = manager.get_dataframe()["Qty"]
+    assert qty_column.dtype == "float64"
+    assert qty_column.tolist()[:3] == [10.0, 20.0, 30.0]
+    assert qty_column.isna().iloc[3] == (qty == "")
+    assert manager.get_schema()["Qty"] == "float64"
+    assert manager.ingestion_stats["widened_columns"] == ["Qty"]
+    assert_profile_matches_rebuild(manager)
+
+
+@pytest.mark.parametrize("content, error", [
+    (b"id,Region,Qty\n4,East,40\n", "missing columns ['Sales']"),
+    (b"id,Region,Qty,Sales,Extra\n4,East,40,4.5,x\n", "unexpected columns ['Extra']"),
+    (b"id,Region,Qty,Sales\n4,East,forty,4.5\n", "'Qty'")
+])
+def test_rows_that_do_not_fit_are_rejected(manager, content, error):
+    rows = len(manager.get_dataframe())
+    
+    success, message, _ = manager.append_file(content, "more.csv", "append")
+    
+    assert not success
+    assert error in message
+    assert len(manager.get_dataframe()) == rows
+
+
+def test_upsert_needs_known_key_columns(manager):
+    content = to_csv(BASE)
+    
+    assert not manager.append_file(content, "more.csv", "upsert", [])[0]
+    assert not manager.append_file(content, "more.csv", "upsert", ["missing"])[0]
+    assert not manager.append_file(content, "more.csv", "replace")[0]
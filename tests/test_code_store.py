@@ -0,0 +1,51 @@
+"""
+Tests for reusing generated code across identical plans
+"""
+
+from utils.code_store import CodeStore
+
+SCHEMA = {"Region": "str", "Sales": "float64"}
+PLAN = {
+    "question_analysis": "Total sales for each region",
+    "steps": ["Group by Region", "Sum Sales"],
+    "data_operations": ["aggregate"],
+    "requires_visualization": False,
+    "visualization_type": "none"
+}
+
+
+def test_free_text_does_not_change_the_key():
+    store = CodeStore()
+    reworded = {**PLAN, "question_analysis": "Sum of sales per region", "steps": ["group by region ", "sum  sales"]}
+    
+    assert store.make_key(SCHEMA, PLAN) == store.make_key(SCHEMA, reworded)
+
+
+def test_schema_and_structure_change_the_key():
+    store = CodeStore()
+    key = store.make_key(SCHEMA, PLAN)
+    
+    assert key != store.make_key({**SCHEMA, "Sales": "int64"}, PLAN)
+    assert key != store.make_key(SCHEMA, {**PLAN, "visualization_type": "bar"})
+
+
+def test_put_get_and_evict():
+    store = CodeStore()
+    key = store.make_key(SCHEMA, PLAN)
+    store.put(key, "result = df.groupby('Region')['Sales'].sum()", "sums")
+    
+    assert store.get(key)["code"].startswith("result =")
+    store.evict(key)
+    assert store.get(key) is None
+    assert store.get_stats()["evictions"] == 1
+
+
+def test_oldest_entry_is_dropped_past_capacity():
+    store = CodeStore(max_entries=2)
+    store.put("a", "result = 1")
+    store.put("b", "result = 2")
+    store.get("a")
+    store.put("c", "result = 3")
+    
+    assert store.get("b") is None
+    assert store.get("a") is not None
@@ -0,0 +1,53 @@
+"""
+Tests for the on-disk Arrow dataset store
+"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from utils import dataset_store
+from utils.dataset_store import DatasetStore
+
+pytestmark = pytest.mark.skipif(dataset_store.pa is None, reason="needs pyarrow")
+
+
+def test_hash_is_the_same_for_bytes_and_file_objects():
+    content = b"a,b\n1,2\n" * 100_000
+    file_data = io.BytesIO(content)
+    
+    assert DatasetStore.hash_content(content) == DatasetStore.hash_content(file_data)
+    # The file object is rewound for parsing
+    assert file_data.tell() == 0
+
+
+def test_round_trip_keeps_values_and_dtypes(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    df = pd.DataFrame({
+        "id": pd.Series([1, 2, 3], dtype="int64"),
+        "price": [1.5, None, 3.0],
+        "region": pd.Categorical(["North", "South", "North"]),
+        "day": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"])
+    })
+    
+    assert store.save("abc", df)
+    loaded = store.load("abc")
+    
+    pd.testing.assert_frame_equal(loaded, df)
+
+
+def test_unknown_or_unreadable_datasets_load_as_none(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    (tmp_path / "broken.arrow").write_bytes(b"not arrow")
+    
+    assert store.load("missing") is None
+    assert store.load("broken") is None
+
+
+def test_profile_round_trip(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    
+    assert store.load_profile("abc") is None
+    assert store.save_profile("abc", {"rows": 3, "columns": 2})
+    assert store.load_profile("abc") == {"rows": 3, "columns": 2}
@@ -0,0 +1,80 @@
+"""
+Tests for answering simple aggregations without the LLM
+"""
+
+import pandas as pd
+import pytest
+
+from agents.fast_path import FastPathEngine
+
+DF = pd.DataFrame({
+    "Region": ["North", "South", "North", "East"],
+    "Customer": ["a", "b", "c", "a"],
+    "Sales": [10.0, 20.0, 30.0, 40.0],
+    "Qty": [1, 2, 3, 4]
+})
+SCHEMA = {col: str(dtype) for col, dtype in DF.dtypes.items()}
+
+
+def run(code: str):
+    namespace = {"df": DF.copy(), "result": None, "fig": None}
+    exec(code, namespace)
+    return namespace
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Total sales by region?", DF.groupby("Region")["Sales"].sum()),
+    ("top 2 customers by sales", DF.groupby("Customer")["Sales"].sum().nlargest(2)),
+    ("average qty", DF["Qty"].mean()),
+    ("how many rows", 4),
+    ("number of unique customers", 3),
+    ("number of customers", 3),
+    ("count of regions", 3),
+    ("number of customers by region", DF.groupby("Region")["Customer"].nunique()),
+    ("number of rows by region", DF.groupby("Region").size()),
+    ("total sales where region is north", 40.0),
+    ("total sales where qty > 2", 70.0)
+])
+def test_matched_questions_compile_to_correct_pandas(question, expected):
+    matched = FastPathEngine().match(question, SCHEMA)
+    
+    assert matched is not None and matched["plan"]["fast_path"]
+    result = run(matched["code"])["result"]
+    if isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(result, expected, check_names=False)
+    else:
+        assert result == expected
+
+
+def test_chart_requests_build_a_figure():
+    matched = FastPathEngine().match("bar chart of total sales by region", SCHEMA)
+    
+    assert matched["plan"]["visualization_type"] == "bar"
+    assert run(matched["code"])["fig"] is not None
+
+
+@pytest.mark.parametrize("question", [
+    "correlation between sales and qty",
+    "total revenue by region",
+    "why did sales drop",
+    "number of orders"
+])
+def test_other_questions_go_to_the_agents(question):
+    assert FastPathEngine().match(question, SCHEMA) is None
+
+
+def test_counts_of_columns_are_not_fully_confident():
+    matched = FastPathEngine().match("number of customers", SCHEMA)
+    
+    assert matched["code"] == "result = df['Customer'].nunique()"
+    assert matched["confidence"] < 1.0
+
+
+def test_fallbacks_do_not_count_as_hits():
+    engine = FastPathEngine()
+    engine.match("average qty", SCHEMA)
+    engine.match("why did sales drop", SCHEMA)
+    engine.record_fallback()
+    
+    stats = engine.get_stats()
+    assert (stats["lookups"], stats["hits"], stats["fallbacks"]) == (2, 0, 1)
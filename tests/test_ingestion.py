@@ -0,0 +1,65 @@
+"""
+Tests for CSV ingestion dtypes
+"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from utils.ingestion import optimize_dtypes, read_csv_optimized
+
+
+def make_csv(rows: int) -> bytes:
+    lines = ["qty,price,region,discount,day"]
+    for i in range(rows):
+        lines.append(f"{100 + i % 20},{1300 + i % 7},{'North' if i % 2 else 'South'},{i % 3 * 0.5},2024-01-0{i % 9 + 1}")
+    return "\n".join(lines).encode()
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_integers_stay_int64(engine):
+    df, _ = read_csv_optimized(make_csv(1000), chunksize=300, engine=engine)
+    
+    assert df["qty"].dtype == "int64"
+    assert df["price"].dtype == "int64"
+    assert df["discount"].dtype == "float64"
+
+
+def test_multiplying_small_integer_columns_does_not_overflow():
+    df, _ = read_csv_optimized(make_csv(1000), chunksize=300)
+    expected = sum((100 + i % 20) * (1300 + i % 7) for i in range(1000))
+    
+    assert int((df["qty"] * df["price"]).sum()) == expected
+    assert int((df["qty"] * df["price"]).cumsum().iloc[-1]) == expected
+
+
+def test_narrow_integers_are_widened():
+    df = pd.DataFrame({"qty": pd.Series([100, 110], dtype="int8"), "price": pd.Series([1300, 1400], dtype="int16")})
+    
+    optimized = optimize_dtypes(df)
+    
+    assert (optimized["qty"] * optimized["price"]).sum() == 100 * 1300 + 110 * 1400
+
+
+def test_integer_downcasting_is_opt_in():
+    df = pd.DataFrame({"qty": [1, 2, 3]})
+    
+    assert optimize_dtypes(df, downcast_integers=True)["qty"].dtype == "int8"
+
+
+def test_repetitive_strings_become_categories_across_chunks():
+    df, stats = read_csv_optimized(make_csv(1000), chunksize=300)
+    
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+    assert set(df["region"].cat.categories) == {"North", "South"}
+    assert stats["chunks"] == 4
+    assert len(df) == 1000
+
+
+def test_values_match_a_plain_read():
+    content = make_csv(1000)
+    df, _ = read_csv_optimized(content, chunksize=300)
+    plain = pd.read_csv(io.BytesIO(content))
+    
+    pd.testing.assert_frame_equal(df.astype(plain.dtypes.to_dict()), plain)
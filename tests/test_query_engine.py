@@ -0,0 +1,107 @@
+"""
+Tests for querying large CSVs out of core
+The engines only run in a converting subprocess or a sandbox child, as in
+the app, so this process never starts their thread pools before forking.
+"""
+
+import pandas as pd
+import pytest
+
+from agents.executor_agent import ExecutorAgent
+from agents.sandbox import SandboxExecutor
+from utils.data_manager import DataManager
+from utils.query_engine import QUERY_ENGINES, QueryEngine
+
+ROWS = 1000
+QUERIES = {
+    "duckdb": 'result = sql(\'SELECT "Region", sum("Qty") AS qty FROM data GROUP BY 1 ORDER BY 1\')',
+    "polars": "result = lf.group_by('Region').agg(pl.col('Qty').sum().alias('qty')).sort('Region')"
+              ".collect(engine='streaming').to_pandas()"
+}
+
+
+def make_csv() -> bytes:
+    df = pd.DataFrame({
+        "Region": ["North", "South", "East", "West"] * (ROWS // 4),
+        "Qty": range(ROWS),
+        "Sales": [None if i % 10 == 0 else i * 0.5 for i in range(ROWS)]
+    })
+    return df.to_csv(index=False).encode()
+
+
+@pytest.fixture(params=sorted(QUERY_ENGINES))
+def manager(request, tmp_path):
+    engine_class = QUERY_ENGINES[request.param]
+    if not engine_class.is_available():
+        pytest.skip(f"{request.param} is not installed")
+        
+    engine = engine_class(spill_directory=str(tmp_path / "spill"), max_result_rows=100)
+    manager = DataManager(upload_folder=str(tmp_path), query_engine=engine, query_engine_min_mb=0)
+    success, message, _ = manager.load_file(make_csv(), "big.csv")
+    assert success, message
+    return manager
+
+
+def test_partial_engine_fails_at_construction():
+    class SchemaOnly(QueryEngine):
+        name = "schema_only"
+        
+        def _summarize(self, path):
+            return {}
+            
+    with pytest.raises(TypeError):
+        SchemaOnly()
+
+
+def test_upload_is_converted_and_profiled_without_loading_it(manager):
+    info = manager.get_data_info()
+    
+    assert manager.get_dataframe() is None
+    assert info["rows"] == ROWS
+    assert info["engine"] == manager.query_engine.name
+    columns = {column["name"]: column for column in info["column_details"]}
+    assert columns["Sales"]["null_count"] == ROWS // 10
+    assert all(column["unique_count"] <= ROWS for column in columns.values())
+    assert set(manager.get_schema()) == {"Region", "Qty", "Sales"}
+
+
+def test_same_upload_reuses_the_parquet_file(manager):
+    assert manager.load_file(make_csv(), "big.csv")[0]
+    
+    assert manager.query_engine.get_stats()["conversions"] == 1
+    assert manager.ingestion_stats["engine"] == "dataset_store"
+
+
+def test_out_of_core_datasets_take_no_rows_or_tables(manager):
+    assert not manager.append_file(make_csv(), "more.csv", "append")[0]
+    assert not manager.add_table(make_csv(), "more.csv")[0]
+
+
+@pytest.mark.skipif(not SandboxExecutor().available, reason="needs a fork server")
+def test_generated_code_queries_the_engine_in_the_sandbox(manager):
+    engine = manager.query_engine
+    executor = ExecutorAgent(api_key=None, llm_client=object(), sandbox=SandboxExecutor(), query_engine=engine)
+    executor.load_data(None, query_dataset=manager.get_query_dataset())
+    
+    assert engine.code_requirements in executor._code_requirements()
+    result = executor.run_code(QUERIES[engine.name], "", {})
+    
+    assert result["status"] == "success", result.get("error")
+    totals = {row["Region"]: row["qty"] for row in result["result"]}
+    regions = ["North", "South", "East", "West"]
+    assert totals == {region: sum(range(position, ROWS, 4)) for position, region in enumerate(regions)}
+
+
+@pytest.mark.skipif(not SandboxExecutor().available, reason="needs a fork server")
+def test_duckdb_rejects_results_over_the_row_cap(manager):
+    if manager.query_engine.name != "duckdb":
+        pytest.skip("the row cap applies to sql()")
+    executor = ExecutorAgent(
+        api_key=None, llm_client=object(), sandbox=SandboxExecutor(), query_engine=manager.query_engine
+    )
+    executor.load_data(None, query_dataset=manager.get_query_dataset())
+    
+    result = executor.run_code("result = sql('SELECT * FROM data')", "", {})
+    
+    assert result["status"] == "error"
+    assert "more than 100 rows" in result["error"]
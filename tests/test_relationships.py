@@ -0,0 +1,84 @@
+"""
+Tests for relationships between the tables of a dataset
+"""
+
+import pandas as pd
+import pytest
+
+from utils.relationships import infer_relationships, join_tables, make_table_name, parse_relationship
+
+CUSTOMERS = pd.DataFrame({"id": [1, 2, 3], "name": ["Ann", "Bob", "Cy"], "segment": ["A", "B", "A"]})
+PRODUCTS = pd.DataFrame({"product_id": ["P1", "P2"], "name": ["Pen", "Cup"]})
+ORDERS = pd.DataFrame({
+    "order_id": [10, 11, 12, 13],
+    "customer_id": [1, 2, 1, 3],
+    "product_id": ["P1", "P2", "P2", "P1"],
+    "Sales": [5.0, 7.0, 9.0, 11.0]
+})
+TABLES = {"orders": ORDERS, "customers": CUSTOMERS, "products": PRODUCTS}
+
+
+def test_foreign_keys_are_inferred_from_names_and_values():
+    found = {
+        (r["from_table"], r["from_column"], r["to_table"], r["to_column"]): r["kind"]
+        for r in infer_relationships(TABLES)
+    }
+    
+    assert found == {
+        ("orders", "customer_id", "customers", "id"): "many-to-one",
+        ("orders", "product_id", "products", "product_id"): "many-to-one"
+    }
+
+
+def test_columns_whose_values_are_not_keys_are_not_related():
+    orders = ORDERS.assign(customer_id=[1, 7, 8, 9])
+    
+    assert infer_relationships({"orders": orders, "customers": CUSTOMERS}) == []
+
+
+def test_two_tables_own_ids_are_not_related():
+    regions = pd.DataFrame({"id": [1, 2, 3], "region": ["N", "S", "E"]})
+    
+    assert infer_relationships({"customers": CUSTOMERS, "regions": regions}) == []
+
+
+def test_join_follows_relationships_and_suffixes_clashing_columns():
+    relationships = infer_relationships(TABLES)
+    
+    joined = join_tables(TABLES, relationships, "orders", "customers", "products")
+    
+    assert len(joined) == len(ORDERS)
+    assert joined["segment"].tolist() == ["A", "B", "A", "A"]
+    assert joined["name_products"].tolist() == ["Pen", "Cup", "Cup", "Pen"]
+    assert joined.groupby("segment")["Sales"].sum().to_dict() == {"A": 25.0, "B": 7.0}
+
+
+def test_join_goes_through_tables_that_are_not_named():
+    relationships = infer_relationships(TABLES)
+    
+    joined = join_tables(TABLES, relationships, "customers", "products")
+    
+    assert {"segment", "Sales", "name_products"} <= set(joined.columns)
+
+
+def test_join_rejects_unknown_or_unconnected_tables():
+    with pytest.raises(KeyError):
+        join_tables(TABLES, [], "orders", "missing")
+    with pytest.raises(ValueError):
+        join_tables(TABLES, [], "orders", "customers")
+
+
+def test_declared_relationships_are_parsed():
+    assert parse_relationship("orders.customer_id = customers.id") == {
+        "from_table": "orders",
+        "from_column": "customer_id",
+        "to_table": "customers",
+        "to_column": "id"
+    }
+    with pytest.raises(ValueError):
+        parse_relationship("orders.customer_id")
+
+
+def test_table_names_come_from_file_names():
+    assert make_table_name("Order Items.csv") == "order_items"
+    assert make_table_name("2024 sales.xlsx") == "t_2024_sales"
@@ -0,0 +1,56 @@
+"""
+Tests for paging large results from the result store
+"""
+
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from backend.chat_pipeline import ChatPipeline
+from utils import result_store
+from utils.answer_cache import AnswerCache
+from utils.result_store import ResultStore
+
+pytestmark = pytest.mark.skipif(result_store.pa is None, reason="needs pyarrow")
+
+ROWS = pd.DataFrame({"x": range(20)})
+
+
+def test_large_results_are_stored_and_paged(tmp_path):
+    store = ResultStore(str(tmp_path), page_rows=5)
+    
+    paged = store.paginate(ROWS)
+    
+    assert len(paged["result"]) == 5
+    page = store.read_page(paged["result_info"]["result_id"], offset=15, limit=10)
+    assert [row["x"] for row in page["rows"]] == [15, 16, 17, 18, 19]
+
+
+def test_touch_keeps_a_result_from_being_pruned_first(tmp_path):
+    store = ResultStore(str(tmp_path), max_results=2)
+    first = store.save(ROWS)
+    second = store.save(ROWS)
+    past = time.time() - 60
+    os.utime(store.path_for(first), (past, past))
+    os.utime(store.path_for(second), (past + 1, past + 1))
+    
+    assert store.touch(first)
+    store.save(ROWS)
+    
+    assert store.read_page(first) is not None
+    assert store.read_page(second) is None
+    assert not store.touch(second)
+
+
+def test_cached_answers_whose_result_was_pruned_are_not_served(tmp_path):
+    store = ResultStore(str(tmp_path))
+    pipeline = ChatPipeline(planner_agent=None, answer_cache=AnswerCache(), result_store=store)
+    result_id = store.save(ROWS)
+    answer = {"result_info": {"result_id": result_id}}
+    
+    assert pipeline._result_available(answer)
+    os.remove(store.path_for(result_id))
+    assert not pipeline._result_available(answer)
+    assert pipeline._result_available({"result_info": None})
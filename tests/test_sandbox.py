@@ -0,0 +1,146 @@
+"""
+Tests for running generated code in sandboxed child processes
+"""
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from agents.executor_agent import ExecutorAgent
+from agents.sandbox import SandboxExecutor, resource
+from utils.data_manager import DataManager
+
+pytestmark = pytest.mark.skipif(
+    not SandboxExecutor().available or resource is None,
+    reason="needs a fork server and resource limits"
+)
+
+
+def answer():
+    return {"status": "success", "result": 42}
+
+
+def sleep_forever():
+    time.sleep(30)
+    return answer()
+
+
+def spin_forever():
+    while True:
+        pass
+
+
+def allocate(megabytes):
+    return {"status": "success", "result": len(bytearray(megabytes * 1024 * 1024))}
+
+
+def test_result_is_returned_from_the_child():
+    sandbox = SandboxExecutor()
+    
+    assert sandbox.run(answer) == {"status": "success", "result": 42}
+    assert sandbox.get_stats()["runs"] == 1
+
+
+def test_wall_clock_timeout_kills_the_child():
+    sandbox = SandboxExecutor(wall_seconds=1)
+    start = time.perf_counter()
+    
+    result = sandbox.run(sleep_forever)
+    
+    assert result["status"] == "error"
+    assert "timed out" in result["error"]
+    assert time.perf_counter() - start < 10
+    assert sandbox.get_stats()["timeouts"] == 1
+
+
+def test_cpu_limit_aborts_the_child():
+    sandbox = SandboxExecutor(cpu_seconds=1, wall_seconds=20)
+    
+    result = sandbox.run(spin_forever)
+    
+    assert result["status"] == "error"
+    assert "CPU" in result["error"]
+    assert sandbox.get_stats()["crashes"] == 1
+
+
+def test_memory_limit_reports_memory_error():
+    sandbox = SandboxExecutor(memory_mb=64)
+    
+    result = sandbox.run(allocate, 512)
+    
+    assert result["status"] == "error"
+    assert result["error"].startswith("MemoryError")
+    # The parent is not limited
+    assert allocate(128)["result"] == 128 * 1024 * 1024
+
+
+def test_executor_names_memory_errors_from_generated_code():
+    executor = ExecutorAgent(api_key=None, llm_client=object(), sandbox=SandboxExecutor(memory_mb=64))
+    executor.load_data(pd.DataFrame({"x": [1, 2, 3]}))
+    
+    result = executor.run_code("result = bytearray(2 * 1024 ** 3)", "", {})
+    
+    assert result["status"] == "error"
+    assert result["error"].startswith("MemoryError")
+
+
+def test_executor_runs_code_on_the_dataframe():
+    executor = ExecutorAgent(api_key=None, llm_client=object(), sandbox=SandboxExecutor())
+    executor.load_data(pd.DataFrame({"x": [1, 2, 3]}))
+    
+    result = executor.run_code("result = int(df['x'].sum())", "", {})
+    
+    assert result["status"] == "success"
+    assert result["result"] == 6
+
+
+HELD = threading.Lock()
+
+
+def take_held_lock():
+    acquired = HELD.acquire(timeout=5)
+    return {"status": "success", "result": acquired}
+
+
+def test_child_does_not_inherit_locks_held_by_other_threads():
+    release = threading.Event()
+    
+    def hold():
+        with HELD:
+            release.wait()
+            
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        assert SandboxExecutor().run(take_held_lock) == {"status": "success", "result": True}
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_stored_tables_reach_the_child_by_path(tmp_path):
+    manager = DataManager(upload_folder=str(tmp_path))
+    assert manager.load_file(b"Region,Qty\nNorth,1\nSouth,2\nNorth,3\n", "sales.csv")[0]
+    executor = ExecutorAgent(api_key=None, llm_client=object(), sandbox=SandboxExecutor())
+    executor.load_data(
+        manager.get_dataframe(), manager.get_tables(), manager.get_related_tables(),
+        manager.get_query_dataset(), manager.get_stored_paths()
+    )
+    
+    assert isinstance(executor._execution_inputs(stored=True)["df"], str)
+    result = executor.run_code("result = df.groupby('Region')['Qty'].sum()", "", {})
+    
+    assert result["status"] == "success", result.get("error")
+    assert result["result"] == {"North": 4, "South": 2}
+
+
+def test_unstored_frames_are_sent_to_the_child():
+    executor = ExecutorAgent(api_key=None, llm_client=object(), sandbox=SandboxExecutor())
+    executor.load_data(pd.DataFrame({"x": [1, 2, 3]}))
+    
+    result = executor.run_code("df['x'] = df['x'] * 10\nresult = int(df['x'].sum())", "", {})
+    
+    assert result["result"] == 60
+    assert executor.current_df["x"].tolist() == [1, 2, 3]
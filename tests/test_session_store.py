@@ -0,0 +1,102 @@
+"""
+Tests for persisting sessions across workers
+"""
+
+import time
+
+import pandas as pd
+
+from utils.session_manager import SessionManager
+from utils.session_store import SessionStore, SQLiteSessionBackend
+
+
+def make_store(tmp_path) -> SessionStore:
+    return SessionStore(SQLiteSessionBackend(str(tmp_path / "sessions.db")), flush_interval_seconds=60)
+
+
+def test_snapshot_round_trip_through_sqlite(tmp_path):
+    store = make_store(tmp_path)
+    now = time.time()
+    snapshot = {"session_id": "s1", "updated_at": now, "context": {"messages": ["hi"]}}
+    
+    store.save(snapshot)
+    # Pending writes are visible before they are flushed
+    assert store.load("s1") == snapshot
+    store.flush()
+    
+    assert make_store(tmp_path).load("s1") == snapshot
+    assert make_store(tmp_path).updated_at("s1") == now
+
+
+def test_older_snapshot_never_replaces_a_newer_one(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    backend.write_many([{"session_id": "s1", "updated_at": 20.0, "turn": 2}])
+    backend.write_many([{"session_id": "s1", "updated_at": 10.0, "turn": 1}])
+    
+    assert backend.read("s1")["turn"] == 2
+
+
+def test_delete_and_prune(tmp_path):
+    now = time.time()
+    store = make_store(tmp_path)
+    store.save({"session_id": "old", "updated_at": now - 100})
+    store.save({"session_id": "new", "updated_at": now})
+    store.save({"session_id": "gone", "updated_at": now})
+    store.flush()
+    store.delete("gone")
+    store.flush()
+    
+    assert store.load("gone") is None
+    assert store.backend.prune(now - 50) == 1
+    assert store.load("old") is None
+    assert store.load("new") is not None
+
+
+def test_other_worker_restores_the_session_with_its_dataset(tmp_path):
+    upload_folder = str(tmp_path / "uploads")
+    store = make_store(tmp_path)
+    first = SessionManager(upload_folder=upload_folder, session_store=store)
+    session = first.get_or_create()
+    csv = pd.DataFrame({"Region": ["North", "South"], "Sales": [1.0, 2.0]}).to_csv(index=False).encode()
+    session.data_manager.load_file(csv, "sales.csv")
+    session.context_manager.add_message("user", "Total sales?")
+    first.persist(session)
+    store.flush()
+    
+    second = SessionManager(upload_folder=upload_folder, session_store=make_store(tmp_path))
+    restored = second.get_or_create(session.session_id)
+    
+    assert restored.session_id == session.session_id
+    pd.testing.assert_frame_equal(restored.data_manager.get_dataframe(), session.data_manager.get_dataframe())
+    assert second.get_stats()["restored"] == 1
+
+
+def test_live_sessions_are_checked_once_per_sync_interval(tmp_path):
+    store = make_store(tmp_path)
+    manager = SessionManager(upload_folder=str(tmp_path / "uploads"), session_store=store, sync_interval_seconds=60)
+    session = manager.get_or_create()
+    
+    for _ in range(5):
+        assert manager.get_or_create(session.session_id) is session
+    assert manager.get_stats()["store_checks"] == 1
+    
+    manager.sync_interval_seconds = 0
+    manager.get_or_create(session.session_id)
+    assert manager.get_stats()["store_checks"] == 2
+
+
+def test_evicted_sessions_are_restored_but_removed_ones_are_not(tmp_path):
+    store = make_store(tmp_path)
+    manager = SessionManager(upload_folder=str(tmp_path / "uploads"), session_store=store, max_sessions=1)
+    evicted = manager.get_or_create()
+    evicted.context_manager.add_message("user", "Total sales?")
+    manager.persist(evicted)
+    removed = manager.get_or_create()
+    manager.persist(removed)
+    
+    assert evicted.session_id not in manager.sessions
+    assert manager.get_or_create(evicted.session_id).session_id == evicted.session_id
+    
+    manager.remove(removed.session_id)
+    assert store.load(removed.session_id) is None
+    assert manager.get_or_create(removed.session_id).session_id != removed.session_id
@@ -0,0 +1,53 @@
+"""
+Tests for coalescing identical in-flight requests
+"""
+
+import asyncio
+
+from utils.single_flight import SingleFlight
+
+
+def test_followers_share_the_leaders_value():
+    group = SingleFlight()
+    calls = []
+    
+    async def answer(key):
+        leader, flight = group.join(key)
+        if not leader:
+            return await group.wait(flight)
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        group.finish(key, f"answer to {key}")
+        return await flight
+        
+    async def main():
+        return await asyncio.gather(answer("a"), answer("a"), answer("a"), answer("b"))
+        
+    assert asyncio.run(main()) == ["answer to a"] * 3 + ["answer to b"]
+    assert calls == ["a", "b"]
+    stats = group.get_stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (2, 2, 0)
+
+
+def test_followers_give_up_on_a_failed_or_slow_leader():
+    group = SingleFlight(wait_timeout_seconds=0.05)
+    
+    async def main():
+        _, failed = group.join("failed")
+        group.finish("failed", None)
+        _, slow = group.join("slow")
+        return await group.wait(failed), await group.wait(slow)
+        
+    assert asyncio.run(main()) == (None, None)
+    assert group.get_stats()["abandoned"] == 2
+
+
+def test_nothing_is_kept_after_the_flight():
+    group = SingleFlight()
+    
+    async def main():
+        group.join("a")
+        group.finish("a", "first")
+        return group.join("a")[0]
+        
+    assert asyncio.run(main()) is True
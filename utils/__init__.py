@@ -2,7 +2,38 @@
 Utility functions
 """
 
+import importlib
+
 from .context_manager import ContextManager
-from .data_manager import DataManager
+from .answer_cache import AnswerCache
+from .code_store import CodeStore
+from .compiled_code_cache import CompiledCodeCache
+from .session_manager import Session, SessionManager
+from .session_store import SessionStore, SessionBackend, SQLiteSessionBackend
+from .single_flight import SingleFlight
+from .metrics import Metrics, RequestTimings, metrics
+from .lazy import Lazy
+
+# Modules that import pandas, pyarrow or plotly load on first access, so
+# importing the package stays cheap for processes that do not need them yet
+_LAZY_EXPORTS = {
+    'DataManager': '.data_manager',
+    'DatasetStore': '.dataset_store',
+    'PromptBuilder': '.prompt_builder',
+    'ResultStore': '.result_store',
+    'FigureCompactor': '.figure_compactor',
+}
+
+__all__ = ['ContextManager', 'DataManager', 'AnswerCache', 'CodeStore',
+           'Session', 'SessionManager', 'DatasetStore', 'PromptBuilder',
+           'SingleFlight', 'Metrics', 'RequestTimings', 'metrics',
+           'ResultStore', 'FigureCompactor', 'Lazy', 'CompiledCodeCache',
+           'SessionStore', 'SessionBackend', 'SQLiteSessionBackend']
+
 
-__all__ = ['ContextManager', 'DataManager']
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,234 @@
+"""
+Answer Cache for repeated questions on the same dataset
+"""
+
+from typing import Dict, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+import time
+
+
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|those|these|this|them|they|same|previous|above|"
+    r"instead|also|now|again|only|more|less)\b"
+)
+
+
+class AnswerCache:
+    """
+    Caches complete chat answers (plan, generated code and serialized result).
+    Entries are keyed on the dataset fingerprint, the normalized question and
+    the recent conversation turns, and are evicted by LRU order, TTL and a
+    total memory budget.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: int = 3600,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Initialize the Answer Cache.
+        
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl_seconds: Seconds before an entry expires
+            max_bytes: Memory budget for all cached answers
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """
+        Normalize a question so trivially different phrasings share a key.
+        
+        Args:
+            question: Raw user question
+            
+        Returns:
+            Lowercased question with collapsed whitespace and no trailing punctuation
+        """
+        question = re.sub(r'\s+', ' ', question.strip().lower())
+        return question.rstrip('?!. ')
+        
+    @staticmethod
+    def is_follow_up(question: str) -> bool:
+        """
+        Check whether a question refers back to earlier turns.
+        
+        Args:
+            question: Raw user question
+            
+        Returns:
+            True if the answer likely depends on conversation history
+        """
+        return FOLLOW_UP_PATTERN.search(question.lower()) is not None
+        
+    def make_key(
+        self,
+        dataset_fingerprint: str,
+        question: str,
+        conversation_context: str = ""
+    ) -> str:
+        """
+        Build the cache key for a question.
+        Context is only part of the key for follow-up questions, so a
+        self-contained question hits the cache whatever was asked before.
+        
+        Args:
+            dataset_fingerprint: Fingerprint of the loaded dataset
+            question: The user's question
+            conversation_context: Previous turn summaries the agents will see
+            
+        Returns:
+            Hex digest identifying the answer
+        """
+        context = conversation_context if self.is_follow_up(question) else ""
+        key_source = json.dumps([
+            dataset_fingerprint,
+            self.normalize_question(question),
+            context
+        ])
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached answer.
+        
+        Args:
+            key: Cache key from make_key
+            
+        Returns:
+            Cached answer or None
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            
+            if entry is None:
+                self.misses += 1
+                return None
+                
+            if time.time() - entry["created_at"] > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+                
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+            
+    def put(self, key: str, value: Dict, dataset_fingerprint: Optional[str] = None):
+        """
+        Store an answer, evicting old entries to stay within budget.
+        
+        Args:
+            key: Cache key from make_key
+            value: JSON-serializable answer
+            dataset_fingerprint: Dataset version the answer was computed on,
+                so invalidate_dataset can drop it
+        """
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+            
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+                
+            self.entries[key] = {
+                "value": value,
+                "size": size,
+                "dataset_fingerprint": dataset_fingerprint,
+                "created_at": time.time()
+            }
+            self.total_bytes += size
+            
+            while (len(self.entries) > self.max_entries or
+                   self.total_bytes > self.max_bytes):
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+                
+    def invalidate_dataset(self, dataset_fingerprint: str) -> int:
+        """
+        Drop the answers computed on a dataset version that has been
+        superseded, e.g. by appended rows.
+        
+        Args:
+            dataset_fingerprint: Fingerprint of the old dataset version
+            
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [
+                key for key, entry in self.entries.items()
+                if entry["dataset_fingerprint"] == dataset_fingerprint
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+            
+    def discard(self, key: str):
+        """
+        Drop an answer that get just returned but can no longer be served,
+        e.g. because its paged result was pruned; the lookup counts as a miss.
+        
+        Args:
+            key: Cache key from make_key
+        """
+        with self._lock:
+            if key not in self.entries:
+                return
+            self._remove(key)
+            self.invalidations += 1
+            self.hits -= 1
+            self.misses += 1
+            
+    def clear(self):
+        """
+        Drop every cached answer.
+        """
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            
+    def get_stats(self) -> Dict:
+        """
+        Get cache hit/miss counters.
+        
+        Returns:
+            Dictionary with cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+            
+    def _remove(self, key: str):
+        """
+        Remove an entry and release its bytes. Caller must hold the lock.
+        """
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry["size"]
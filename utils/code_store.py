@@ -0,0 +1,164 @@
+"""
+Code Store for reusing generated code across datasets with the same schema
+"""
+
+from typing import Dict, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+
+
+# Plan fields that describe what the code does, as opposed to free-text
+# commentary that changes from one model call to the next
+STRUCTURAL_PLAN_KEYS = [
+    "requires_visualization",
+    "visualization_type",
+    "steps",
+    "data_operations",
+    "expected_output"
+]
+
+
+class CodeStore:
+    """
+    Stores working code generated by the Executor Agent.
+    Entries are keyed on the dataset schema signature and the canonicalized
+    plan, so a structurally identical plan on data with the same columns and
+    types can be re-executed locally without another model call.
+    """
+    
+    def __init__(self, max_entries: int = 512):
+        """
+        Initialize the Code Store.
+        
+        Args:
+            max_entries: Maximum number of stored code snippets
+        """
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def schema_signature(data_schema: Dict) -> str:
+        """
+        Hash a schema from DataManager.get_schema.
+        
+        Args:
+            data_schema: Mapping of column names to dtype strings
+            
+        Returns:
+            Hex digest of the schema
+        """
+        schema_text = json.dumps(data_schema, sort_keys=True, default=str)
+        return hashlib.sha256(schema_text.encode('utf-8')).hexdigest()
+        
+    @staticmethod
+    def canonicalize_plan(plan: Dict) -> str:
+        """
+        Reduce a plan to its structural fields in a stable JSON form.
+        
+        Args:
+            plan: Execution plan from the Planner Agent
+            
+        Returns:
+            Canonical JSON string of the plan
+        """
+        def normalize(value):
+            if isinstance(value, str):
+                return re.sub(r'\s+', ' ', value.strip().lower())
+            if isinstance(value, list):
+                return [normalize(item) for item in value]
+            return value
+            
+        canonical = {
+            key: normalize(plan.get(key))
+            for key in STRUCTURAL_PLAN_KEYS
+        }
+        return json.dumps(canonical, sort_keys=True, default=str)
+        
+    def make_key(self, data_schema: Dict, plan: Dict) -> str:
+        """
+        Build the store key for a schema and plan.
+        
+        Args:
+            data_schema: Mapping of column names to dtype strings
+            plan: Execution plan from the Planner Agent
+            
+        Returns:
+            Hex digest identifying the code
+        """
+        key_source = self.schema_signature(data_schema) + self.canonicalize_plan(plan)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up stored code.
+        
+        Args:
+            key: Store key from make_key
+            
+        Returns:
+            Dict with code and explanation, or None
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            
+            if entry is None:
+                self.misses += 1
+                return None
+                
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+            
+    def put(self, key: str, code: str, explanation: str = ""):
+        """
+        Store code that executed successfully.
+        
+        Args:
+            key: Store key from make_key
+            code: Generated Python code
+            explanation: Model explanation of the code
+        """
+        with self._lock:
+            self.entries[key] = {
+                "code": code,
+                "explanation": explanation
+            }
+            self.entries.move_to_end(key)
+            
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                
+    def evict(self, key: str):
+        """
+        Remove stored code, e.g. after it raised on a new dataset.
+        
+        Args:
+            key: Store key from make_key
+        """
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self.evictions += 1
+                
+    def get_stats(self) -> Dict:
+        """
+        Get store hit/miss counters.
+        
+        Returns:
+            Dictionary with store statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,101 @@
+"""
+Compiled Code Cache for running the same generated code without recompiling it
+"""
+
+from types import CodeType
+from typing import Dict
+from collections import OrderedDict
+import hashlib
+import threading
+
+
+class CompiledCodeCache:
+    """
+    Keeps the bytecode of generated code, keyed by a hash of its source.
+    Stored and fast-path code is executed again and again; compiling it once
+    and reusing the code object leaves only the pandas work per run.
+    Code objects are immutable, so one entry can be shared by every session;
+    sandbox children compile the source they are sent themselves.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize the Compiled Code Cache.
+        
+        Args:
+            max_entries: Maximum number of code objects kept
+        """
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def make_key(code: str) -> str:
+        """
+        Hash code source.
+        
+        Args:
+            code: Python source code
+            
+        Returns:
+            Hex digest of the source
+        """
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+        
+    def compile(self, code: str) -> CodeType:
+        """
+        Get the code object for source, compiling it on a miss.
+        
+        Args:
+            code: Python source code
+            
+        Returns:
+            Compiled code object
+            
+        Raises:
+            SyntaxError: If the code does not compile; failures are not cached
+        """
+        key = self.make_key(code)
+        
+        with self._lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            
+        # Compile outside the lock; two threads racing on new code both
+        # produce equal code objects and the second simply replaces the first
+        compiled = compile(code, '<string>', 'exec')
+        
+        with self._lock:
+            self.entries[key] = compiled
+            self.entries.move_to_end(key)
+            
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+                
+        return compiled
+        
+    def get_stats(self) -> Dict:
+        """
+        Get cache hit/miss counters.
+        
+        Returns:
+            Dictionary with cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -2,42 +2,345 @@
 Context Manager for conversation history and memory
 """
 
-from typing import List, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional
 from collections import deque
+import re
+import threading
+
+# Column references in generated code: df['Sales'], ['Region', 'Sales'], x='Order Date'
+QUOTED_PATTERN = re.compile(r"""(['"])((?:(?!\1).)+)\1""")
+SUBSCRIPT_PATTERN = re.compile(r"""\[\s*(['"])((?:(?!\1).)+)\1\s*\]""")
+
+# Row filters in generated code, e.g. df[df['Profit'] < 0] or
+# df[df['Region'].astype(str).str.lower() == 'west']
+COMPARISON_PATTERN = re.compile(
+    r"""\[\s*(['"])(?P<column>(?:(?!\1).)+)\1\s*\]"""
+    r"""(?:\.\w+(?:\([^()]*\))?)*\s*(?P<op>==|!=|>=|<=|>|<)\s*(?P<value>[^\]&|)\n]+)"""
+)
+METHOD_FILTER_PATTERN = re.compile(
+    r"""\[\s*(['"])(?P<column>(?:(?!\1).)+)\1\s*\]"""
+    r"""(?:\.str)?\.(?P<method>isin|between|contains|startswith)\((?P<args>[^()]*)\)"""
+)
+QUERY_PATTERN = re.compile(r"""\.query\(\s*(['"])(?P<expression>(?:(?!\1).)+)\1""")
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Plan fields kept with each turn so a restored session still has its plans
+TURN_PLAN_KEYS = ["question_analysis", "visualization_type", "steps", "data_operations"]
+
+# Turn fields recomputed on demand rather than exposed or persisted
+INTERNAL_TURN_KEYS = ("words", "uses", "text", "tokens")
 
 
 class ContextManager:
     """
     Manages conversation context and history.
-    Keeps track of the last N messages for context-aware responses.
+    Keeps the last N messages as a transcript for display and, separately, a
+    memory of answered questions for the agent prompts. Each turn is reduced
+    to a structured summary (columns touched, filters applied, result shape)
+    a few dozen tokens long. The memory is bounded by a token budget rather
+    than a message count: when it is over budget, the turns least related to
+    the latest one are evicted first. Prompts get the turns most relevant to
+    the new question within a smaller budget, so prompt size does not grow
+    with the length of the conversation.
     """
     
-    def __init__(self, max_history: int = 2):
+    def __init__(
+        self,
+        max_history: int = 2,
+        memory_token_budget: int = 600,
+        prompt_token_budget: int = 150,
+        answer_chars: int = 100
+    ):
         """
         Initialize the Context Manager.
         
         Args:
-            max_history: Maximum number of messages to keep in history
+            max_history: Maximum number of messages to keep in the transcript
+            memory_token_budget: Approximate tokens of turn summaries kept in memory
+            prompt_token_budget: Approximate tokens of turn summaries put in a prompt
+            answer_chars: Characters of each answer kept in its summary
         """
         self.max_history = max_history
+        self.memory_token_budget = memory_token_budget
+        self.prompt_token_budget = prompt_token_budget
+        self.answer_chars = answer_chars
         self.history: deque = deque(maxlen=max_history)
+        self.turns: List[Dict] = []
+        self.turn_count = 0
+        self.evictions = 0
+        self._pending_question: Optional[str] = None
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        Estimate the token count of a text, the same way PromptBuilder does.
+        
+        Args:
+            text: Text to measure
+            
+        Returns:
+            Approximate number of tokens
+        """
+        return (len(text) + 3) // 4
+        
+    @staticmethod
+    def _words(text: str) -> set:
+        """
+        Split text into lowercase words, singularized.
+        """
+        words = WORD_PATTERN.findall(str(text).lower())
+        return {word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words}
+        
+    @staticmethod
+    def describe_result(result: Any, result_info: Optional[Dict] = None) -> str:
+        """
+        Describe the shape of an answer's result.
+        
+        Args:
+            result: Serialized result from the Executor Agent
+            result_info: Paging info for results kept in the result store
+            
+        Returns:
+            Short shape description, e.g. "4 rows x 2 cols"
+        """
+        if result_info:
+            return f"{result_info['total_rows']} rows x {len(result_info['columns'])} cols"
+        if isinstance(result, list):
+            columns = len(result[0]) if result and isinstance(result[0], dict) else 1
+            return f"{len(result)} rows x {columns} cols"
+        if isinstance(result, dict):
+            return f"{len(result)} values"
+        if result is None:
+            return "none"
+        return f"value {str(result)[:30]}"
+        
+    @staticmethod
+    def extract_columns(code: str, columns: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Find the dataset columns generated code refers to.
+        
+        Args:
+            code: Generated Python code
+            columns: Column names of the dataset; without them only
+                subscripted names such as df['Sales'] are recognized
+                
+        Returns:
+            Column names in order of first use
+        """
+        if columns is not None:
+            known = {str(column) for column in columns}
+            found = [match.group(2) for match in QUOTED_PATTERN.finditer(code)]
+            found = [name for name in found if name in known]
+        else:
+            found = [match.group(2) for match in SUBSCRIPT_PATTERN.finditer(code)]
+        return list(dict.fromkeys(found))
+        
+    @staticmethod
+    def extract_filters(code: str) -> List[str]:
+        """
+        Find the row filters generated code applies.
+        
+        Args:
+            code: Generated Python code
+            
+        Returns:
+            Filters such as "Profit < 0" or "Region isin ['West']"
+        """
+        filters = []
+        for match in COMPARISON_PATTERN.finditer(code):
+            filters.append(f"{match.group('column')} {match.group('op')} {match.group('value').strip()}")
+        for match in METHOD_FILTER_PATTERN.finditer(code):
+            filters.append(f"{match.group('column')} {match.group('method')} {match.group('args').strip()}")
+        for match in QUERY_PATTERN.finditer(code):
+            filters.append(match.group('expression').strip())
+        return list(dict.fromkeys(filter_text[:60] for filter_text in filters))
         
-    def add_message(self, role: str, content: str, metadata: Optional[Dict] = None):
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        metadata: Optional[Dict] = None,
+        columns: Optional[Iterable[str]] = None
+    ):
         """
         Add a message to the conversation history.
+        An assistant message completes the turn opened by the last user
+        message, and the turn's summary is added to the memory.
         
         Args:
             role: Role of the message sender (user/assistant)
             content: Message content
-            metadata: Optional metadata about the message
+            metadata: Optional metadata about the message. For assistant
+                messages the summary uses "plan", "code", "result_shape",
+                "result_id", "has_visualization" and "error"
+            columns: Column names of the dataset, used to find the columns
+                the answer's code touched
         """
-        message = {
-            "role": role,
-            "content": content,
-            "metadata": metadata or {}
+        metadata = metadata or {}
+        
+        with self._lock:
+            if role == "user":
+                self._pending_question = content
+                self.history.append({"role": role, "content": content, "metadata": {}})
+                return
+                
+            summary = None
+            if self._pending_question is not None:
+                summary = self._summarize(self._pending_question, content, metadata, columns)
+                self._pending_question = None
+                self._remember(summary)
+                
+            # The transcript keeps the summary instead of the plan and code it came from
+            self.history.append({
+                "role": role,
+                "content": content,
+                "metadata": {
+                    "has_visualization": bool(metadata.get("has_visualization")),
+                    "error": bool(metadata.get("error")),
+                    "turn": self._public(summary) if summary else None
+                }
+            })
+            
+    def _summarize(self, question: str, answer: str, metadata: Dict, columns: Optional[Iterable[str]]) -> Dict:
+        """
+        Build the structured summary of one question and its answer.
+        """
+        plan = metadata.get("plan") or {}
+        code = metadata.get("code") or ""
+        visualization = plan.get("visualization_type") if metadata.get("has_visualization") else None
+        
+        self.turn_count += 1
+        summary = {
+            "turn": self.turn_count,
+            "question": question[:200],
+            "answer": answer[:self.answer_chars],
+            "columns": self.extract_columns(code, columns),
+            "filters": self.extract_filters(code),
+            "operations": [str(operation) for operation in plan.get("data_operations", [])][:4],
+            "result_shape": metadata.get("result_shape"),
+            "visualization": visualization if visualization and visualization != "none" else None,
+            "error": bool(metadata.get("error")),
+            "result_id": metadata.get("result_id"),
+            "plan": {key: plan[key] for key in TURN_PLAN_KEYS if key in plan},
+            "uses": 0
         }
-        self.history.append(message)
-    
+        return self._index(summary)
+
+    def _index(self, summary: Dict) -> Dict:
+        """
+        Add the rendered text, token count and words used for ranking to a summary.
+        """
+        summary["text"] = self._render(summary)
+        summary["tokens"] = self.estimate_tokens(summary["text"])
+        summary["words"] = self._words(" ".join([summary["question"]] + summary["columns"]))
+        return summary
+        
+    @staticmethod
+    def _render(summary: Dict) -> str:
+        """
+        Render a turn summary as one prompt line.
+        """
+        parts = [f"Q{summary['turn']}: {summary['question']}"]
+        if summary["columns"]:
+            parts.append(f"cols: {', '.join(summary['columns'])}")
+        if summary["filters"]:
+            parts.append(f"filters: {'; '.join(summary['filters'])}")
+        if summary["operations"]:
+            parts.append(f"ops: {', '.join(summary['operations'])}")
+        if summary["error"]:
+            parts.append("failed")
+        elif summary["result_shape"]:
+            parts.append(f"result: {summary['result_shape']}")
+        if summary["visualization"]:
+            parts.append(f"chart: {summary['visualization']}")
+        if summary["answer"] and not summary["error"]:
+            parts.append(f"answer: {summary['answer']}")
+        return " | ".join(parts)
+        
+    @staticmethod
+    def _public(summary: Dict) -> Dict:
+        """
+        Copy of a turn summary without the fields used only for ranking.
+        """
+        return {key: value for key, value in summary.items() if key not in INTERNAL_TURN_KEYS}
+        
+    def _relevance(self, summary: Dict, words: set) -> float:
+        """
+        Score how strongly a turn relates to some text's words.
+        """
+        if not words:
+            return 0.0
+        column_words = self._words(" ".join(summary["columns"]))
+        shared = summary["words"] & words
+        return len(shared) / len(words) + len(column_words & words)
+        
+    def _remember(self, summary: Dict):
+        """
+        Add a turn to the memory and evict turns while over the token budget.
+        The newest turn is always kept; among the others, those least related
+        to it go first, with recency and past use in prompts breaking ties.
+        """
+        self.turns.append(summary)
+        
+        while sum(turn["tokens"] for turn in self.turns) > self.memory_token_budget and len(self.turns) > 1:
+            latest = self.turns[-1]
+            
+            def retention(item):
+                age, turn = item
+                return (
+                    self._relevance(turn, latest["words"])
+                    + 0.5 ** age
+                    + 0.2 * min(turn["uses"], 5)
+                )
+                
+            candidates = [(len(self.turns) - 1 - index, turn) for index, turn in enumerate(self.turns[:-1])]
+            _, evicted = min(candidates, key=retention)
+            self.turns.remove(evicted)
+            self.evictions += 1
+            
+    def get_prompt_context(self, question: str = "", token_budget: Optional[int] = None) -> str:
+        """
+        Select and render the remembered turns most relevant to a question.
+        The latest turn is always included because follow-ups usually refer
+        to it; other turns are added by relevance while the budget lasts and
+        are listed in chronological order.
+        
+        Args:
+            question: The new question
+            token_budget: Approximate tokens allowed, prompt_token_budget if omitted
+            
+        Returns:
+            One line per selected turn, or an empty string
+        """
+        budget = token_budget if token_budget is not None else self.prompt_token_budget
+        words = self._words(question)
+        
+        with self._lock:
+            if not self.turns:
+                return ""
+                
+            latest = self.turns[-1]
+            ranked = sorted(
+                self.turns[:-1],
+                key=lambda turn: (self._relevance(turn, words), turn["turn"]),
+                reverse=True
+            )
+            
+            selected = []
+            used = 0
+            for turn in [latest] + [turn for turn in ranked if self._relevance(turn, words) > 0]:
+                if used + turn["tokens"] > budget and selected:
+                    continue
+                selected.append(turn)
+                used += turn["tokens"]
+                
+            for turn in selected:
+                turn["uses"] += 1
+                
+            return "\n".join(turn["text"] for turn in sorted(selected, key=lambda turn: turn["turn"]))
+            
     def get_history(self) -> List[Dict]:
         """
         Get the conversation history.
@@ -45,8 +348,9 @@ class ContextManager:
         Returns:
             List of messages in chronological order
         """
-        return list(self.history)
-    
+        with self._lock:
+            return list(self.history)
+            
     def get_last_n(self, n: int) -> List[Dict]:
         """
         Get the last N messages.
@@ -57,15 +361,58 @@ class ContextManager:
         Returns:
             List of last N messages
         """
-        history = list(self.history)
+        history = self.get_history()
         return history[-n:] if len(history) >= n else history
+        
+    def get_turns(self) -> List[Dict]:
+        """
+        Get the summaries of the remembered turns.
+        
+        Returns:
+            Turn summaries in chronological order
+        """
+        with self._lock:
+            return [self._public(turn) for turn in self.turns]
+            
+    def snapshot(self) -> Dict:
+        """
+        Capture the transcript and memory for the session store.
+        
+        Returns:
+            JSON-serializable state accepted by restore
+        """
+        with self._lock:
+            return {
+                "history": [dict(message) for message in self.history],
+                "turns": [{**self._public(turn), "uses": turn["uses"]} for turn in self.turns],
+                "turn_count": self.turn_count,
+                "evictions": self.evictions
+            }
     
-    def clear(self):
+    def restore(self, state: Dict):
         """
-        Clear the conversation history.
+        Replace the transcript and memory with a snapshot's.
+        
+        Args:
+            state: State from snapshot
         """
-        self.history.clear()
+        with self._lock:
+            self.history.clear()
+            self.history.extend(state.get("history", []))
+            self.turns = [self._index({"uses": 0, **turn}) for turn in state.get("turns", [])]
+            self.turn_count = state.get("turn_count", len(self.turns))
+            self.evictions = state.get("evictions", 0)
+            self._pending_question = None
     
+    def clear(self):
+        """
+        Clear the conversation history and memory.
+        """
+        with self._lock:
+            self.history.clear()
+            self.turns.clear()
+            self._pending_question = None
+            
     def get_context_summary(self) -> str:
         """
         Get a summary of the current context.
@@ -73,7 +420,22 @@ class ContextManager:
         Returns:
             String summary of the conversation
         """
-        if not self.history:
-            return ""
+        with self._lock:
+            return "\n".join(turn["text"] for turn in self.turns)
+            
+    def get_stats(self) -> Dict:
+        """
+        Get memory counters.
         
-        return "\n".join([f"{m['role'][0]}:{m['content'][:40]}" for m in self.history])
+        Returns:
+            Dictionary with memory statistics
+        """
+        with self._lock:
+            return {
+                "turns": len(self.turns),
+                "turn_count": self.turn_count,
+                "memory_tokens": sum(turn["tokens"] for turn in self.turns),
+                "memory_token_budget": self.memory_token_budget,
+                "prompt_token_budget": self.prompt_token_budget,
+                "evictions": self.evictions
+            }
@@ -2,37 +2,86 @@
 Data Manager for handling file uploads and data operations
 """
 
+import numpy as np
 import pandas as pd
+import hashlib
 import io
-from typing import Dict, Optional, Tuple
+import json
+from typing import Dict, List, Optional, Tuple
 import os
+import shutil
+import time
+import uuid
 from werkzeug.utils import secure_filename
 
+from .dataset_store import DatasetStore
+from .ingestion import align_to_schema, infer_dtypes, optimize_dtypes, read_csv_optimized
+from .profiler import build_profile, update_profile
+from .query_engine import QueryEngine
+from .relationships import infer_relationships, make_table_name, parse_relationship
+
 
 class DataManager:
     """
     Manages data upload, storage, and retrieval.
     """
     
-    def __init__(self, upload_folder: str = "uploads", max_size_mb: int = 10):
+    def __init__(
+        self, 
+        upload_folder: str = "uploads", 
+        max_size_mb: int = 10, 
+        csv_engine: str = "c", 
+        chunksize: int = 100_000, 
+        approximate_profile: Optional[bool] = None, 
+        query_engine: Optional[QueryEngine] = None, 
+        query_engine_min_mb: int = 100
+    ):
         """
         Initialize the Data Manager.
         
         Args:
             upload_folder: Folder to store uploaded files
             max_size_mb: Maximum file size in MB
+            csv_engine: 'c' for chunked CSV ingestion, 'pyarrow' for a multi-threaded read
+            chunksize: Rows per chunk for chunked CSV ingestion
+            approximate_profile: Force approximate (True) or exact (False) profiling;
+                by default it is chosen from the table size
+            query_engine: Optional engine that queries large CSVs on disk
+                instead of loading them into pandas
+            query_engine_min_mb: CSV size from which the query engine is used
         """
         self.upload_folder = upload_folder
         self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.csv_engine = csv_engine
+        self.chunksize = chunksize
+        self.approximate_profile = approximate_profile
+        self.query_engine = query_engine
+        self.query_engine_min_bytes = query_engine_min_mb * 1024 * 1024
         self.current_df: Optional[pd.DataFrame] = None
         self.current_filename: Optional[str] = None
+        self.current_fingerprint: Optional[str] = None
+        # Fingerprint of the uploaded file; appends derive new versions from it
+        self.upload_fingerprint: Optional[str] = None
+        self.ingestion_stats: Optional[Dict] = None
+        self.profile: Optional[Dict] = None
+        # Name of the main table, the one generated code sees as df
+        self.current_table: Optional[str] = None
+        # Other tables by name: df, filename, fingerprint and memory_bytes
+        self.tables: Dict[str, Dict] = {}
+        self.declared_relationships: List[Dict] = []
+        self._inferred_relationships: Optional[List[Dict]] = None
+        # Parquet file of a dataset queried out of core; current_df is then None
+        self.query_path: Optional[str] = None
         
         # Create upload folder if it doesn't exist
         os.makedirs(upload_folder, exist_ok=True)
         
+        # Parsed datasets are kept on disk, keyed by file content hash
+        self.dataset_store = DatasetStore(os.path.join(upload_folder, 'datasets'))
+        
         # Allowed extensions
         self.allowed_extensions = {'csv', 'xlsx', 'xls'}
-    
+        
     def allowed_file(self, filename: str) -> bool:
         """
         Check if file extension is allowed.
@@ -45,7 +94,7 @@ class DataManager:
         """
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
-    
+               
     def load_file(self, file_data, filename: str) -> Tuple[bool, str, Optional[Dict]]:
         """
         Load a CSV or Excel file into a DataFrame.
@@ -61,24 +110,38 @@ class DataManager:
             # Check file extension
             if not self.allowed_file(filename):
                 return False, "Invalid file type. Please upload CSV or Excel files.", None
+                
+            # Reuse the stored copy if this exact file was parsed before
+            start = time.perf_counter()
+            content_hash = self.dataset_store.hash_content(file_data)
             
-            # Get file extension
-            ext = filename.rsplit('.', 1)[1].lower()
-            
-            # Read file based on extension
-            if ext == 'csv':
-                if isinstance(file_data, bytes):
-                    self.current_df = pd.read_csv(io.BytesIO(file_data))
-                else:
-                    self.current_df = pd.read_csv(file_data)
-            elif ext in ['xlsx', 'xls']:
-                if isinstance(file_data, bytes):
-                    self.current_df = pd.read_excel(io.BytesIO(file_data))
-                else:
-                    self.current_df = pd.read_excel(file_data)
+            if self._use_query_engine(file_data, filename):
+                self._load_out_of_core(file_data, filename, content_hash, start)
+                return True, "File uploaded successfully", self.get_data_info()
+                
+            df = self.dataset_store.load(content_hash)
             
+            if df is not None:
+                self.ingestion_stats = {
+                    "engine": "dataset_store",
+                    "seconds": round(time.perf_counter() - start, 4)
+                }
+            else:
+                df, self.ingestion_stats = self._parse_file(file_data, filename, start)
+                self.dataset_store.save(content_hash, df)
+                
+            self.current_df = df
             self.current_filename = filename
+            self.current_fingerprint = content_hash
+            self.upload_fingerprint = content_hash
+            self.profile = None
+            self.query_path = None
+            self._reset_tables(make_table_name(filename))
             
+            # The other sheets of a workbook become tables of their own
+            if filename.rsplit('.', 1)[1].lower() in ('xlsx', 'xls'):
+                self._load_other_sheets(file_data, content_hash)
+                
             # Get data info
             data_info = self.get_data_info()
             
@@ -86,52 +149,426 @@ class DataManager:
             
         except Exception as e:
             return False, f"Error loading file: {str(e)}", None
-    
-    def get_data_info(self) -> Optional[Dict]:
+            
+    def _use_query_engine(self, file_data, filename: str) -> bool:
         """
-        Get information about the current dataset.
+        Check whether an upload is a CSV large enough for the query engine.
+        """
+        if self.query_engine is None or filename.rsplit('.', 1)[1].lower() != 'csv':
+            return False
+            
+        if isinstance(file_data, bytes):
+            size = len(file_data)
+        else:
+            file_data.seek(0, os.SEEK_END)
+            size = file_data.tell()
+            file_data.seek(0)
+        return size >= self.query_engine_min_bytes
+        
+    def _load_out_of_core(self, file_data, filename: str, content_hash: str, start: float):
+        """
+        Convert a CSV to Parquet for the query engine instead of loading it.
+        The profile comes from the conversion and is kept in the dataset store
+        with the Parquet file, so the dataset is never held in memory.
+        
+        Args:
+            file_data: CSV data (bytes or file object)
+            filename: Name of the file
+            content_hash: Fingerprint of the file
+            start: perf_counter value the ingestion time is measured from
+        """
+        path = self.dataset_store.parquet_path_for(content_hash)
+        profile = self.dataset_store.load_profile(content_hash) if os.path.exists(path) else None
         
+        if profile is None or profile.get("engine") != self.query_engine.name:
+            # The engine reads the upload from disk, in another process
+            source_path = os.path.join(self.upload_folder, f"{content_hash}.upload.csv")
+            try:
+                if isinstance(file_data, bytes):
+                    with open(source_path, 'wb') as file:
+                        file.write(file_data)
+                else:
+                    with open(source_path, 'wb') as file:
+                        shutil.copyfileobj(file_data, file, 1024 * 1024)
+                profile = self.query_engine.prepare(source_path, path)
+            finally:
+                if os.path.exists(source_path):
+                    os.remove(source_path)
+            self.dataset_store.save_profile(content_hash, profile)
+            engine = self.query_engine.name
+        else:
+            engine = "dataset_store"
+            
+        self.current_df = None
+        self.query_path = path
+        self.current_filename = filename
+        self.current_fingerprint = content_hash
+        self.upload_fingerprint = content_hash
+        self.profile = profile
+        self.ingestion_stats = {
+            "engine": engine,
+            "query_engine": self.query_engine.name,
+            "seconds": round(time.perf_counter() - start, 4)
+        }
+        self._reset_tables(make_table_name(filename))
+        
+    def _parse_file(self, file_data, filename: str, start: float) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Parse a CSV or Excel file with optimized dtypes.
+        
+        Args:
+            file_data: File data (bytes or file object)
+            filename: Name of the file, whose extension picks the reader
+            start: perf_counter value the ingestion time is measured from
+            
         Returns:
-            Dictionary with dataset information
+            Tuple of (DataFrame, ingestion statistics)
         """
+        # Get file extension
+        ext = filename.rsplit('.', 1)[1].lower()
+        
+        # Read file based on extension
+        if ext == 'csv':
+            return read_csv_optimized(
+                file_data,
+                chunksize=self.chunksize,
+                engine=self.csv_engine
+            )
+            
+        if isinstance(file_data, bytes):
+            df = pd.read_excel(io.BytesIO(file_data))
+        else:
+            df = pd.read_excel(file_data)
+            
+        memory_before = int(df.memory_usage(deep=True).sum())
+        df = self._optimize(df)
+        memory_after = int(df.memory_usage(deep=True).sum())
+        return df, {
+            "engine": "openpyxl",
+            "seconds": round(time.perf_counter() - start, 4),
+            "memory_before_bytes": memory_before,
+            "memory_after_bytes": memory_after,
+            "memory_saved_bytes": max(memory_before - memory_after, 0)
+        }
+        
+    @staticmethod
+    def _optimize(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Turn repetitive strings into categories and keep integers as int64.
+        """
+        _, category_columns = infer_dtypes(df.head(10_000))
+        return optimize_dtypes(df, category_columns)
+        
+    def _load_other_sheets(self, file_data, content_hash: str):
+        """
+        Load every sheet after the first of a workbook as a table of its own.
+        The first sheet stays the main table and is named after its sheet.
+        
+        Args:
+            file_data: Excel file data (bytes or file object)
+            content_hash: Fingerprint of the workbook
+        """
+        if not isinstance(file_data, bytes):
+            file_data.seek(0)
+        excel = pd.ExcelFile(io.BytesIO(file_data) if isinstance(file_data, bytes) else file_data)
+        if len(excel.sheet_names) < 2:
+            return
+            
+        self.current_table = make_table_name(excel.sheet_names[0])
+        for sheet in excel.sheet_names[1:]:
+            fingerprint = hashlib.sha256(f"{content_hash}:{sheet}".encode('utf-8')).hexdigest()
+            df = self.dataset_store.load(fingerprint)
+            if df is None:
+                df = self._optimize(excel.parse(sheet))
+                self.dataset_store.save(fingerprint, df)
+            self._set_table(make_table_name(sheet), df, self.current_filename, fingerprint)
+            
+    def add_table(
+        self, 
+        file_data, 
+        filename: str, 
+        table_name: Optional[str] = None
+    ) -> Tuple[bool, str, Optional[Dict]]:
+        """
+        Load a CSV or Excel file as a named table next to the main dataset.
+        Generated code reaches it as tables['<name>'] or through join(), so
+        nothing is merged until a question needs it.
+        
+        Args:
+            file_data: File data (bytes or file object)
+            filename: Name of the file
+            table_name: Table name, derived from the file name if omitted;
+                a table of the same name is replaced
+                
+        Returns:
+            Tuple of (success, message, data_info)
+        """
+        if self.query_path is not None:
+            return False, "Tables cannot be added to a dataset queried out of core", None
         if self.current_df is None:
-            return None
+            return False, "No dataset loaded to add a table to. Please upload a file first.", None
+            
+        table_name = make_table_name(table_name or filename)
+        if table_name == self.current_table:
+            return False, f"'{table_name}' is the main table; upload without a table name to replace it", None
+            
+        try:
+            if not self.allowed_file(filename):
+                return False, "Invalid file type. Please upload CSV or Excel files.", None
+                
+            start = time.perf_counter()
+            fingerprint = self.dataset_store.hash_content(file_data)
+            df = self.dataset_store.load(fingerprint)
+            if df is None:
+                df, _ = self._parse_file(file_data, filename, start)
+                self.dataset_store.save(fingerprint, df)
+                
+            self._set_table(table_name, df, filename, fingerprint)
+            
+            return True, f"Added table '{table_name}'", self.get_data_info()
+            
+        except Exception as e:
+            return False, f"Error loading table: {str(e)}", None
+            
+    def _set_table(self, name: str, df: pd.DataFrame, filename: str, fingerprint: str):
+        """
+        Add or replace a table and forget relationships that no longer fit.
+        """
+        self.tables[name] = {
+            "df": df,
+            "filename": filename,
+            "fingerprint": fingerprint,
+            "memory_bytes": int(df.memory_usage(deep=True).sum())
+        }
+        self._inferred_relationships = None
+        
+        tables = self.get_tables()
+        self.declared_relationships = [
+            relationship for relationship in self.declared_relationships
+            if relationship["from_column"] in tables.get(relationship["from_table"], {})
+            and relationship["to_column"] in tables.get(relationship["to_table"], {})
+        ]
+        
+    def _reset_tables(self, table_name: Optional[str]):
+        """
+        Drop the other tables and relationships when the main table is replaced.
+        """
+        self.current_table = table_name
+        self.tables = {}
+        self.declared_relationships = []
+        self._inferred_relationships = None
         
-        # Get column info
-        columns = []
-        for col in self.current_df.columns:
-            col_info = {
-                "name": col,
-                "type": str(self.current_df[col].dtype),
-                "null_count": int(self.current_df[col].isnull().sum()),
-                "unique_count": int(self.current_df[col].nunique())
+    def append_file(
+        self, 
+        file_data, 
+        filename: str, 
+        mode: str = "append", 
+        key_columns: Optional[List[str]] = None
+    ) -> Tuple[bool, str, Optional[Dict]]:
+        """
+        Add the rows of a CSV or Excel file to the current dataset.
+        Only the new file is parsed. Its columns must match the dataset's and
+        its values must fit their types; category and integer columns are
+        widened when needed. The profile is updated from the new rows, and
+        the result is a new dataset version with its own fingerprint.
+        
+        Args:
+            file_data: File data (bytes or file object)
+            filename: Name of the file
+            mode: 'append' adds every row; 'upsert' overwrites rows whose
+                key columns match a new row and appends the rest
+            key_columns: Columns identifying a row, required for 'upsert'
+            
+        Returns:
+            Tuple of (success, message, data_info)
+        """
+        if self.query_path is not None:
+            return False, "Rows cannot be added to a dataset queried out of core", None
+        if self.current_df is None:
+            return False, "No dataset loaded to add rows to. Please upload a file first.", None
+        if mode not in ("append", "upsert"):
+            return False, f"Unknown upload mode: {mode}", None
+            
+        key_columns = key_columns or []
+        if mode == "upsert":
+            if not key_columns:
+                return False, "Upsert needs at least one key column", None
+            unknown = [col for col in key_columns if col not in self.current_df.columns]
+            if unknown:
+                return False, f"Unknown key columns: {unknown}", None
+                
+        try:
+            if not self.allowed_file(filename):
+                return False, "Invalid file type. Please upload CSV or Excel files.", None
+                
+            start = time.perf_counter()
+            chunk_hash = self.dataset_store.hash_content(file_data)
+            chunk, parse_stats = self._parse_file(file_data, filename, start)
+            
+            try:
+                chunk, widened = align_to_schema(chunk, self.current_df)
+            except ValueError as e:
+                return False, str(e), None
+                
+            previous_profile = self.get_profile()
+            
+            # Shallow copy: only widened and overwritten columns are copied
+            df = self.current_df.copy(deep=False)
+            for col, series in widened.items():
+                df[col] = series
+                
+            removed = None
+            updated = chunk.iloc[0:0]
+            if mode == "upsert":
+                df, chunk, removed, updated = self._upsert(df, chunk, key_columns)
+                
+            if len(chunk):
+                df = pd.concat([df, chunk], ignore_index=True)
+                
+            self.profile = update_profile(
+                previous_profile,
+                df,
+                pd.concat([updated, chunk], ignore_index=True),
+                removed,
+                approximate=self.approximate_profile
+            )
+            
+            # Each append makes a version of its own, so no other session shares it
+            previous_fingerprint = self.current_fingerprint
+            version_source = f"{previous_fingerprint}:{mode}:{','.join(key_columns)}:{chunk_hash}:{uuid.uuid4().hex}"
+            self.current_fingerprint = hashlib.sha256(version_source.encode('utf-8')).hexdigest()
+            self.current_df = df
+            self._inferred_relationships = None
+            
+            saved = self.dataset_store.save(self.current_fingerprint, df)
+            self.dataset_store.save_profile(self.current_fingerprint, {
+                key: value for key, value in self.profile.items() if key != "sketches"
+            })
+            
+            # The version appended to is superseded; the uploaded file's copy
+            # stays, since other sessions may have uploaded the same file
+            if saved and previous_fingerprint != self.upload_fingerprint:
+                self.dataset_store.delete(previous_fingerprint)
+                
+            self.ingestion_stats = {
+                "engine": parse_stats["engine"],
+                "mode": mode,
+                "rows_appended": int(len(chunk)),
+                "rows_updated": int(len(updated)),
+                "widened_columns": list(widened),
+                "previous_fingerprint": previous_fingerprint,
+                "seconds": round(time.perf_counter() - start, 4)
             }
             
-            # Add sample values for categorical columns
-            if self.current_df[col].dtype == 'object' or self.current_df[col].nunique() < 10:
-                col_info["sample_values"] = self.current_df[col].dropna().unique()[:5].tolist()
+            message = f"Appended {len(chunk)} rows"
+            if mode == "upsert":
+                message = f"Updated {len(updated)} rows and appended {len(chunk)} rows"
+                
+            return True, message, self.get_data_info()
             
-            columns.append(col_info)
+        except Exception as e:
+            return False, f"Error adding rows: {str(e)}", None
+            
+    @staticmethod
+    def _upsert(
+        df: pd.DataFrame, 
+        chunk: pd.DataFrame, 
+        key_columns: List[str]
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Overwrite the rows of df whose key matches a row of chunk, in place of
+        the old rows so the row order is kept. Later chunk rows win over
+        earlier ones with the same key.
         
-        # Calculate file size from memory usage
-        memory_bytes = self.current_df.memory_usage(deep=True).sum()
-        if memory_bytes < 1024:
-            size_str = f"{memory_bytes:.0f} B"
-        elif memory_bytes < 1024 * 1024:
-            size_str = f"{memory_bytes / 1024:.2f} KB"
-        else:
-            size_str = f"{memory_bytes / (1024 * 1024):.2f} MB"
+        Returns:
+            Tuple of (updated df, chunk rows with new keys to append,
+            previous values of the overwritten rows, their new values)
+        """
+        chunk = chunk.drop_duplicates(subset=key_columns, keep='last')
+        
+        def keys_of(frame: pd.DataFrame) -> pd.Index:
+            if len(key_columns) > 1:
+                return pd.MultiIndex.from_frame(frame[key_columns])
+            return pd.Index(frame[key_columns[0]])
+            
+        existing_keys = keys_of(df)
+        chunk_keys = keys_of(chunk)
+        matched = existing_keys.isin(chunk_keys)
+        appended = chunk[~chunk_keys.isin(existing_keys)]
+        
+        rows = np.flatnonzero(matched)
+        if not len(rows):
+            return df, appended, None, chunk.iloc[0:0]
+            
+        removed = df.iloc[rows]
+        updated = chunk.iloc[chunk_keys.get_indexer(existing_keys[matched])]
+        
+        # df shares its columns with the current dataset, which other sessions
+        # and the dataset store may hold: write into copies and swap them in
+        df = df.copy(deep=False)
+        for col in df.columns:
+            column = df[col].copy()
+            column.iloc[rows] = updated[col].to_numpy()
+            df[col] = column
+            
+        return df, appended, removed, updated
+        
+    def get_data_info(self) -> Optional[Dict]:
+        """
+        Get information about the current dataset.
+        The profile is built once per dataset and then served from cache.
+        
+        Returns:
+            Dictionary with dataset information
+        """
+        if not self.has_data():
+            return None
+            
+        profile = self.get_profile()
         
         return {
             "filename": self.current_filename,
-            "rows": int(self.current_df.shape[0]),
-            "columns": int(self.current_df.shape[1]),
-            "size": size_str,
-            "column_details": columns,
-            "memory_usage": f"{self.current_df.memory_usage(deep=True).sum() / 1024:.2f} KB",
-            "preview": self.current_df.head(5).to_dict('records')
+            **{key: value for key, value in profile.items() if key != "sketches"},
+            "ingestion": self.ingestion_stats,
+            "table": self.current_table,
+            "tables": [
+                {
+                    "name": name,
+                    "filename": table["filename"],
+                    "rows": int(table["df"].shape[0]),
+                    "columns": int(table["df"].shape[1]),
+                    "memory_bytes": table["memory_bytes"]
+                }
+                for name, table in self.tables.items()
+            ],
+            "relationships": self.get_relationships()
         }
-    
+        
+    def get_profile(self) -> Optional[Dict]:
+        """
+        Get the cached profile of the current dataset, building it on first use.
+        
+        Returns:
+            Profile from build_profile, or None if no data is loaded
+        """
+        if not self.has_data():
+            return None
+            
+        if self.profile is None:
+            self.profile = self.dataset_store.load_profile(self.current_fingerprint)
+            
+        # Out-of-core profiles are made by the query engine when converting
+        if self.profile is None and self.current_df is not None:
+            self.profile = build_profile(
+                self.current_df,
+                approximate=self.approximate_profile
+            )
+            self.dataset_store.save_profile(self.current_fingerprint, {
+                key: value for key, value in self.profile.items() if key != "sketches"
+            })
+            
+        return self.profile
+        
     def get_dataframe(self) -> Optional[pd.DataFrame]:
         """
         Get the current DataFrame.
@@ -140,25 +577,283 @@ class DataManager:
             Current DataFrame or None
         """
         return self.current_df
-    
+        
+    def has_data(self) -> bool:
+        """
+        Check whether a dataset is loaded, in memory or out of core.
+        """
+        return self.current_df is not None or self.query_path is not None
+        
+    def get_query_dataset(self) -> Optional[Dict]:
+        """
+        Describe a dataset queried out of core for the Executor Agent.
+        
+        Returns:
+            Dict with the Parquet path, row count, schema and a preview
+            DataFrame, or None when the dataset is in memory
+        """
+        if self.query_path is None:
+            return None
+            
+        profile = self.get_profile()
+        return {
+            "path": self.query_path,
+            "engine": profile["engine"],
+            "rows": profile["rows"],
+            "schema": profile["schema"],
+            "preview": pd.DataFrame(profile["preview"])
+        }
+        
+    def get_stored_paths(self) -> Dict:
+        """
+        Locate the stored Arrow files holding the in-memory tables, so a
+        sandbox child can memory-map them instead of receiving them pickled.
+        
+        Returns:
+            Dict with "df" (path of the main table, or None) and "tables"
+            (paths by table name, main table included); tables missing from
+            the store are left out
+        """
+        fingerprints = {name: table["fingerprint"] for name, table in self.tables.items()}
+        if self.current_df is not None and self.current_fingerprint is not None:
+            fingerprints[self.current_table] = self.current_fingerprint
+            
+        paths = {
+            name: self.dataset_store.path_for(fingerprint)
+            for name, fingerprint in fingerprints.items()
+            if self.dataset_store.has(fingerprint)
+        }
+        return {"df": paths.get(self.current_table), "tables": paths}
+        
+    def open_dataset(
+        self, 
+        content_hash: str, 
+        filename: str, 
+        table_name: Optional[str] = None, 
+        upload_fingerprint: Optional[str] = None
+    ) -> bool:
+        """
+        Reopen a previously uploaded dataset from the dataset store.
+        
+        Args:
+            content_hash: Fingerprint of the dataset to reopen
+            filename: Original name of the uploaded file
+            table_name: Name of the main table, derived from the file name if omitted
+            upload_fingerprint: Fingerprint of the uploaded file an appended
+                version derives from; content_hash if omitted
+                
+        Returns:
+            True if the dataset was found and loaded
+        """
+        df = self.dataset_store.load(content_hash)
+        query_path = None
+        if df is None:
+            # A dataset queried out of core needs its Parquet file, its profile and the engine
+            query_path = self.dataset_store.parquet_path_for(content_hash)
+            profile = self.dataset_store.load_profile(content_hash)
+            if (self.query_engine is None or not os.path.exists(query_path) or profile is None
+                    or profile.get("engine") != self.query_engine.name):
+                return False
+                
+        self.current_df = df
+        self.query_path = query_path
+        self.current_filename = filename
+        self.current_fingerprint = content_hash
+        self.upload_fingerprint = upload_fingerprint or content_hash
+        self.ingestion_stats = {"engine": "dataset_store"}
+        self.profile = None
+        self._reset_tables(table_name or make_table_name(filename))
+        return True
+        
+    def open_tables(self, tables: List[Dict], relationships: List[Dict]) -> bool:
+        """
+        Reopen the other tables of a dataset from the dataset store.
+        
+        Args:
+            tables: Entries from get_table_manifest
+            relationships: Declared relationships to restore
+            
+        Returns:
+            True if every table was found
+        """
+        for table in tables:
+            df = self.dataset_store.load(table["fingerprint"])
+            if df is None:
+                return False
+            self._set_table(table["name"], df, table["filename"], table["fingerprint"])
+            
+        self.declared_relationships = list(relationships)
+        return True
+        
+    def get_table_manifest(self) -> List[Dict]:
+        """
+        Get the other tables by reference, for session snapshots.
+        
+        Returns:
+            List of dicts with name, filename and fingerprint
+        """
+        return [
+            {"name": name, "filename": table["filename"], "fingerprint": table["fingerprint"]}
+            for name, table in self.tables.items()
+        ]
+        
+    def get_fingerprint(self) -> Optional[str]:
+        """
+        Get the fingerprint of the current dataset.
+        With other tables loaded it covers them and the declared relationships too.
+        
+        Returns:
+            Hex digest identifying the dataset contents, or None
+        """
+        if not self.tables or self.current_fingerprint is None:
+            return self.current_fingerprint
+            
+        version_source = json.dumps([
+            self.current_fingerprint,
+            sorted((name, table["fingerprint"]) for name, table in self.tables.items()),
+            self.declared_relationships
+        ], sort_keys=True)
+        return hashlib.sha256(version_source.encode('utf-8')).hexdigest()
+        
+    def get_memory_bytes(self) -> int:
+        """
+        Get the memory held by all tables of the dataset.
+        
+        Returns:
+            Memory usage in bytes
+        """
+        profile = self.get_profile()
+        if profile is None:
+            return 0
+        return profile["memory_bytes"] + sum(table["memory_bytes"] for table in self.tables.values())
+        
+    def get_tables(self) -> Dict[str, pd.DataFrame]:
+        """
+        Get every table of the dataset by name, the main table first.
+        
+        Returns:
+            Mapping of table names to DataFrames; empty if no data is loaded
+        """
+        if self.current_df is None:
+            return {}
+        return {
+            self.current_table: self.current_df,
+            **{name: table["df"] for name, table in self.tables.items()}
+        }
+        
+    def get_relationships(self) -> List[Dict]:
+        """
+        Get the relationships between tables: the declared ones, then the
+        inferred ones for pairs of tables without a declaration.
+        Inference runs once per change to the tables.
+        
+        Returns:
+            List of relationship dicts
+        """
+        if not self.tables or self.current_df is None:
+            return []
+            
+        if self._inferred_relationships is None:
+            self._inferred_relationships = infer_relationships(self.get_tables())
+            
+        declared_pairs = {
+            frozenset((relationship["from_table"], relationship["to_table"]))
+            for relationship in self.declared_relationships
+        }
+        return self.declared_relationships + [
+            relationship for relationship in self._inferred_relationships
+            if frozenset((relationship["from_table"], relationship["to_table"])) not in declared_pairs
+        ]
+        
+    def declare_relationships(self, specs: List[str]) -> List[Dict]:
+        """
+        Declare the relationships between tables, replacing earlier declarations.
+        
+        Args:
+            specs: Relationships such as "orders.customer_id = customers.id",
+                foreign key on the left
+                
+        Returns:
+            All relationships in effect
+            
+        Raises:
+            ValueError: If a spec is malformed or names an unknown table or column
+        """
+        tables = self.get_tables()
+        declared = []
+        for spec in specs:
+            relationship = parse_relationship(spec)
+            for side in ("from", "to"):
+                table, column = relationship[f"{side}_table"], relationship[f"{side}_column"]
+                if table not in tables:
+                    raise ValueError(f"Unknown table {table!r}; tables: {list(tables)}")
+                if column not in tables[table].columns:
+                    raise ValueError(f"Unknown column {column!r} in table {table!r}")
+                    
+            from_unique = tables[relationship["from_table"]][relationship["from_column"]].is_unique
+            to_unique = tables[relationship["to_table"]][relationship["to_column"]].is_unique
+            relationship["kind"] = {
+                (True, True): "one-to-one",
+                (False, True): "many-to-one",
+                (True, False): "one-to-many",
+                (False, False): "many-to-many"
+            }[(from_unique, to_unique)]
+            relationship["declared"] = True
+            declared.append(relationship)
+            
+        self.declared_relationships = declared
+        return self.get_relationships()
+        
+    def get_related_tables(self) -> Optional[Dict]:
+        """
+        Describe the other tables and relationships for the agents' prompts.
+        
+        Returns:
+            Dict with the main table's name, the other tables' row counts
+            and schemas, and the relationships; None for a single table
+        """
+        if not self.tables or self.current_df is None:
+            return None
+            
+        return {
+            "table": self.current_table,
+            "tables": {
+                name: {
+                    "rows": int(table["df"].shape[0]),
+                    "schema": {col: str(dtype) for col, dtype in table["df"].dtypes.items()}
+                }
+                for name, table in self.tables.items()
+            },
+            "relationships": self.get_relationships()
+        }
+        
     def get_schema(self) -> Dict:
         """
         Get a simple schema for the Planner Agent.
+        Out of core, the types are the query engine's.
         
         Returns:
             Dictionary with column names and types
         """
+        if self.query_path is not None:
+            return dict(self.get_profile()["schema"])
         if self.current_df is None:
             return {}
-        
+            
         return {
             col: str(dtype) 
             for col, dtype in self.current_df.dtypes.items()
         }
-    
+        
     def clear_data(self):
         """
         Clear the current dataset.
         """
         self.current_df = None
         self.current_filename = None
+        self.current_fingerprint = None
+        self.upload_fingerprint = None
+        self.ingestion_stats = None
+        self.profile = None
+        self.query_path = None
+        self._reset_tables(None)
@@ -0,0 +1,234 @@
+"""
+Dataset Store for keeping parsed uploads on disk in Arrow format
+"""
+
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+
+class DatasetStore:
+    """
+    Columnar on-disk store of parsed datasets, keyed by the hash of the
+    uploaded file's contents.
+    Datasets are written once as uncompressed Arrow IPC files, so reloading
+    one (a re-upload of the same file, or a session reopened after a worker
+    restart) memory-maps it instead of parsing CSV/XLSX again.
+    """
+    
+    def __init__(self, root: str):
+        """
+        Initialize the Dataset Store.
+        
+        Args:
+            root: Folder holding the Arrow files
+        """
+        self.root = root
+        self.available = pa is not None
+        
+        if self.available:
+            os.makedirs(root, exist_ok=True)
+            
+    @staticmethod
+    def hash_content(file_data) -> str:
+        """
+        Hash uploaded file contents without holding them in memory twice.
+        
+        Args:
+            file_data: File data (bytes or seekable file object)
+            
+        Returns:
+            SHA-256 hex digest of the contents
+        """
+        digest = hashlib.sha256()
+        
+        if isinstance(file_data, bytes):
+            digest.update(file_data)
+            return digest.hexdigest()
+            
+        for chunk in iter(lambda: file_data.read(1024 * 1024), b''):
+            digest.update(chunk)
+        file_data.seek(0)
+        
+        return digest.hexdigest()
+        
+    def path_for(self, content_hash: str) -> str:
+        """
+        Get the Arrow file path for a content hash.
+        
+        Args:
+            content_hash: Hash from hash_content
+            
+        Returns:
+            Path of the Arrow file
+        """
+        return os.path.join(self.root, f"{content_hash}.arrow")
+        
+    def parquet_path_for(self, content_hash: str) -> str:
+        """
+        Get the Parquet file path for a dataset queried out of core.
+        
+        Args:
+            content_hash: Hash from hash_content
+            
+        Returns:
+            Path of the Parquet file
+        """
+        return os.path.join(self.root, f"{content_hash}.parquet")
+        
+    def has(self, content_hash: str) -> bool:
+        """
+        Check whether a dataset is stored.
+        
+        Args:
+            content_hash: Hash from hash_content
+            
+        Returns:
+            True if the dataset can be loaded from disk
+        """
+        return self.available and os.path.exists(self.path_for(content_hash))
+        
+    def load(self, content_hash: str) -> Optional[pd.DataFrame]:
+        """
+        Memory-map a stored dataset into a DataFrame.
+        Numeric columns without nulls stay backed by the mapped file.
+        
+        Args:
+            content_hash: Hash from hash_content
+            
+        Returns:
+            The stored DataFrame, or None if it is not stored or unreadable
+        """
+        if not self.has(content_hash):
+            return None
+            
+        try:
+            return self.read(self.path_for(content_hash))
+        except (OSError, pa.ArrowException):
+            return None
+            
+    @staticmethod
+    def read(path: str) -> pd.DataFrame:
+        """
+        Memory-map a stored dataset file, e.g. one passed to a sandbox child by path.
+        
+        Args:
+            path: Path from path_for
+            
+        Returns:
+            The stored DataFrame
+        """
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+        
+    def save(self, content_hash: str, df: pd.DataFrame) -> bool:
+        """
+        Write a dataset to the store.
+        
+        Args:
+            content_hash: Hash from hash_content
+            df: Parsed DataFrame
+            
+        Returns:
+            True if the dataset was written
+        """
+        if not self.available:
+            return False
+            
+        path = self.path_for(content_hash)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, temp_path, compression='uncompressed')
+            # Atomic rename so concurrent readers never see a partial file
+            os.replace(temp_path, path)
+            return True
+            
+        except (OSError, TypeError, ValueError, pa.ArrowException):
+            # Column names or mixed-type columns Arrow cannot represent
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+            
+    def delete(self, content_hash: str) -> bool:
+        """
+        Remove a dataset and its profile from the store.
+        Processes that memory-mapped the file keep their mapping.
+        
+        Args:
+            content_hash: Hash from hash_content
+            
+        Returns:
+            True if anything was removed
+        """
+        if not self.available:
+            return False
+            
+        removed = False
+        path = self.path_for(content_hash)
+        for file_path in (path, path + ".profile.json"):
+            try:
+                os.remove(file_path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+        
+    def load_profile(self, content_hash: str) -> Optional[Dict]:
+        """
+        Load the stored profile of a dataset.
+        
+        Args:
+            content_hash: Hash from hash_content
+            
+        Returns:
+            The profile dict, or None if none was stored
+        """
+        if not self.available:
+            return None
+            
+        try:
+            with open(self.path_for(content_hash) + ".profile.json") as profile_file:
+                return json.load(profile_file)
+        except (OSError, ValueError):
+            return None
+            
+    def save_profile(self, content_hash: str, profile: Dict) -> bool:
+        """
+        Store a dataset profile next to the dataset.
+        
+        Args:
+            content_hash: Hash from hash_content
+            profile: JSON-serializable profile from build_profile
+            
+        Returns:
+            True if the profile was written
+        """
+        if not self.available:
+            return False
+            
+        path = self.path_for(content_hash) + ".profile.json"
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        
+        try:
+            with open(temp_path, 'w') as profile_file:
+                json.dump(profile, profile_file, default=str)
+            os.replace(temp_path, path)
+            return True
+            
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
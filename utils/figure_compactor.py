@@ -0,0 +1,336 @@
+"""
+Figure Compactor for keeping Plotly payloads small
+"""
+
+from typing import Dict, Optional, Tuple
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+# Typed-array dtype codes understood by plotly.js (no 64-bit integers)
+TYPED_ARRAY_CODES = {
+    "int8": "i1", "uint8": "u1", "int16": "i2", "uint16": "u2",
+    "int32": "i4", "uint32": "u4", "float32": "f4", "float64": "f8"
+}
+
+# Trace types whose points can be thinned without changing what they show
+DOWNSAMPLED_TYPES = ("scatter", "scattergl")
+
+# Nested attributes that may hold one value per point
+PER_POINT_CONTAINERS = ("marker", "error_x", "error_y")
+
+
+class FigureCompactor:
+    """
+    Turns a Plotly figure into a compact JSON payload for the browser.
+    Line traces longer than max_points are downsampled with
+    Largest-Triangle-Three-Buckets, which keeps the peaks and dips a reader
+    would notice; scatter traces are thinned on a grid so every occupied
+    region keeps some points while over-plotted ones are capped. Numeric
+    arrays are sent in plotly.js's base64 typed-array form instead of
+    decimal text. If the payload is still over max_bytes the point target
+    is halved until it fits, and the figure is dropped below min_points.
+    """
+    
+    def __init__(self, max_points: int = 5000, max_bytes: int = 2 * 1024 * 1024, min_points: int = 500):
+        """
+        Initialize the Figure Compactor.
+        
+        Args:
+            max_points: Points kept per trace
+            max_bytes: Largest figure JSON sent to the browser
+            min_points: Smallest per-trace target tried before giving up on the figure
+        """
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        self.min_points = min_points
+        
+    def to_json(self, fig) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Serialize a figure within the point and byte budgets.
+        
+        Args:
+            fig: Plotly figure
+            
+        Returns:
+            Tuple of (figure JSON or None if it cannot fit the byte budget,
+            info dict or None if the figure was sent unchanged). The info
+            has original_points, points, downsampled_traces, bytes and dropped.
+        """
+        figure = fig.to_plotly_json()
+        # Recent plotly versions already encode some arrays; decode them to thin them
+        traces = [self._decode(trace) for trace in figure.get("data") or []]
+        original_points = sum(self._trace_length(trace) for trace in traces)
+        target = self.max_points
+        
+        while True:
+            compacted = [self._downsample(trace, target) for trace in traces]
+            downsampled = sum(1 for before, after in zip(traces, compacted) if after is not before)
+            payload = json.dumps(
+                {**figure, "data": [self._encode(trace) for trace in compacted]},
+                cls=PlotlyJSONEncoder,
+                separators=(",", ":")
+            )
+            
+            if len(payload) <= self.max_bytes:
+                if not downsampled:
+                    return payload, None
+                return payload, {
+                    "original_points": original_points,
+                    "points": sum(self._trace_length(trace) for trace in compacted),
+                    "downsampled_traces": downsampled,
+                    "bytes": len(payload),
+                    "dropped": False
+                }
+                
+            target //= 2
+            if target < self.min_points:
+                return None, {
+                    "original_points": original_points,
+                    "points": 0,
+                    "downsampled_traces": downsampled,
+                    "bytes": len(payload),
+                    "dropped": True
+                }
+                
+    def _downsample(self, trace: Dict, target: int) -> Dict:
+        """
+        Return the trace with at most target points (the same dict if it is small
+        enough or of a type that cannot be thinned).
+        """
+        n = self._trace_length(trace)
+        if n <= target or trace.get("type", "scatter") not in DOWNSAMPLED_TYPES:
+            return trace
+            
+        y = self._axis_values(trace.get("y"), n)
+        x = self._axis_values(trace.get("x"), n)
+        
+        # Plotly draws lines by default once a trace has more than 20 points
+        mode = trace.get("mode") or "lines"
+        if "lines" in mode:
+            if not np.all(np.diff(x) >= 0):
+                # Lines are drawn in array order, so thin them in that order
+                x = np.arange(n, dtype=float)
+            keep = lttb_indices(x, y, target)
+        else:
+            keep = grid_indices(x, y, target)
+            
+        return self._take(trace, keep, n)
+        
+    @staticmethod
+    def _take(trace: Dict, keep: np.ndarray, n: int) -> Dict:
+        """
+        Keep the given points of every per-point attribute of a trace.
+        """
+        def take(value):
+            if isinstance(value, (list, tuple, np.ndarray, pd.Series, pd.Index)) and len(value) == n:
+                return np.asarray(value)[keep]
+            return value
+            
+        thinned = {key: take(value) for key, value in trace.items()}
+        for key in PER_POINT_CONTAINERS:
+            if isinstance(thinned.get(key), dict):
+                thinned[key] = {name: take(value) for name, value in thinned[key].items()}
+        return thinned
+        
+    @staticmethod
+    def _decode(trace: Dict) -> Dict:
+        """
+        Replace typed-array specs of a trace with numpy arrays.
+        """
+        def decode(value):
+            if isinstance(value, dict):
+                if "bdata" in value and "dtype" in value:
+                    return from_typed_array(value)
+                return {key: decode(item) for key, item in value.items()}
+            return value
+            
+        return {key: decode(value) for key, value in trace.items()}
+        
+    @staticmethod
+    def _encode(trace: Dict) -> Dict:
+        """
+        Replace numeric arrays of a trace with base64 typed-array specs.
+        """
+        def encode(value):
+            if isinstance(value, dict):
+                return {key: encode(item) for key, item in value.items()}
+            if isinstance(value, (list, tuple)) and value and all(
+                isinstance(item, (int, float)) and not isinstance(item, bool) for item in value
+            ):
+                value = np.asarray(value)
+            if isinstance(value, np.ndarray):
+                return typed_array(value)
+            return value
+            
+        return {key: encode(value) for key, value in trace.items()}
+        
+    @staticmethod
+    def _trace_length(trace: Dict) -> int:
+        """
+        Number of points in a trace (0 if it has no x or y array).
+        """
+        for key in ("y", "x"):
+            value = trace.get(key)
+            if isinstance(value, (list, tuple, np.ndarray, pd.Series, pd.Index)):
+                return len(value)
+        return 0
+        
+    @staticmethod
+    def _axis_values(values, n: int) -> np.ndarray:
+        """
+        Coordinates of a trace axis as floats: numbers as is, dates as
+        nanoseconds, categories as their order of appearance and a missing
+        axis as the point index.
+        """
+        if values is None:
+            return np.arange(n, dtype=float)
+            
+        array = np.asarray(values)
+        if np.issubdtype(array.dtype, np.datetime64):
+            return array.astype("datetime64[ns]").astype(np.int64).astype(float)
+        if array.dtype.kind in "biuf":
+            return array.astype(float)
+            
+        numeric = pd.to_numeric(pd.Series(array), errors="coerce")
+        if numeric.notna().all():
+            return numeric.to_numpy(dtype=float)
+        return pd.factorize(array)[0].astype(float)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Pick points with Largest-Triangle-Three-Buckets.
+    
+    Args:
+        x: Point x coordinates, ascending
+        y: Point y coordinates
+        threshold: Number of points to keep (at least 3)
+        
+    Returns:
+        Sorted indices of the kept points, including the first and last
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+        
+    # Gaps only affect which point is chosen; the original values are kept
+    x = np.nan_to_num(x)
+    y = np.nan_to_num(y)
+    
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+    
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        
+        # Triangle between the last kept point, each candidate and the next bucket's average
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+        
+    return indices
+
+
+def grid_indices(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """
+    Thin a scatter by binning it on a grid and capping the points per cell.
+    
+    Args:
+        x: Point x coordinates
+        y: Point y coordinates
+        target: Approximate number of points to keep
+        
+    Returns:
+        Sorted indices of the kept points
+    """
+    bins = max(int(np.sqrt(target)), 1)
+    cells = _bin(x, bins) * bins + _bin(y, bins)
+    
+    order = np.argsort(cells, kind="stable")
+    sorted_cells = cells[order]
+    rank = np.arange(len(cells)) - np.searchsorted(sorted_cells, sorted_cells, side="left")
+    
+    # Sparse cells keep all their points; dense cells keep an equal share
+    per_cell = max(target // len(np.unique(sorted_cells)), 1)
+    return np.sort(order[rank < per_cell])
+
+
+def _bin(values: np.ndarray, bins: int) -> np.ndarray:
+    """
+    Assign each value to one of bins equal-width bins (non-finite values to bin 0).
+    """
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(len(values), dtype=np.int64)
+        
+    low = values[finite].min()
+    high = values[finite].max()
+    if high <= low:
+        return np.zeros(len(values), dtype=np.int64)
+        
+    scaled = np.where(finite, (values - low) / (high - low) * bins, 0)
+    return np.clip(scaled.astype(np.int64), 0, bins - 1)
+
+
+def typed_array(array: np.ndarray):
+    """
+    Encode a numeric array in plotly.js's typed-array form
+    ({"dtype", "bdata", "shape"}); other arrays are returned unchanged.
+    
+    Args:
+        array: Array to encode
+        
+    Returns:
+        Typed-array spec, or the array if it is not numeric
+    """
+    if array.dtype.kind == "i" and array.dtype.itemsize == 8:
+        # plotly.js has no 64-bit integers
+        if len(array) and (array.min() < np.iinfo(np.int32).min or array.max() > np.iinfo(np.int32).max):
+            array = array.astype(np.float64)
+        else:
+            array = array.astype(np.int32)
+    elif array.dtype.kind == "u" and array.dtype.itemsize == 8:
+        array = array.astype(np.float64)
+        
+    code = TYPED_ARRAY_CODES.get(array.dtype.name)
+    if code is None:
+        return array
+        
+    spec = {
+        "dtype": code,
+        "bdata": base64.b64encode(np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<")).tobytes()).decode("ascii")
+    }
+    if array.ndim > 1:
+        spec["shape"] = ", ".join(str(size) for size in array.shape)
+    return spec
+
+
+def from_typed_array(spec: Dict) -> np.ndarray:
+    """
+    Decode a plotly.js typed-array spec back into a numpy array.
+    
+    Args:
+        spec: Dict with dtype, bdata and optionally shape
+        
+    Returns:
+        The decoded array
+    """
+    dtype = np.dtype("<" + spec["dtype"].replace("u1c", "u1"))
+    array = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=dtype)
+    if spec.get("shape"):
+        array = array.reshape([int(size) for size in str(spec["shape"]).split(",")])
+    return array
@@ -0,0 +1,269 @@
+"""
+Streaming CSV ingestion with dtype inference and compact dtypes
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import io
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def infer_dtypes(
+    sample: pd.DataFrame,
+    category_ratio: float = 0.5
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Decide column dtypes from a sample of the file.
+    
+    Args:
+        sample: First rows of the file, read with default dtypes
+        category_ratio: Maximum distinct/non-null ratio for a string column
+            to be stored as category
+            
+    Returns:
+        Tuple of (dtypes to pin while reading chunks, columns to store as category)
+    """
+    pinned = {}
+    category_columns = []
+    
+    for col in sample.columns:
+        series = sample[col]
+        
+        if pd.api.types.is_float_dtype(series):
+            # Stop chunks without decimals from flipping the column to int
+            pinned[col] = 'float64'
+            
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            # Stop chunks of digit-only values from flipping the column to numbers
+            pinned[col] = 'str'
+            non_null = series.dropna()
+            if len(non_null) and non_null.nunique() / len(non_null) <= category_ratio:
+                category_columns.append(col)
+                
+    return pinned, category_columns
+
+
+def optimize_dtypes(
+    df: pd.DataFrame,
+    category_columns: Optional[List[str]] = None,
+    downcast_floats: bool = False,
+    downcast_integers: bool = False
+) -> pd.DataFrame:
+    """
+    Convert low-cardinality strings to category and optionally downcast numbers.
+    Integer columns are kept as int64 by default: generated code multiplies and
+    sums them, and int8/int16 arithmetic overflows silently.
+    
+    Args:
+        df: DataFrame to optimize
+        category_columns: Columns to convert to category
+        downcast_floats: Also downcast float64 to float32 (loses precision)
+        downcast_integers: Store integers in the smallest type that fits them
+            (arithmetic on them can overflow)
+        
+    Returns:
+        Optimized DataFrame
+    """
+    converted = {}
+    
+    for col in df.columns:
+        series = df[col]
+        
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            if downcast_integers:
+                converted[col] = pd.to_numeric(series, downcast='integer')
+            elif series.dtype.itemsize < 8:
+                converted[col] = series.astype('int64')
+        elif pd.api.types.is_float_dtype(series) and downcast_floats:
+            converted[col] = pd.to_numeric(series, downcast='float')
+        elif category_columns and col in category_columns:
+            converted[col] = series.astype('category')
+            
+    if not converted:
+        return df
+        
+    df = df.copy(deep=False)
+    for col, series in converted.items():
+        df[col] = series
+    return df
+
+
+def read_csv_optimized(
+    source,
+    chunksize: int = 100_000,
+    sample_rows: int = 10_000,
+    category_ratio: float = 0.5,
+    downcast_floats: bool = False,
+    downcast_integers: bool = False,
+    engine: str = 'c'
+) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Read a CSV in chunks, optimizing dtypes chunk by chunk so the raw
+    default-dtype frame never exists in memory all at once.
+    
+    Args:
+        source: File data (bytes or seekable file object)
+        chunksize: Rows per chunk
+        sample_rows: Rows read up front to infer dtypes
+        category_ratio: Maximum distinct ratio for category conversion
+        downcast_floats: Also downcast float64 to float32
+        downcast_integers: Also downcast int64 to the smallest integer type
+        engine: 'c' for chunked reading, or 'pyarrow' for a single
+            multi-threaded read (pyarrow does not support chunks)
+            
+    Returns:
+        Tuple of (DataFrame, ingestion statistics)
+    """
+    start = time.perf_counter()
+    
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+        
+    sample = pd.read_csv(source, nrows=sample_rows)
+    source.seek(0)
+    pinned, category_columns = infer_dtypes(sample, category_ratio)
+    
+    if engine == 'pyarrow':
+        raw = pd.read_csv(source, engine='pyarrow')
+        memory_before = int(raw.memory_usage(deep=True).sum())
+        df = optimize_dtypes(raw, category_columns, downcast_floats, downcast_integers)
+        chunks_read = 1
+        del raw
+    else:
+        memory_before = 0
+        chunks = []
+        reader = pd.read_csv(source, chunksize=chunksize, dtype=pinned)
+        
+        for chunk in reader:
+            memory_before += int(chunk.memory_usage(deep=True).sum())
+            chunks.append(optimize_dtypes(chunk, category_columns, downcast_floats, downcast_integers))
+            
+        chunks_read = len(chunks)
+        df = _concat_chunks(chunks, category_columns) if chunks else sample.iloc[0:0]
+        
+    elapsed = time.perf_counter() - start
+    memory_after = int(df.memory_usage(deep=True).sum())
+    
+    stats = {
+        "engine": engine,
+        "chunks": chunks_read,
+        "seconds": round(elapsed, 4),
+        "rows_per_second": int(len(df) / elapsed) if elapsed > 0 else None,
+        "memory_before_bytes": memory_before,
+        "memory_after_bytes": memory_after,
+        "memory_saved_bytes": max(memory_before - memory_after, 0),
+        "category_columns": [col for col in category_columns if col in df.columns]
+    }
+    
+    return df, stats
+
+
+def _concat_chunks(chunks: Iterable[pd.DataFrame], category_columns: List[str]) -> pd.DataFrame:
+    """
+    Concatenate optimized chunks, merging per-chunk categories so category
+    columns stay categorical instead of falling back to strings.
+    """
+    chunks = list(chunks)
+    merged = {}
+    
+    for col in category_columns:
+        if all(isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks):
+            merged[col] = union_categoricals([chunk[col] for chunk in chunks])
+            
+    df = pd.concat(
+        [chunk.drop(columns=list(merged)) for chunk in chunks] if merged else chunks,
+        ignore_index=True
+    )
+    
+    if merged:
+        # One concat instead of a column insert per category column
+        df = pd.concat([df, pd.DataFrame(merged)], axis=1)
+        
+    # Restore the original column order
+    return df[chunks[0].columns]
+
+
+def align_to_schema(chunk: pd.DataFrame, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
+    """
+    Validate a new chunk of rows against a dataset and convert it to the
+    dataset's dtypes, so the two concatenate without changing either.
+    
+    Args:
+        chunk: Newly parsed rows
+        df: Current dataset
+        
+    Returns:
+        Tuple of (chunk with the dataset's columns and dtypes, dataset columns
+        that must be widened first, such as category columns gaining new
+        categories or integer columns receiving decimals or blanks)
+        
+    Raises:
+        ValueError: If columns are missing or extra, or values do not fit a column's type
+    """
+    missing = [col for col in df.columns if col not in chunk.columns]
+    extra = [col for col in chunk.columns if col not in df.columns]
+    if missing or extra:
+        problems = []
+        if missing:
+            problems.append(f"missing columns {missing}")
+        if extra:
+            problems.append(f"unexpected columns {extra}")
+        raise ValueError(f"New rows do not match the dataset schema: {'; '.join(problems)}")
+        
+    aligned = {}
+    widened = {}
+    errors = []
+    
+    for col in df.columns:
+        target = df[col]
+        series = chunk[col]
+        
+        try:
+            if isinstance(target.dtype, pd.CategoricalDtype):
+                values = series.astype(object).where(series.notna(), None)
+                known = set(target.cat.categories)
+                new_categories = [value for value in pd.unique(values.dropna()) if value not in known]
+                if new_categories:
+                    target = target.cat.add_categories(new_categories)
+                    widened[col] = target
+                aligned[col] = pd.Categorical(values, categories=target.cat.categories)
+                
+            elif pd.api.types.is_bool_dtype(target):
+                if not pd.api.types.is_bool_dtype(series):
+                    raise ValueError("expects true/false values")
+                aligned[col] = series.astype(target.dtype)
+                
+            elif pd.api.types.is_integer_dtype(target):
+                numbers = pd.to_numeric(series)
+                if numbers.isna().any() or not (numbers == numbers.round()).all():
+                    # Decimals or blanks: the column becomes float, as it would
+                    # have if the original file had held them
+                    dtype = np.dtype('float64')
+                else:
+                    dtype = np.promote_types(target.dtype, np.dtype('int64'))
+                if dtype != target.dtype:
+                    target = target.astype(dtype)
+                    widened[col] = target
+                aligned[col] = numbers.astype(dtype)
+                
+            elif pd.api.types.is_float_dtype(target):
+                aligned[col] = pd.to_numeric(series).astype(target.dtype)
+                
+            elif pd.api.types.is_datetime64_any_dtype(target):
+                aligned[col] = pd.to_datetime(series).astype(target.dtype)
+                
+            else:
+                aligned[col] = series.astype(target.dtype)
+                
+        except (ValueError, TypeError) as e:
+            errors.append(f"'{col}' ({target.dtype}): {str(e)}")
+            
+    if errors:
+        raise ValueError(f"New rows do not fit the column types: {'; '.join(errors)}")
+        
+    return pd.DataFrame(aligned, index=chunk.index), widened
@@ -0,0 +1,57 @@
+"""
+Lazy construction of heavy shared components
+"""
+
+from typing import Any, Callable, Optional
+import threading
+
+
+class Lazy:
+    """
+    Holds a component that is built on first use.
+    Lets a worker start and answer health checks before paying for heavy
+    imports (pandas, pyarrow, plotly, google-genai) and agent construction;
+    the first request that needs the component builds it once, under a lock.
+    """
+    
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        Initialize the holder.
+        
+        Args:
+            factory: Builds the component; called at most once
+        """
+        self.factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        
+    def get(self) -> Any:
+        """
+        Get the component, building it on first use.
+        
+        Returns:
+            The component
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.factory()
+                    self._loaded = True
+        return self._value
+        
+    @property
+    def loaded(self) -> bool:
+        """
+        Whether the component has been built.
+        """
+        return self._loaded
+        
+    def peek(self) -> Optional[Any]:
+        """
+        Get the component if it has been built, without building it.
+        
+        Returns:
+            The component, or None if it has not been built yet
+        """
+        return self._value if self._loaded else None
@@ -0,0 +1,315 @@
+"""
+Latency and token metrics with Prometheus text exposition
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import bisect
+import contextvars
+import threading
+import time
+
+# Seconds; covers cache hits (milliseconds) up to slow model calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Per-request breakdown of stage durations and token counts.
+    """
+    
+    def __init__(self):
+        """
+        Initialize an empty breakdown.
+        """
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        
+    def add_stage(self, stage: str, seconds: float):
+        """
+        Add time spent in a stage (repeated stages accumulate).
+        
+        Args:
+            stage: Stage name
+            seconds: Duration
+        """
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            
+    def add_tokens(self, kind: str, count: int):
+        """
+        Add tokens used by a model call.
+        
+        Args:
+            kind: "prompt" or "output"
+            count: Number of tokens
+        """
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+            
+    def to_dict(self) -> Dict:
+        """
+        Get the breakdown for the chat response.
+        
+        Returns:
+            Dict with total_ms, per-stage milliseconds and token counts
+        """
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()},
+                "tokens": dict(self.tokens)
+            }
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with one series per label set.
+    """
+    
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        """
+        Initialize the histogram.
+        
+        Args:
+            name: Metric name
+            help_text: Description shown in the exposition
+            buckets: Upper bounds of the buckets, ascending
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple, List] = {}
+        
+    def observe(self, value: float, labels: Tuple):
+        """
+        Record one observation (caller holds the registry lock).
+        """
+        series = self._series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+        
+    def render(self) -> List[str]:
+        """
+        Render the histogram in Prometheus text format.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+            
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter with one series per label set.
+    """
+    
+    def __init__(self, name: str, help_text: str):
+        """
+        Initialize the counter.
+        
+        Args:
+            name: Metric name
+            help_text: Description shown in the exposition
+        """
+        self.name = name
+        self.help_text = help_text
+        self._series: Dict[Tuple, float] = {}
+        
+    def inc(self, value: float, labels: Tuple):
+        """
+        Increase the counter (caller holds the registry lock).
+        """
+        self._series[labels] = self._series.get(labels, 0) + value
+        
+    def render(self) -> List[str]:
+        """
+        Render the counter in Prometheus text format.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+def _format_labels(labels: Tuple) -> str:
+    """
+    Format ((name, value), ...) as {name="value",...}.
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    """
+    Escape a label value for the text format.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Registry of the application's latency, prompt-size and token metrics.
+    Stage spans feed both the process-wide histograms and, when a request
+    has bound a RequestTimings, that request's own breakdown. The binding
+    follows the request into threads started with asyncio.to_thread.
+    """
+    
+    def __init__(self):
+        """
+        Initialize the registry with the application's metrics.
+        """
+        self._lock = threading.Lock()
+        self.stage_seconds = Histogram(
+            "dataroom_stage_seconds", "Time spent in each chat pipeline stage", LATENCY_BUCKETS
+        )
+        self.http_seconds = Histogram(
+            "dataroom_http_request_seconds", "HTTP request latency by endpoint", LATENCY_BUCKETS
+        )
+        self.llm_seconds = Histogram(
+            "dataroom_llm_call_seconds", "Gemini call latency including retries", LATENCY_BUCKETS
+        )
+        self.prompt_tokens = Histogram(
+            "dataroom_prompt_tokens", "Estimated prompt size by prompt type", TOKEN_BUCKETS
+        )
+        self.llm_tokens = Counter(
+            "dataroom_llm_tokens_total", "Tokens reported by Gemini by kind"
+        )
+        self.chat_requests = Counter(
+            "dataroom_chat_requests_total", "Chat answers by how they were produced"
+        )
+        self._metrics = [
+            self.stage_seconds, self.http_seconds, self.llm_seconds,
+            self.prompt_tokens, self.llm_tokens, self.chat_requests
+        ]
+        
+    @contextmanager
+    def span(self, stage: str, timings: Optional[RequestTimings] = None) -> Iterator[None]:
+        """
+        Time a block as a pipeline stage.
+        
+        Args:
+            stage: Stage name
+            timings: Request breakdown to bind for the duration of the block;
+                defaults to the one already bound
+        """
+        token = _current_timings.set(timings) if timings is not None else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start)
+            if token is not None:
+                _current_timings.reset(token)
+                
+    def record_stage(self, stage: str, seconds: float):
+        """
+        Record a stage duration measured elsewhere (e.g. in a sandbox child).
+        
+        Args:
+            stage: Stage name
+            seconds: Duration
+        """
+        with self._lock:
+            self.stage_seconds.observe(seconds, (("stage", stage),))
+            
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add_stage(stage, seconds)
+            
+    def record_llm_call(self, model: str, seconds: float, outcome: str, usage=None):
+        """
+        Record a Gemini call and the tokens it used.
+        
+        Args:
+            model: Model name
+            seconds: Duration including retries
+            outcome: "success" or "error"
+            usage: usage_metadata of the response, if any
+        """
+        prompt_tokens = getattr(usage, 'prompt_token_count', None) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', None) or 0
+        
+        with self._lock:
+            self.llm_seconds.observe(seconds, (("model", model), ("outcome", outcome)))
+            if prompt_tokens:
+                self.llm_tokens.inc(prompt_tokens, (("kind", "prompt"),))
+            if output_tokens:
+                self.llm_tokens.inc(output_tokens, (("kind", "output"),))
+                
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add_stage("llm_calls", seconds)
+            if prompt_tokens:
+                timings.add_tokens("prompt", prompt_tokens)
+            if output_tokens:
+                timings.add_tokens("output", output_tokens)
+                
+    def record_prompt(self, prompt_type: str, tokens: int):
+        """
+        Record the estimated size of a prompt.
+        
+        Args:
+            prompt_type: Prompt name (planner, executor, plan_and_code)
+            tokens: Estimated tokens
+        """
+        with self._lock:
+            self.prompt_tokens.observe(tokens, (("prompt", prompt_type),))
+            
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add_tokens(f"{prompt_type}_prompt_estimate", tokens)
+            
+    def record_http(self, endpoint: str, status_code: int, seconds: float):
+        """
+        Record an HTTP request.
+        
+        Args:
+            endpoint: Flask endpoint name
+            status_code: Response status
+            seconds: Duration
+        """
+        with self._lock:
+            self.http_seconds.observe(seconds, (("endpoint", endpoint), ("status", str(status_code))))
+            
+    def record_chat(self, source: str):
+        """
+        Count a chat answer by source (cache, coalesced, fast_path, single_call, two_agent, error).
+        
+        Args:
+            source: How the answer was produced
+        """
+        with self._lock:
+            self.chat_requests.inc(1, (("source", source),))
+            
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text exposition format.
+        
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            lines = []
+            for metric in self._metrics:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry, like the default registry of Prometheus clients
+metrics = Metrics()
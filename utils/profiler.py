@@ -0,0 +1,266 @@
+"""
+Dataset profiling for the data info panel and the agents
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class HyperLogLog:
+    """
+    Approximate distinct counter with mergeable registers.
+    Uses 2^precision one-byte registers; the standard error is about
+    1.04 / sqrt(2^precision), i.e. ~1.6% at the default precision of 12.
+    """
+    
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        """
+        Initialize the counter.
+        
+        Args:
+            precision: Number of index bits (register count is 2^precision)
+            registers: Existing registers to continue from
+        """
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.size, dtype=np.uint8)
+        
+    def add_series(self, series: pd.Series):
+        """
+        Add every non-null value of a series.
+        
+        Args:
+            series: Values to count
+        """
+        values = series.dropna()
+        if values.empty:
+            return
+            
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        remainder = hashes << np.uint64(self.precision)
+        
+        # Rank is the position of the first set bit in the remaining bits
+        max_rank = 64 - self.precision + 1
+        bit_length = np.floor(np.log2(np.maximum(remainder, 1).astype(np.float64))).astype(np.int64) + 1
+        rank = np.where(remainder == 0, max_rank, 65 - bit_length)
+        rank = np.minimum(rank, max_rank).astype(np.uint8)
+        
+        np.maximum.at(self.registers, index, rank)
+        
+    def merge(self, other: 'HyperLogLog'):
+        """
+        Merge another counter of the same precision into this one.
+        
+        Args:
+            other: Counter to merge
+        """
+        np.maximum(self.registers, other.registers, out=self.registers)
+        
+    def count(self) -> int:
+        """
+        Estimate the number of distinct values added.
+        
+        Returns:
+            Estimated distinct count
+        """
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        
+        # Linear counting is more accurate for small cardinalities
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * np.log(self.size / zeros)
+            
+        return int(round(estimate))
+
+
+def is_categorical_like(series: pd.Series) -> bool:
+    """
+    Check whether a column holds labels rather than measurements.
+    
+    Args:
+        series: Column to check
+        
+    Returns:
+        True for object, string and category columns
+    """
+    return (
+        pd.api.types.is_object_dtype(series) or
+        pd.api.types.is_string_dtype(series) or
+        isinstance(series.dtype, pd.CategoricalDtype)
+    )
+
+
+def format_size(memory_bytes: float) -> str:
+    """
+    Format a byte count for display.
+    
+    Args:
+        memory_bytes: Size in bytes
+        
+    Returns:
+        Human readable size
+    """
+    if memory_bytes < 1024:
+        return f"{memory_bytes:.0f} B"
+    elif memory_bytes < 1024 * 1024:
+        return f"{memory_bytes / 1024:.2f} KB"
+    else:
+        return f"{memory_bytes / (1024 * 1024):.2f} MB"
+
+
+def build_profile(
+    df: pd.DataFrame,
+    approximate: Optional[bool] = None,
+    exact_cell_limit: int = 5_000_000,
+    sample_rows: int = 100_000
+) -> Dict:
+    """
+    Profile a dataset in one vectorized pass over its columns.
+    Null counts and memory usage are always exact. Distinct counts are exact
+    for small tables and HyperLogLog estimates for large or wide ones, where
+    sample values are also taken from the first sample_rows rows only.
+    
+    Args:
+        df: Dataset to profile
+        approximate: Force approximate (True) or exact (False) profiling;
+            by default it is chosen from the table size
+        exact_cell_limit: Rows x columns above which profiling is approximate
+        sample_rows: Rows scanned for sample values when approximate
+        
+    Returns:
+        Dict with rows, columns, sizes, per-column details and a preview;
+        approximate profiles also carry the HyperLogLog registers under
+        "sketches" so counts can be updated incrementally
+    """
+    if approximate is None:
+        approximate = df.shape[0] * df.shape[1] > exact_cell_limit
+        
+    null_counts = df.isna().sum()
+    memory_by_column = df.memory_usage(deep=True, index=False)
+    memory_bytes = int(df.memory_usage(deep=True).sum())
+    
+    sketches = {}
+    if approximate:
+        unique_counts = {}
+        for col in df.columns:
+            sketch = HyperLogLog()
+            sketch.add_series(df[col])
+            sketches[col] = sketch
+            unique_counts[col] = sketch.count()
+        sample_df = df.head(sample_rows)
+    else:
+        unique_counts = df.nunique().to_dict()
+        sample_df = df
+        
+    columns = []
+    for col in df.columns:
+        series = sample_df[col]
+        col_info = {
+            "name": col,
+            "type": str(df[col].dtype),
+            "null_count": int(null_counts[col]),
+            "unique_count": int(unique_counts[col]),
+            "memory_bytes": int(memory_by_column[col])
+        }
+        
+        # Add sample values for categorical columns
+        if is_categorical_like(series) or unique_counts[col] < 10:
+            col_info["sample_values"] = pd.unique(series.dropna())[:5].tolist()
+            
+        columns.append(col_info)
+        
+    profile = {
+        "rows": int(df.shape[0]),
+        "columns": int(df.shape[1]),
+        "size": format_size(memory_bytes),
+        "memory_bytes": memory_bytes,
+        "column_details": columns,
+        "memory_usage": f"{memory_bytes / 1024:.2f} KB",
+        "preview": df.head(5).to_dict('records'),
+        "approximate": approximate
+    }
+    
+    if sketches:
+        profile["sketches"] = sketches
+        
+    return profile
+
+
+def update_profile(
+    profile: Dict,
+    df: pd.DataFrame,
+    added: pd.DataFrame,
+    removed: Optional[pd.DataFrame] = None,
+    approximate: Optional[bool] = None
+) -> Dict:
+    """
+    Update a profile after rows were appended or replaced, without a full pass
+    over the dataset. Row, null and memory counts are adjusted by the added
+    and removed rows (fixed-width columns are simply measured) and the
+    HyperLogLog sketches absorb the added values.
+    Sketches cannot forget values, so after replacements distinct counts may
+    slightly overstate. Exact profiles have no sketches; they belong to small
+    tables and are rebuilt instead.
+    
+    Args:
+        profile: Profile of the dataset before the change
+        df: Dataset after the change
+        added: Rows appended or written over existing rows
+        removed: Previous values of the rows written over, if any
+        approximate: Passed to build_profile when the profile is rebuilt
+        
+    Returns:
+        Profile of the changed dataset
+    """
+    sketches = profile.get("sketches")
+    if not sketches or approximate is False:
+        return build_profile(df, approximate=approximate)
+        
+    null_delta = added.isna().sum()
+    memory_delta = added.memory_usage(deep=True, index=False)
+    if removed is not None and len(removed):
+        null_delta = null_delta - removed.isna().sum()
+        memory_delta = memory_delta - removed.memory_usage(deep=True, index=False)
+        
+    columns = []
+    for col_info in profile["column_details"]:
+        col = col_info["name"]
+        sketches[col].add_series(added[col])
+        dtype = df[col].dtype
+        if dtype == object or isinstance(dtype, pd.StringDtype):
+            memory = max(int(col_info["memory_bytes"] + memory_delta[col]), 0)
+        else:
+            # Constant time, and right after a widening cast too
+            memory = int(df[col].memory_usage(deep=True, index=False))
+            
+        col_info = {
+            **col_info,
+            "type": str(dtype),
+            "null_count": int(col_info["null_count"] + null_delta[col]),
+            "unique_count": sketches[col].count(),
+            "memory_bytes": memory
+        }
+        
+        samples = col_info.get("sample_values")
+        if samples is not None and len(samples) < 5:
+            new_values = [value for value in pd.unique(added[col].dropna()).tolist() if value not in samples]
+            col_info["sample_values"] = samples + new_values[:5 - len(samples)]
+            
+        columns.append(col_info)
+        
+    memory_bytes = sum(col_info["memory_bytes"] for col_info in columns) + int(df.index.memory_usage())
+    
+    return {
+        **profile,
+        "rows": int(df.shape[0]),
+        "size": format_size(memory_bytes),
+        "memory_bytes": memory_bytes,
+        "column_details": columns,
+        "memory_usage": f"{memory_bytes / 1024:.2f} KB",
+        "preview": df.head(5).to_dict('records'),
+        "sketches": sketches
+    }
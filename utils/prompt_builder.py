@@ -0,0 +1,291 @@
+"""
+Prompt Builder for fitting dataset context into a token budget
+"""
+
+from typing import Dict, List, Tuple
+import logging
+import re
+import threading
+
+import pandas as pd
+
+from .metrics import metrics
+from .relationships import describe_relationship
+
+logger = logging.getLogger(__name__)
+
+# Plan keys the code generation step needs; the rest is planner bookkeeping
+CODE_PLAN_KEYS = [
+    "question_analysis",
+    "requires_visualization",
+    "visualization_type",
+    "steps",
+    "data_operations",
+    "expected_output"
+]
+
+
+class PromptBuilder:
+    """
+    Builds the dataset parts of the agent prompts within a token budget.
+    Columns are ranked by relevance to the question; the most relevant are
+    listed with their full names grouped by type, the rest with abbreviated
+    names while the budget lasts, and any left over only as a count. Prompt
+    size therefore stays roughly constant however wide the table is.
+    """
+    
+    def __init__(
+        self,
+        schema_token_budget: int = 600,
+        preview_token_budget: int = 300,
+        full_name_columns: int = 40,
+        abbreviate_after: int = 24
+    ):
+        """
+        Initialize the Prompt Builder.
+        
+        Args:
+            schema_token_budget: Approximate tokens allowed for the schema
+            preview_token_budget: Approximate tokens allowed for the data preview
+            full_name_columns: Most relevant columns listed with full names
+            abbreviate_after: Length above which other column names are shortened
+        """
+        self.schema_token_budget = schema_token_budget
+        self.preview_token_budget = preview_token_budget
+        self.full_name_columns = full_name_columns
+        self.abbreviate_after = abbreviate_after
+        self.prompts = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self._by_agent: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        Estimate the token count of a text (about four characters per token).
+        
+        Args:
+            text: Prompt text
+            
+        Returns:
+            Approximate number of tokens
+        """
+        return (len(text) + 3) // 4
+        
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        """
+        Split text or a column name into lowercase words, singularized.
+        """
+        text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text))
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words]
+        
+    def rank_columns(self, question: str, columns: List[str]) -> List[str]:
+        """
+        Order columns by how strongly the question refers to them.
+        Ties keep the dataset's column order.
+        
+        Args:
+            question: The user's question (or any text the prompt is about)
+            columns: Column names
+            
+        Returns:
+            Column names, most relevant first
+        """
+        question_text = question.lower()
+        question_words = set(self._words(question))
+        
+        def score(item):
+            position, column = item
+            column_words = self._words(column)
+            points = 0
+            if str(column).lower() in question_text:
+                points += 10
+            points += 3 * sum(1 for word in column_words if word in question_words)
+            # Partial matches such as "rev" for "revenue"
+            points += sum(
+                1 for word in column_words for q in question_words
+                if len(q) > 2 and word != q and (word.startswith(q) or q.startswith(word))
+            )
+            return (-points, position)
+            
+        return [column for _, column in sorted(enumerate(columns), key=score)]
+        
+    def abbreviate(self, name: str) -> str:
+        """
+        Shorten a long column name for the low-relevance part of the schema.
+        
+        Args:
+            name: Column name
+            
+        Returns:
+            The name with its middle replaced by "~", keeping the start and
+            the end, which usually tell similar columns apart
+        """
+        name = str(name)
+        if len(name) <= self.abbreviate_after:
+            return name
+        head = (self.abbreviate_after - 1) // 2
+        tail = self.abbreviate_after - 1 - head
+        return f"{name[:head]}~{name[-tail:]}"
+        
+    def encode_schema(self, data_schema: Dict, question: str = "") -> str:
+        """
+        Encode the schema compactly, grouping columns by type.
+        
+        Args:
+            data_schema: Mapping of column names to dtype strings
+            question: Question used to rank columns
+            
+        Returns:
+            Schema text within the schema token budget, e.g.
+            "int64: Sales, Quantity | category: Region"
+        """
+        ranked = self.rank_columns(question, list(data_schema))
+        full = ranked[:self.full_name_columns]
+        others = ranked[self.full_name_columns:]
+        
+        text = self._group_by_type(full, data_schema)
+        
+        # Drop the least relevant full-name columns if even those overflow the budget
+        while len(full) > 1 and self.estimate_tokens(text) > self.schema_token_budget:
+            others.insert(0, full.pop())
+            text = self._group_by_type(full, data_schema)
+            
+        # Room left for shortened names, keeping some for the type labels
+        remaining_chars = self.schema_token_budget * 4 - len(text) - 80
+        listed = []
+        for column in others:
+            remaining_chars -= len(self.abbreviate(column)) + 2
+            if remaining_chars < 0:
+                break
+            listed.append(column)
+            
+        if listed:
+            text += "\nOther columns (middle of long names elided as ~): "
+            text += self._group_by_type(listed, data_schema, abbreviated=True)
+            
+        omitted = len(others) - len(listed)
+        if omitted:
+            text += f"\n+{omitted} more columns not shown"
+            
+        return text
+        
+    def encode_tables(self, related_tables: Dict, question: str = "") -> str:
+        """
+        Describe the other tables of a multi-table dataset and how they relate,
+        so plans and code can join only the tables a question needs.
+        
+        Args:
+            related_tables: Dict from DataManager.get_related_tables
+            question: Question used to rank each table's columns
+            
+        Returns:
+            Tables text, one line per table plus the relationships
+        """
+        lines = [
+            f"df is table '{related_tables['table']}'. Other tables, in tables['name'] "
+            f"(join('a', 'b') merges tables along the relationships, left join from 'a'):"
+        ]
+        for name, table in related_tables["tables"].items():
+            lines.append(f"{name} ({table['rows']} rows): {self.encode_schema(table['schema'], question)}")
+            
+        relationships = related_tables["relationships"]
+        if relationships:
+            lines.append("Relationships: " + "; ".join(map(describe_relationship, relationships)))
+        else:
+            lines.append("Relationships: none known")
+        return "\n".join(lines)
+        
+    def _group_by_type(self, columns: List[str], data_schema: Dict, abbreviated: bool = False) -> str:
+        """
+        Render "dtype: col, col | dtype: col" keeping first-seen type order.
+        """
+        groups: Dict[str, List[str]] = {}
+        for column in columns:
+            name = self.abbreviate(column) if abbreviated else str(column)
+            groups.setdefault(str(data_schema[column]), []).append(name)
+        return " | ".join(f"{dtype}: {', '.join(names)}" for dtype, names in groups.items())
+        
+    def encode_preview(self, df: pd.DataFrame, question: str = "", rows: int = 3) -> str:
+        """
+        Render the first rows of the most relevant columns as CSV.
+        
+        Args:
+            df: Dataset
+            question: Question used to rank columns
+            rows: Number of rows to show
+            
+        Returns:
+            CSV text within the preview token budget
+        """
+        ranked = self.rank_columns(question, list(df.columns))
+        head = df.head(rows)
+        
+        columns = []
+        text = ""
+        for column in ranked:
+            candidate = head[columns + [column]].to_csv(index=False)
+            if columns and self.estimate_tokens(candidate) > self.preview_token_budget:
+                break
+            columns.append(column)
+            text = candidate
+            
+        return text.strip()
+        
+    @staticmethod
+    def compact_plan(plan: Dict) -> Dict:
+        """
+        Keep only the plan fields code generation needs.
+        
+        Args:
+            plan: Execution plan from the Planner Agent
+            
+        Returns:
+            Plan without reasoning, status and other bookkeeping
+        """
+        return {key: plan[key] for key in CODE_PLAN_KEYS if key in plan}
+        
+    def record(self, agent: str, prompt: str) -> str:
+        """
+        Record and log the size of a finished prompt.
+        
+        Args:
+            agent: Name of the prompt (e.g. "planner")
+            prompt: Prompt text
+            
+        Returns:
+            The prompt, unchanged
+        """
+        tokens = self.estimate_tokens(prompt)
+        
+        with self._lock:
+            self.prompts += 1
+            self.total_tokens += tokens
+            self.max_tokens = max(self.max_tokens, tokens)
+            count, total = self._by_agent.get(agent, (0, 0))
+            self._by_agent[agent] = (count + 1, total + tokens)
+            
+        metrics.record_prompt(agent, tokens)
+        logger.info("prompt=%s chars=%d est_tokens=%d", agent, len(prompt), tokens)
+        return prompt
+        
+    def get_stats(self) -> Dict:
+        """
+        Get prompt size statistics.
+        
+        Returns:
+            Dictionary with prompt size statistics
+        """
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "avg_tokens": round(self.total_tokens / self.prompts, 1) if self.prompts else 0.0,
+                "max_tokens": self.max_tokens,
+                "by_agent": {
+                    agent: {"prompts": count, "avg_tokens": round(total / count, 1)}
+                    for agent, (count, total) in self._by_agent.items()
+                }
+            }
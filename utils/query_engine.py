@@ -0,0 +1,413 @@
+"""
+Query engines for datasets larger than memory
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Rows of the converted file kept for the prompt preview and sample values
+PREVIEW_ROWS = 1000
+
+
+class QueryEngine(ABC):
+    """
+    Answers questions over a dataset stored as Parquet instead of an
+    in-memory DataFrame. Uploads are converted by the engine in a separate
+    interpreter, so the web process never starts the engine's thread pool;
+    generated code then queries the Parquet file from wherever it executes. Subclasses set the prompt
+    dialect and bind the names generated code uses.
+    """
+    
+    name = ""
+    module = ""
+    # Requirement line replacing "df is loaded dataframe" in code prompts
+    code_requirements = ""
+    
+    def __init__(
+        self,
+        memory_limit_mb: int = 512,
+        threads: int = 0,
+        spill_directory: Optional[str] = None,
+        max_result_rows: int = 1_000_000
+    ):
+        """
+        Initialize the Query Engine.
+        
+        Args:
+            memory_limit_mb: Memory a query may use before spilling to disk
+            threads: Worker threads per query (0 uses every core)
+            spill_directory: Folder for data spilled to disk
+            max_result_rows: Largest result generated code may pull into pandas
+        """
+        self.options = {
+            "memory_limit_mb": memory_limit_mb,
+            "threads": threads,
+            "spill_directory": spill_directory,
+            "max_result_rows": max_result_rows
+        }
+        self.memory_limit_mb = memory_limit_mb
+        self.threads = threads
+        self.spill_directory = spill_directory
+        self.max_result_rows = max_result_rows
+        self.conversions = 0
+        self.conversion_seconds = 0.0
+        self._lock = threading.Lock()
+        
+        if spill_directory:
+            os.makedirs(spill_directory, exist_ok=True)
+            
+    def __getstate__(self) -> Dict:
+        """
+        Pickle the settings only, for sandbox children; they start their own
+        counters, lock and connection.
+        """
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state.update(conversions=0, conversion_seconds=0.0)
+        return state
+        
+    def __setstate__(self, state: Dict):
+        """
+        Restore a pickled engine with a fresh lock.
+        """
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def is_available(cls) -> bool:
+        """
+        Check whether the engine's library is installed, without importing it.
+        """
+        return importlib.util.find_spec(cls.module) is not None
+        
+    def prepare(self, source_path: str, target_path: str) -> Dict:
+        """
+        Convert an uploaded CSV to Parquet and profile it, in a fresh interpreter.
+        
+        Args:
+            source_path: Uploaded CSV file
+            target_path: Parquet file to write
+            
+        Returns:
+            Profile in the build_profile format, plus "schema" and "engine"
+            
+        Raises:
+            RuntimeError: If the conversion fails
+        """
+        start = time.perf_counter()
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        completed = subprocess.run(
+            [sys.executable, "-m", "utils.query_engine", self.name,
+             json.dumps(self.options), source_path, target_path],
+            cwd=root,
+            capture_output=True,
+            text=True
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"{self.name} conversion failed")
+            
+        with self._lock:
+            self.conversions += 1
+            self.conversion_seconds += time.perf_counter() - start
+        return json.loads(completed.stdout)
+        
+    def convert(self, source_path: str, target_path: str) -> Dict:
+        """
+        Convert and profile in this process. Runs in the interpreter started by prepare.
+        
+        Args:
+            source_path: Uploaded CSV file
+            target_path: Parquet file to write, replaced atomically
+            
+        Returns:
+            Profile of the converted dataset
+        """
+        from .profiler import format_size
+        
+        temp_path = f"{target_path}.{os.getpid()}.tmp"
+        try:
+            self._write_parquet(source_path, temp_path)
+            os.replace(temp_path, target_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+                
+        stats = self._summarize(target_path)
+        preview = stats.pop("preview")
+        
+        columns = []
+        for col, dtype in stats["schema"].items():
+            sample_values = preview[col].dropna().unique()[:5].tolist() if col in preview else []
+            columns.append({
+                "name": col,
+                "type": dtype,
+                "null_count": stats["null_counts"][col],
+                # Approximate counts can overshoot the row count
+                "unique_count": min(stats["unique_counts"][col], stats["rows"]),
+                "memory_bytes": 0,
+                "sample_values": sample_values
+            })
+            
+        disk_bytes = os.path.getsize(target_path)
+        return {
+            "rows": stats["rows"],
+            "columns": len(columns),
+            "size": format_size(disk_bytes),
+            "memory_bytes": 0,
+            "disk_bytes": disk_bytes,
+            "column_details": columns,
+            "memory_usage": f"out of core ({self.name})",
+            "preview": preview.head(5).to_dict('records'),
+            "approximate": True,
+            "engine": self.name,
+            "schema": stats["schema"]
+        }
+        
+    @abstractmethod
+    def _write_parquet(self, source_path: str, target_path: str):
+        """
+        Stream a CSV into a Parquet file without loading it into memory.
+        """
+        
+    @abstractmethod
+    def _summarize(self, path: str) -> Dict:
+        """
+        Compute rows, schema, null and approximate distinct counts and a preview.
+        
+        Returns:
+            Dict with rows, schema, null_counts, unique_counts and preview (a
+            pandas DataFrame of the first rows)
+        """
+        
+    @abstractmethod
+    def bind(self, path: str) -> Dict[str, Any]:
+        """
+        Names generated code uses to query a dataset, bound in its namespace.
+        
+        Args:
+            path: Parquet file of the dataset
+            
+        Returns:
+            Mapping of names to objects
+        """
+        
+    def get_stats(self) -> Dict:
+        """
+        Get engine counters.
+        
+        Returns:
+            Dictionary with engine settings and conversion statistics
+        """
+        with self._lock:
+            return {
+                "engine": self.name,
+                "memory_limit_mb": self.memory_limit_mb,
+                "threads": self.threads,
+                "conversions": self.conversions,
+                "conversion_seconds": round(self.conversion_seconds, 4)
+            }
+
+
+class DuckDBEngine(QueryEngine):
+    """
+    Runs SQL written by the model on DuckDB: vectorized, multi-threaded and
+    spilling to disk past its memory limit. Each process opens its own
+    in-memory database; the dataset is the view "data" over the Parquet file.
+    """
+    
+    name = "duckdb"
+    module = "duckdb"
+    code_requirements = (
+        'The data is the DuckDB SQL table "data"; sql(query) runs a query and returns a pandas '
+        'DataFrame. Filter and aggregate in SQL and only fetch small results. Double-quote '
+        'column names. pd, np, px and go are imported'
+    )
+    
+    def __init__(self, *args, **kwargs):
+        """
+        Initialize the DuckDB engine; takes the QueryEngine arguments.
+        """
+        super().__init__(*args, **kwargs)
+        self._connection = None
+        self._connection_pid: Optional[int] = None
+        
+    def __getstate__(self) -> Dict:
+        """
+        Pickle the engine without its connection.
+        """
+        state = super().__getstate__()
+        state.update(_connection=None, _connection_pid=None)
+        return state
+        
+    def _connect(self):
+        """
+        Get this process's connection, opening it on first use.
+        """
+        if self._connection is None or self._connection_pid != os.getpid():
+            import duckdb
+            config = {"memory_limit": f"{self.memory_limit_mb}MB"}
+            if self.threads:
+                config["threads"] = self.threads
+            if self.spill_directory:
+                config["temp_directory"] = self.spill_directory
+            self._connection = duckdb.connect(":memory:", config=config)
+            self._connection_pid = os.getpid()
+        return self._connection
+        
+    @staticmethod
+    def _quote(path: str) -> str:
+        """
+        Quote a path as a SQL string literal.
+        """
+        return "'" + path.replace("'", "''") + "'"
+        
+    def _write_parquet(self, source_path: str, target_path: str):
+        """
+        Copy the CSV to Parquet with DuckDB's parallel CSV reader.
+        """
+        self._connect().execute(
+            f"COPY (SELECT * FROM read_csv({self._quote(source_path)})) "
+            f"TO {self._quote(target_path)} (FORMAT parquet, COMPRESSION zstd)"
+        )
+        
+    def _summarize(self, path: str) -> Dict:
+        """
+        Summarize the Parquet file with SUMMARIZE and a row count.
+        """
+        connection = self._connect()
+        source = f"read_parquet({self._quote(path)})"
+        summary = connection.execute(f"SUMMARIZE SELECT * FROM {source}").df()
+        rows = connection.execute(f"SELECT count(*) FROM {source}").fetchone()[0]
+        
+        return {
+            "rows": int(rows),
+            "schema": dict(zip(summary["column_name"], summary["column_type"])),
+            "null_counts": {
+                col: int(round(float(share) * rows / 100))
+                for col, share in zip(summary["column_name"], summary["null_percentage"])
+            },
+            "unique_counts": {
+                col: int(count) for col, count in zip(summary["column_name"], summary["approx_unique"])
+            },
+            "preview": connection.execute(f"SELECT * FROM {source} LIMIT {PREVIEW_ROWS}").df()
+        }
+        
+    def bind(self, path: str) -> Dict[str, Any]:
+        """
+        Bind sql(query), which runs DuckDB SQL over the view "data".
+        """
+        connection = self._connect()
+        view = f"CREATE TEMP VIEW data AS SELECT * FROM read_parquet({self._quote(path)})"
+        
+        def sql(query: str):
+            # A cursor per call: its own temp view, and safe across threads
+            cursor = connection.cursor()
+            try:
+                cursor.execute(view)
+                relation = cursor.sql(query)
+                if relation is None:
+                    return None
+                result = relation.limit(self.max_result_rows + 1).df()
+            finally:
+                cursor.close()
+                
+            if len(result) > self.max_result_rows:
+                raise ValueError(
+                    f"Query returned more than {self.max_result_rows} rows; "
+                    f"filter or aggregate in SQL instead"
+                )
+            return result
+            
+        return {"sql": sql}
+
+
+class PolarsEngine(QueryEngine):
+    """
+    Runs Polars lazy queries written by the model with the streaming
+    engine, which processes the Parquet file in batches across all cores.
+    """
+    
+    name = "polars"
+    module = "polars"
+    code_requirements = (
+        "lf is a Polars LazyFrame over the data and pl is imported; build the query on lf and "
+        "end it with .collect(engine='streaming').to_pandas(). Filter and aggregate in Polars "
+        "and only collect small results. pd, np, px and go are imported"
+    )
+    
+    def _configure(self):
+        """
+        Point Polars at the spill folder and thread count, then import it.
+        """
+        if self.spill_directory:
+            os.environ.setdefault("POLARS_TEMP_DIR", self.spill_directory)
+        if self.threads:
+            os.environ.setdefault("POLARS_MAX_THREADS", str(self.threads))
+        import polars
+        return polars
+        
+    def _write_parquet(self, source_path: str, target_path: str):
+        """
+        Stream the CSV to Parquet with a lazy scan and sink.
+        """
+        pl = self._configure()
+        pl.scan_csv(source_path, infer_schema_length=10_000, try_parse_dates=True).sink_parquet(
+            target_path, compression='zstd'
+        )
+        
+    def _summarize(self, path: str) -> Dict:
+        """
+        Count rows, nulls and approximate distinct values in one streaming pass.
+        """
+        pl = self._configure()
+        lf = pl.scan_parquet(path)
+        schema = lf.collect_schema()
+        counts = lf.select(
+            pl.len().alias("__rows"),
+            *[pl.col(col).null_count().alias(f"null:{col}") for col in schema.names()],
+            *[pl.col(col).approx_n_unique().alias(f"unique:{col}") for col in schema.names()]
+        ).collect(engine='streaming').row(0, named=True)
+        
+        return {
+            "rows": int(counts["__rows"]),
+            "schema": {col: str(dtype) for col, dtype in schema.items()},
+            "null_counts": {col: int(counts[f"null:{col}"]) for col in schema.names()},
+            "unique_counts": {col: int(counts[f"unique:{col}"]) for col in schema.names()},
+            "preview": lf.head(PREVIEW_ROWS).collect().to_pandas()
+        }
+        
+    def bind(self, path: str) -> Dict[str, Any]:
+        """
+        Bind pl and lf, a LazyFrame scanning the Parquet file.
+        """
+        pl = self._configure()
+        return {"pl": pl, "lf": pl.scan_parquet(path)}
+
+
+# Engines selectable by name through QUERY_ENGINE
+QUERY_ENGINES: Dict[str, Callable[..., QueryEngine]] = {
+    "duckdb": DuckDBEngine,
+    "polars": PolarsEngine,
+}
+
+
+def main():
+    """
+    Convert and profile one upload; run by QueryEngine.prepare.
+    Usage: python -m utils.query_engine <engine> <options json> <source> <target>
+    """
+    name, options, source_path, target_path = sys.argv[1:5]
+    engine = QUERY_ENGINES[name](**json.loads(options))
+    print(json.dumps(engine.convert(source_path, target_path), default=str))
+
+
+if __name__ == "__main__":
+    main()
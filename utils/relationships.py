@@ -0,0 +1,261 @@
+"""
+Relationships between the tables of a multi-table dataset
+"""
+
+from collections import deque
+from typing import Dict, List, Optional
+import re
+
+import pandas as pd
+
+# Dtypes whose columns can hold row keys; floats, dates and flags cannot
+KEY_DTYPE_KINDS = set("iuOSUT")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a table or column name for matching, e.g. "Customer ID" -> "customerid".
+    
+    Args:
+        name: Table or column name
+        
+    Returns:
+        Lowercased name without separators
+    """
+    return re.sub(r'[^0-9a-z]', '', str(name).lower())
+
+
+def make_table_name(name: str) -> str:
+    """
+    Turn a file or sheet name into a table name usable as a dict key in code.
+    
+    Args:
+        name: File name (the extension is dropped) or sheet name
+        
+    Returns:
+        Lowercase identifier, e.g. "Order Items.csv" -> "order_items"
+    """
+    stem = name.rsplit('.', 1)[0] if '.' in name else name
+    table_name = re.sub(r'[^0-9a-z]+', '_', stem.lower()).strip('_') or 'table'
+    if table_name[0].isdigit():
+        table_name = f"t_{table_name}"
+    return table_name
+
+
+def is_key_dtype(series: pd.Series) -> bool:
+    """
+    Check whether a column's dtype can hold row keys.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return dtype.kind in KEY_DTYPE_KINDS
+
+
+def parse_relationship(spec: str) -> Dict:
+    """
+    Parse a declared relationship such as "orders.customer_id = customers.id".
+    The left side holds the foreign key and the right side the key it refers to.
+    
+    Args:
+        spec: "table.column = table.column"
+        
+    Returns:
+        Relationship dict (from_table, from_column, to_table, to_column)
+        
+    Raises:
+        ValueError: If the spec is not of that form
+    """
+    sides = [side.strip() for side in spec.split('=')]
+    if len(sides) != 2 or not all('.' in side for side in sides):
+        raise ValueError(f"Relationships look like 'orders.customer_id = customers.id', got {spec!r}")
+        
+    (from_table, from_column), (to_table, to_column) = (side.split('.', 1) for side in sides)
+    return {
+        "from_table": from_table.strip(),
+        "from_column": from_column.strip(),
+        "to_table": to_table.strip(),
+        "to_column": to_column.strip()
+    }
+
+
+def describe_relationship(relationship: Dict) -> str:
+    """
+    Render a relationship for prompts, e.g. "orders.customer_id -> customers.id (many-to-one)".
+    """
+    text = (f"{relationship['from_table']}.{relationship['from_column']} -> "
+            f"{relationship['to_table']}.{relationship['to_column']}")
+    if relationship.get("kind"):
+        text += f" ({relationship['kind']})"
+    return text
+
+
+def infer_relationships(
+    tables: Dict[str, pd.DataFrame],
+    sample_size: int = 10_000,
+    min_coverage: float = 0.95
+) -> List[Dict]:
+    """
+    Find foreign keys between tables.
+    A column refers to a key of another table when the key is unique and
+    non-null, the names match ("customer_id" in orders with "customer_id" or
+    "id" in customers) and nearly all sampled values are found in the key.
+    
+    Args:
+        tables: Table name to DataFrame
+        sample_size: Distinct foreign key values checked per candidate
+        min_coverage: Share of sampled values that must exist in the key
+        
+    Returns:
+        Inferred relationships, at most one per pair of tables
+    """
+    keys = {
+        name: [
+            col for col in df.columns
+            if is_key_dtype(df[col]) and df[col].notna().all() and df[col].is_unique
+        ]
+        for name, df in tables.items()
+    }
+    
+    relationships = []
+    related_pairs = set()
+    for from_table, df in tables.items():
+        for from_column in df.columns:
+            if not is_key_dtype(df[from_column]):
+                continue
+                
+            from_name = normalize_name(from_column)
+            for to_table, to_df in tables.items():
+                pair = frozenset((from_table, to_table))
+                if to_table == from_table or pair in related_pairs:
+                    continue
+                    
+                for to_column in keys[to_table]:
+                    if not _names_match(from_name, from_column in keys[from_table], to_table, to_column):
+                        continue
+                        
+                    values = pd.Series(df[from_column].dropna().unique()[:sample_size])
+                    if not len(values):
+                        continue
+                    coverage = values.isin(to_df[to_column]).mean()
+                    if coverage < min_coverage:
+                        continue
+                        
+                    relationships.append({
+                        "from_table": from_table,
+                        "from_column": from_column,
+                        "to_table": to_table,
+                        "to_column": to_column,
+                        "kind": "one-to-one" if from_column in keys[from_table] else "many-to-one",
+                        "declared": False
+                    })
+                    related_pairs.add(pair)
+                    break
+                    
+    return relationships
+
+
+def _names_match(from_name: str, from_is_key: bool, to_table: str, to_column: str) -> bool:
+    """
+    Check whether a normalized column name can refer to a key column of a table.
+    """
+    to_name = normalize_name(to_column)
+    table = normalize_name(to_table)
+    singular = table[:-1] if table.endswith('s') else table
+    
+    if from_name == to_name:
+        # Two tables' own "id" columns are unrelated keys
+        return not (from_is_key and to_name == "id")
+    return from_name in (f"{table}{to_name}", f"{singular}{to_name}")
+
+
+def join_tables(
+    tables: Dict[str, pd.DataFrame],
+    relationships: List[Dict],
+    *names: str,
+    how: str = "left"
+) -> pd.DataFrame:
+    """
+    Merge the named tables, starting from the first, along the relationships.
+    Tables that are not named are only merged in when they sit on the path
+    between two named ones. Columns that clash with ones already merged are
+    suffixed with their table name, e.g. "name_customers".
+    
+    Args:
+        tables: Table name to DataFrame
+        relationships: Relationships between the tables
+        names: Tables to merge; the first one's rows drive a left join
+        how: Merge type passed to DataFrame.merge
+        
+    Returns:
+        The merged DataFrame
+        
+    Raises:
+        KeyError: If a table is unknown
+        ValueError: If a table is not connected to the others
+    """
+    unknown = [name for name in names if name not in tables]
+    if unknown or not names:
+        raise KeyError(f"Unknown tables {unknown}; available tables: {list(tables)}")
+        
+    merged = tables[names[0]]
+    # Name of each (table, column) in the merged frame
+    column_names = {(names[0], col): col for col in merged.columns}
+    joined = {names[0]}
+    
+    for name in names[1:]:
+        if name in joined:
+            continue
+            
+        path = _find_path(joined, name, relationships)
+        if path is None:
+            raise ValueError(f"No relationship connects table {name!r} to {sorted(joined)}")
+            
+        for relationship in path:
+            if relationship["from_table"] in joined:
+                left_table, left_column = relationship["from_table"], relationship["from_column"]
+                right_table, right_column = relationship["to_table"], relationship["to_column"]
+            else:
+                left_table, left_column = relationship["to_table"], relationship["to_column"]
+                right_table, right_column = relationship["from_table"], relationship["from_column"]
+                
+            right = tables[right_table]
+            left_on = column_names[(left_table, left_column)]
+            renames = {
+                col: f"{col}_{right_table}" for col in right.columns
+                if col in merged.columns and col != right_column
+            }
+            if right_column in merged.columns and right_column != left_on:
+                renames[right_column] = f"{right_column}_{right_table}"
+            right = right.rename(columns=renames)
+            right_on = renames.get(right_column, right_column)
+            
+            merged = merged.merge(right, how=how, left_on=left_on, right_on=right_on)
+            for col in tables[right_table].columns:
+                column_names[(right_table, col)] = renames.get(col, col)
+            joined.add(right_table)
+            
+    return merged
+
+
+def _find_path(joined: set, target: str, relationships: List[Dict]) -> Optional[List[Dict]]:
+    """
+    Find the shortest chain of relationships from any joined table to the target.
+    """
+    queue = deque((table, []) for table in joined)
+    seen = set(joined)
+    while queue:
+        table, path = queue.popleft()
+        if table == target:
+            return path
+        for relationship in relationships:
+            if relationship["from_table"] == table:
+                other = relationship["to_table"]
+            elif relationship["to_table"] == table:
+                other = relationship["from_table"]
+            else:
+                continue
+            if other not in seen:
+                seen.add(other)
+                queue.append((other, path + [relationship]))
+    return None
@@ -0,0 +1,307 @@
+"""
+Result Store for serving large query results in pages
+"""
+
+from typing import Dict, List, Optional
+import json
+import os
+import re
+import time
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+    feather = None
+    ipc = None
+
+RESULT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ResultStore:
+    """
+    Server-side store of large tabular results.
+    A result with more rows than one page is written once as an uncompressed
+    Arrow IPC file and only its first page travels with the chat response;
+    later pages are sliced from the memory-mapped file on request, so no
+    request ever serializes more than one page. Files carry no in-memory
+    index, which lets sandboxed child processes write them too; the oldest
+    are pruned once the store exceeds its file or byte limits or their TTL.
+    """
+    
+    def __init__(
+        self,
+        root: str,
+        page_rows: int = 500,
+        max_page_rows: int = 10_000,
+        max_results: int = 200,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: int = 3600
+    ):
+        """
+        Initialize the Result Store.
+        
+        Args:
+            root: Folder holding the result files
+            page_rows: Rows inlined in the chat response and served per page by default
+            max_page_rows: Largest page a client may request
+            max_results: Result files kept before the oldest are removed
+            max_bytes: Total size of result files kept
+            ttl_seconds: Age after which a result is removed
+        """
+        self.root = root
+        self.page_rows = page_rows
+        self.max_page_rows = max_page_rows
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.available = pa is not None
+        
+        if self.available:
+            os.makedirs(root, exist_ok=True)
+            
+    def path_for(self, result_id: str) -> str:
+        """
+        Get the Arrow file path of a result.
+        
+        Args:
+            result_id: Id returned by save
+            
+        Returns:
+            Path of the Arrow file
+        """
+        return os.path.join(self.root, f"{result_id}.arrow")
+        
+    def paginate(self, df: pd.DataFrame) -> Dict:
+        """
+        Prepare a DataFrame result for the response: small results are
+        returned whole, large ones are stored and only the first page returned.
+        
+        Args:
+            df: Query result
+            
+        Returns:
+            Dict with "result" (list of records) and "result_info" (None for
+            small results, else result_id, total_rows, page_rows and columns)
+        """
+        if len(df) <= self.page_rows:
+            return {"result": self._to_records(df), "result_info": None}
+            
+        # Index levels (e.g. group-by keys) become ordinary columns, so the
+        # inlined page and the stored pages have the same columns
+        if not isinstance(df.index, pd.RangeIndex):
+            df = df.reset_index()
+            
+        result_id = self.save(df)
+        
+        return {
+            "result": self._to_records(df.head(self.page_rows)),
+            "result_info": {
+                "result_id": result_id,
+                "total_rows": int(len(df)),
+                "page_rows": self.page_rows,
+                "columns": [str(col) for col in df.columns],
+                # Without pyarrow the rest of the result cannot be fetched
+                "truncated": result_id is None
+            }
+        }
+        
+    def save(self, df: pd.DataFrame) -> Optional[str]:
+        """
+        Write a result to the store.
+        
+        Args:
+            df: Query result
+            
+        Returns:
+            The result id, or None if the result could not be stored
+        """
+        if not self.available:
+            return None
+            
+        result_id = uuid.uuid4().hex
+        path = self.path_for(result_id)
+        temp_path = f"{path}.tmp"
+        
+        try:
+            table = pa.Table.from_pandas(df.rename(columns=str), preserve_index=False)
+            feather.write_feather(table, temp_path, compression='uncompressed')
+            os.replace(temp_path, path)
+            
+        except (OSError, TypeError, ValueError, pa.ArrowException):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+            
+        self._prune(keep=path)
+        return result_id
+        
+    def touch(self, result_id: str) -> bool:
+        """
+        Mark a result as used again, so pruning keeps it as long as a new one.
+        Cached answers call this before handing out their result id again.
+        
+        Args:
+            result_id: Id returned by save
+            
+        Returns:
+            True if the result still exists
+        """
+        if not self.available or not RESULT_ID_PATTERN.match(result_id or ""):
+            return False
+            
+        try:
+            os.utime(self.path_for(result_id))
+            return True
+        except OSError:
+            return False
+            
+    def read_page(self, result_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Read a page of a stored result as records.
+        
+        Args:
+            result_id: Id returned by save
+            offset: First row of the page
+            limit: Rows in the page (capped at max_page_rows)
+            
+        Returns:
+            Dict with rows, offset, limit, total_rows and columns, or None if
+            the result does not exist (or has expired)
+        """
+        table = self._open(result_id)
+        if table is None:
+            return None
+            
+        offset, limit = self._bounds(table.num_rows, offset, limit)
+        page = table.slice(offset, limit).to_pandas()
+        
+        return {
+            "rows": self._to_records(page),
+            "offset": offset,
+            "limit": limit,
+            "total_rows": table.num_rows,
+            "columns": table.column_names
+        }
+        
+    def read_arrow(
+        self,
+        result_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        compression: Optional[str] = None
+    ) -> Optional[bytes]:
+        """
+        Read a page of a stored result as an Arrow IPC stream.
+        
+        Args:
+            result_id: Id returned by save
+            offset: First row of the page
+            limit: Rows in the page (capped at max_page_rows)
+            compression: None, "lz4" or "zstd" buffer compression
+            
+        Returns:
+            Arrow IPC stream bytes, or None if the result does not exist
+        """
+        table = self._open(result_id)
+        if table is None:
+            return None
+            
+        offset, limit = self._bounds(table.num_rows, offset, limit)
+        page = table.slice(offset, limit)
+        
+        sink = pa.BufferOutputStream()
+        options = ipc.IpcWriteOptions(compression=compression)
+        with ipc.new_stream(sink, page.schema, options=options) as writer:
+            writer.write_table(page)
+            
+        return sink.getvalue().to_pybytes()
+        
+    def get_stats(self) -> Dict:
+        """
+        Get the number and size of stored results.
+        
+        Returns:
+            Dictionary with result store statistics
+        """
+        files = self._files()
+        return {
+            "enabled": self.available,
+            "results": len(files),
+            "bytes": sum(size for _, _, size in files),
+            "page_rows": self.page_rows
+        }
+        
+    def _open(self, result_id: str):
+        """
+        Memory-map a stored result, or return None if it is unknown.
+        """
+        if not self.available or not RESULT_ID_PATTERN.match(result_id or ""):
+            return None
+            
+        try:
+            return feather.read_table(self.path_for(result_id), memory_map=True)
+        except (OSError, pa.ArrowException):
+            return None
+            
+    def _bounds(self, total_rows: int, offset: int, limit: Optional[int]):
+        """
+        Clamp a requested page to the result and the page size limit.
+        """
+        offset = min(max(int(offset), 0), total_rows)
+        limit = self.page_rows if limit is None else min(max(int(limit), 0), self.max_page_rows)
+        return offset, min(limit, total_rows - offset)
+        
+    def _files(self) -> List:
+        """
+        List stored results as (path, modified time, size), oldest first.
+        """
+        files = []
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return files
+            
+        for entry in entries:
+            if not entry.name.endswith(".arrow"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((entry.path, stat.st_mtime, stat.st_size))
+            
+        files.sort(key=lambda item: item[1])
+        return files
+        
+    def _prune(self, keep: str):
+        """
+        Remove expired results, then the oldest ones beyond the limits.
+        """
+        files = self._files()
+        now = time.time()
+        total_bytes = sum(size for _, _, size in files)
+        remaining = len(files)
+        
+        for path, modified, size in files:
+            over_limit = remaining > self.max_results or total_bytes > self.max_bytes
+            if path == keep or not (over_limit or now - modified > self.ttl_seconds):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            remaining -= 1
+            total_bytes -= size
+            
+    @staticmethod
+    def _to_records(df: pd.DataFrame) -> List[Dict]:
+        """
+        Convert a frame to JSON-safe records (NaN becomes null, dates ISO strings).
+        """
+        return json.loads(df.to_json(orient='records', date_format='iso'))
@@ -0,0 +1,379 @@
+"""
+Session Manager for per-user datasets and conversation history
+"""
+
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+from collections import OrderedDict
+import secrets
+import threading
+import time
+
+from .context_manager import ContextManager
+from .session_store import SessionStore
+
+if TYPE_CHECKING:
+    from .data_manager import DataManager
+
+
+class Session:
+    """
+    State owned by a single analyst: dataset, conversation and executor.
+    """
+    
+    def __init__(
+        self,
+        session_id: str,
+        data_manager: "DataManager",
+        context_manager: ContextManager,
+        executor_agent=None
+    ):
+        """
+        Initialize a Session.
+        
+        Args:
+            session_id: Token identifying the session
+            data_manager: The session's dataset
+            context_manager: The session's conversation history
+            executor_agent: The session's Executor Agent, if an API key is configured
+        """
+        self.session_id = session_id
+        self.data_manager = data_manager
+        self.context_manager = context_manager
+        self.executor_agent = executor_agent
+        self.memory_bytes = 0
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        # Timestamp of the snapshot this process last wrote or read
+        self.synced_at = 0.0
+        # When this process last compared the session with the session store
+        self.checked_at = 0.0
+        
+    def update_memory(self) -> int:
+        """
+        Recompute the memory held by the session's dataset.
+        
+        Returns:
+            Memory usage in bytes
+        """
+        self.memory_bytes = self.data_manager.get_memory_bytes()
+        return self.memory_bytes
+        
+    def reload_executor(self):
+        """
+        Hand the session's tables to its Executor Agent after they changed.
+        """
+        if self.executor_agent is not None:
+            self.executor_agent.load_data(
+                self.data_manager.get_dataframe(),
+                self.data_manager.get_tables(),
+                self.data_manager.get_related_tables(),
+                self.data_manager.get_query_dataset(),
+                self.data_manager.get_stored_paths()
+            )
+            
+    def snapshot(self) -> Dict:
+        """
+        Capture the session for the session store.
+        Tables are referenced by fingerprint; their parsed copies are already
+        kept in the dataset store.
+        
+        Returns:
+            JSON-serializable snapshot
+        """
+        data_manager = self.data_manager
+        fingerprint = data_manager.current_fingerprint
+        return {
+            "session_id": self.session_id,
+            "updated_at": time.time(),
+            "created_at": self.created_at,
+            "last_active": self.last_active,
+            "dataset": {
+                "fingerprint": fingerprint,
+                "upload_fingerprint": data_manager.upload_fingerprint,
+                "filename": data_manager.current_filename,
+                "version": data_manager.get_fingerprint(),
+                "table": data_manager.current_table,
+                "tables": data_manager.get_table_manifest(),
+                "relationships": data_manager.declared_relationships
+            } if fingerprint else None,
+            "context": self.context_manager.snapshot()
+        }
+        
+    def restore(self, snapshot: Dict):
+        """
+        Bring the session to a snapshot's state, reopening its dataset if it changed.
+        
+        Args:
+            snapshot: Snapshot from the session store
+        """
+        dataset = snapshot.get("dataset")
+        if dataset is None:
+            self.data_manager.clear_data()
+        elif dataset.get("version", dataset["fingerprint"]) != self.data_manager.get_fingerprint():
+            opened = (
+                self.data_manager.open_dataset(
+                    dataset["fingerprint"], dataset["filename"], dataset.get("table"),
+                    dataset.get("upload_fingerprint")
+                )
+                and self.data_manager.open_tables(dataset.get("tables", []), dataset.get("relationships", []))
+            )
+            if not opened:
+                # Dataset no longer in the dataset store
+                self.data_manager.clear_data()
+                
+        self.reload_executor()
+        
+        self.context_manager.restore(snapshot.get("context", {}))
+        self.created_at = snapshot.get("created_at", self.created_at)
+        self.synced_at = snapshot["updated_at"]
+        self.update_memory()
+
+
+class SessionManager:
+    """
+    Registry of sessions keyed by session token.
+    Evicts sessions that have been idle too long and, when the datasets of
+    all sessions exceed the global memory cap, the least recently used ones.
+    Eviction only frees this worker's memory: the session stays in the
+    session store, and its next request restores it until the store's
+    retention expires it. remove drops a session everywhere.
+    """
+    
+    def __init__(
+        self,
+        upload_folder: str = "uploads",
+        data_manager_options: Optional[Dict] = None,
+        max_history: int = 5,
+        context_options: Optional[Dict] = None,
+        executor_factory: Optional[Callable] = None,
+        session_store: Optional[SessionStore] = None,
+        idle_timeout_seconds: int = 1800,
+        max_total_bytes: int = 512 * 1024 * 1024,
+        max_sessions: int = 100,
+        sync_interval_seconds: float = 2.0
+    ):
+        """
+        Initialize the Session Manager.
+        
+        Args:
+            upload_folder: Folder passed to each session's DataManager
+            data_manager_options: Extra keyword arguments for each DataManager
+            max_history: Conversation length kept by each ContextManager
+            context_options: Extra keyword arguments for each ContextManager
+            executor_factory: Callable returning a new ExecutorAgent, or None
+            session_store: Optional store that keeps sessions across worker restarts
+            idle_timeout_seconds: Seconds of inactivity before a session is evicted
+            max_total_bytes: Memory cap for the datasets of all sessions
+            max_sessions: Maximum number of live sessions
+            sync_interval_seconds: Shortest time between checks of a live
+                session against the session store
+        """
+        self.upload_folder = upload_folder
+        self.data_manager_options = data_manager_options or {}
+        self.max_history = max_history
+        self.context_options = context_options or {}
+        self.executor_factory = executor_factory
+        self.session_store = session_store
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_total_bytes = max_total_bytes
+        self.max_sessions = max_sessions
+        self.sync_interval_seconds = sync_interval_seconds
+        self.sessions: OrderedDict = OrderedDict()
+        self.evictions = 0
+        self.restored = 0
+        self.store_checks = 0
+        self._lock = threading.Lock()
+        
+    def _new_session(self, session_id: Optional[str] = None) -> Session:
+        """
+        Build an empty session.
+        
+        Args:
+            session_id: Token to reuse, or None for a new one
+            
+        Returns:
+            The new session
+        """
+        # Imported here so pandas loads with the first session, not at startup
+        from .data_manager import DataManager
+        
+        return Session(
+            session_id=session_id or secrets.token_urlsafe(16),
+            data_manager=DataManager(
+                upload_folder=self.upload_folder,
+                **self.data_manager_options
+            ),
+            context_manager=ContextManager(
+                max_history=self.max_history,
+                **self.context_options
+            ),
+            executor_agent=self.executor_factory() if self.executor_factory else None
+        )
+        
+    def get_or_create(self, session_id: Optional[str] = None) -> Session:
+        """
+        Get an existing session or start a new one.
+        With a session store, a token this worker does not know is restored
+        from the store, and a known session is refreshed if another worker
+        saved it since. Known sessions are checked at most once per sync
+        interval, so most requests never touch the store.
+        
+        Args:
+            session_id: Token sent by the client, if any
+            
+        Returns:
+            The live session for the token
+        """
+        with self._lock:
+            self._evict_idle()
+            session = self.sessions.get(session_id) if session_id else None
+            
+        # Restoring reads the dataset from disk, so it happens outside the lock
+        if session_id and self.session_store is not None and (
+                session is None or time.time() - session.checked_at >= self.sync_interval_seconds):
+            session = self._sync(session_id, session)
+            
+        with self._lock:
+            live = self.sessions.get(session.session_id) if session is not None else None
+            
+            if live is not None:
+                session = live
+            else:
+                if session is None:
+                    session = self._new_session()
+                self.sessions[session.session_id] = session
+                self._enforce_limits(keep=session.session_id)
+                
+            session.last_active = time.time()
+            self.sessions.move_to_end(session.session_id)
+            return session
+            
+    def _sync(self, session_id: str, session: Optional[Session]) -> Optional[Session]:
+        """
+        Restore or refresh a session from the session store if the stored
+        snapshot is newer than what this worker has.
+        
+        Args:
+            session_id: Token sent by the client
+            session: This worker's copy of the session, if any
+            
+        Returns:
+            The up-to-date session, or None if the token is unknown
+        """
+        with self._lock:
+            self.store_checks += 1
+            
+        if session is not None:
+            session.checked_at = time.time()
+            
+        stored_at = self.session_store.updated_at(session_id)
+        if stored_at is None or (session is not None and stored_at <= session.synced_at):
+            return session
+            
+        snapshot = self.session_store.load(session_id)
+        if snapshot is None:
+            return session
+            
+        if session is None:
+            session = self._new_session(session_id)
+            session.checked_at = time.time()
+            with self._lock:
+                self.restored += 1
+                
+        session.restore(snapshot)
+        return session
+        
+    def persist(self, session: Session):
+        """
+        Queue a snapshot of a session for the session store.
+        Writing happens in the background, so this is cheap on the request path.
+        
+        Args:
+            session: Session whose dataset or conversation changed
+        """
+        if self.session_store is None:
+            return
+            
+        snapshot = session.snapshot()
+        session.synced_at = snapshot["updated_at"]
+        self.session_store.save(snapshot)
+        
+    def update_memory(self, session: Session):
+        """
+        Re-account a session's memory after its dataset changed.
+        
+        Args:
+            session: Session whose dataset was loaded or cleared
+        """
+        session.update_memory()
+        
+        with self._lock:
+            self._enforce_limits(keep=session.session_id)
+            
+    def remove(self, session_id: str):
+        """
+        Drop a session and its dataset on purpose, from this worker and from
+        the session store, so no worker restores it.
+        
+        Args:
+            session_id: Token of the session to drop
+        """
+        with self._lock:
+            self.sessions.pop(session_id, None)
+            
+        if self.session_store is not None:
+            self.session_store.delete(session_id)
+            
+    def get_stats(self) -> Dict:
+        """
+        Get session counts and memory accounting.
+        
+        Returns:
+            Dictionary with session statistics
+        """
+        with self._lock:
+            return {
+                "active_sessions": len(self.sessions),
+                "memory_bytes": self._total_bytes(),
+                "max_total_bytes": self.max_total_bytes,
+                "evictions": self.evictions,
+                "restored": self.restored,
+                "store_checks": self.store_checks,
+                "store": self.session_store.get_stats() if self.session_store else {"enabled": False}
+            }
+            
+    def _total_bytes(self) -> int:
+        """
+        Sum the dataset memory of all sessions. Caller must hold the lock.
+        """
+        return sum(session.memory_bytes for session in self.sessions.values())
+        
+    def _evict_idle(self):
+        """
+        Drop sessions idle for longer than the timeout. Caller must hold the lock.
+        """
+        cutoff = time.time() - self.idle_timeout_seconds
+        idle_ids = [
+            session_id for session_id, session in self.sessions.items()
+            if session.last_active < cutoff
+        ]
+        for session_id in idle_ids:
+            del self.sessions[session_id]
+            self.evictions += 1
+            
+    def _enforce_limits(self, keep: str):
+        """
+        Evict least recently used sessions until the session count and memory
+        cap are respected. The session being served is never evicted.
+        Caller must hold the lock.
+        """
+        while (len(self.sessions) > self.max_sessions or
+               self._total_bytes() > self.max_total_bytes):
+            victim_id = next(
+                (session_id for session_id in self.sessions if session_id != keep),
+                None
+            )
+            if victim_id is None:
+                break
+            del self.sessions[victim_id]
+            self.evictions += 1
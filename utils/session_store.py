@@ -0,0 +1,375 @@
+"""
+Session Store for keeping sessions across worker restarts
+"""
+
+from typing import Dict, Iterable, List, Optional
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBackend:
+    """
+    Where session snapshots are kept. Subclasses store JSON-serializable
+    snapshot dicts keyed by session id and must be safe to share between
+    worker processes.
+    """
+    
+    def write_many(self, snapshots: List[Dict]):
+        """
+        Insert or replace snapshots; an older snapshot never replaces a newer one.
+        
+        Args:
+            snapshots: Snapshots with "session_id" and "updated_at" keys
+        """
+        raise NotImplementedError
+        
+    def delete_many(self, session_ids: Iterable[str]):
+        """
+        Delete the snapshots of sessions.
+        
+        Args:
+            session_ids: Sessions to delete
+        """
+        raise NotImplementedError
+        
+    def read(self, session_id: str) -> Optional[Dict]:
+        """
+        Read a snapshot.
+        
+        Args:
+            session_id: Session to read
+            
+        Returns:
+            The snapshot, or None
+        """
+        raise NotImplementedError
+        
+    def updated_at(self, session_id: str) -> Optional[float]:
+        """
+        Get when a snapshot was last written, without reading it.
+        
+        Args:
+            session_id: Session to look up
+            
+        Returns:
+            Snapshot timestamp, or None if there is no snapshot
+        """
+        raise NotImplementedError
+        
+    def prune(self, before: float) -> int:
+        """
+        Delete snapshots not written since a time.
+        
+        Args:
+            before: Unix timestamp
+            
+        Returns:
+            Number of snapshots deleted
+        """
+        raise NotImplementedError
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Keeps snapshots in one SQLite table. WAL mode lets every worker read
+    while one writes; each process opens its own connection.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize the SQLite backend.
+        
+        Args:
+            path: Database file, created if missing
+        """
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this process's connection, opening it on first use. Caller must hold the lock.
+        """
+        if self._connection is None or self._connection_pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, "
+                "updated_at REAL NOT NULL, "
+                "data TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+            connection.commit()
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+        
+    def write_many(self, snapshots: List[Dict]):
+        """
+        Insert or replace snapshots in one transaction.
+        """
+        rows = [
+            (snapshot["session_id"], snapshot["updated_at"], json.dumps(snapshot, default=str))
+            for snapshot in snapshots
+        ]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT INTO sessions (session_id, updated_at, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET "
+                    "updated_at = excluded.updated_at, data = excluded.data "
+                    "WHERE excluded.updated_at >= sessions.updated_at",
+                    rows
+                )
+                
+    def delete_many(self, session_ids: Iterable[str]):
+        """
+        Delete the snapshots of sessions.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "DELETE FROM sessions WHERE session_id = ?",
+                    [(session_id,) for session_id in session_ids]
+                )
+                
+    def read(self, session_id: str) -> Optional[Dict]:
+        """
+        Read a snapshot.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+        
+    def updated_at(self, session_id: str) -> Optional[float]:
+        """
+        Get when a snapshot was last written.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+        
+    def prune(self, before: float) -> int:
+        """
+        Delete snapshots not written since a time.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute(
+                    "DELETE FROM sessions WHERE updated_at < ?", (before,)
+                ).rowcount
+
+
+# Backends selectable by name through SESSION_STORE_BACKEND
+SESSION_BACKENDS = {
+    "sqlite": SQLiteSessionBackend,
+}
+
+
+class SessionStore:
+    """
+    Persists session snapshots through a backend without blocking requests.
+    save() only records the snapshot in memory; a background thread writes
+    pending snapshots in batches, keeping only the latest per session, so
+    chat latency never includes database I/O. Reads see this process's
+    pending writes first. Pending snapshots are flushed at exit.
+    """
+    
+    def __init__(
+        self,
+        backend: SessionBackend,
+        flush_interval_seconds: float = 0.5,
+        max_batch: int = 200,
+        retention_seconds: int = 7 * 86400
+    ):
+        """
+        Initialize the Session Store.
+        
+        Args:
+            backend: Where snapshots are kept
+            flush_interval_seconds: Longest a snapshot waits before it is written
+            max_batch: Pending snapshots that trigger an early flush
+            retention_seconds: Snapshots not updated for this long are deleted
+        """
+        self.backend = backend
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch = max_batch
+        self.retention_seconds = retention_seconds
+        # Latest pending snapshot per session; None marks a pending delete
+        self._pending: Dict[str, Optional[Dict]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer_pid: Optional[int] = None
+        self._last_prune = 0.0
+        self.saves = 0
+        self.writes = 0
+        self.batches = 0
+        self.loads = 0
+        self.errors = 0
+        atexit.register(self.flush)
+        
+    def _ensure_writer(self):
+        """
+        Start the writer thread in this process if it is not running. Caller must hold the lock.
+        """
+        if self._writer_pid != os.getpid():
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._run_writer, name="session-store-writer", daemon=True).start()
+            
+    def _run_writer(self):
+        """
+        Write pending snapshots every flush interval, or sooner when a batch fills up.
+        """
+        while True:
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+            
+    def save(self, snapshot: Dict):
+        """
+        Queue a snapshot for writing.
+        
+        Args:
+            snapshot: Snapshot with "session_id" and "updated_at" keys
+        """
+        with self._lock:
+            self._pending[snapshot["session_id"]] = snapshot
+            self.saves += 1
+            self._ensure_writer()
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+                
+    def delete(self, session_id: str):
+        """
+        Queue the deletion of a session's snapshot.
+        
+        Args:
+            session_id: Session to delete
+        """
+        with self._lock:
+            self._pending[session_id] = None
+            self._ensure_writer()
+            
+    def load(self, session_id: str) -> Optional[Dict]:
+        """
+        Read a session's latest snapshot.
+        
+        Args:
+            session_id: Session to read
+            
+        Returns:
+            The snapshot, or None if the session is unknown or deleted
+        """
+        with self._lock:
+            if session_id in self._pending:
+                return self._pending[session_id]
+                
+        try:
+            snapshot = self.backend.read(session_id)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Could not read session %s: %s", session_id, e)
+            return None
+            
+        if snapshot is not None:
+            self.loads += 1
+        return snapshot
+        
+    def updated_at(self, session_id: str) -> Optional[float]:
+        """
+        Get the timestamp of a session's latest snapshot.
+        Used to notice that another worker has changed the session.
+        
+        Args:
+            session_id: Session to look up
+            
+        Returns:
+            Snapshot timestamp, or None if there is no snapshot
+        """
+        with self._lock:
+            if session_id in self._pending:
+                pending = self._pending[session_id]
+                return pending["updated_at"] if pending else None
+                
+        try:
+            return self.backend.updated_at(session_id)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Could not look up session %s: %s", session_id, e)
+            return None
+            
+    def flush(self):
+        """
+        Write all pending snapshots and deletions now.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                
+            if pending:
+                snapshots = [snapshot for snapshot in pending.values() if snapshot is not None]
+                deleted = [session_id for session_id, snapshot in pending.items() if snapshot is None]
+                try:
+                    if snapshots:
+                        self.backend.write_many(snapshots)
+                    if deleted:
+                        self.backend.delete_many(deleted)
+                    self.writes += len(pending)
+                    self.batches += 1
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning("Could not write %d sessions: %s", len(pending), e)
+                    # Retry with the next batch unless a newer change has been queued since
+                    with self._lock:
+                        for session_id, snapshot in pending.items():
+                            self._pending.setdefault(session_id, snapshot)
+                            
+            now = time.time()
+            if now - self._last_prune > min(self.retention_seconds, 3600):
+                self._last_prune = now
+                try:
+                    self.backend.prune(now - self.retention_seconds)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning("Could not prune sessions: %s", e)
+                    
+    def get_stats(self) -> Dict:
+        """
+        Get store counters.
+        
+        Returns:
+            Dictionary with store statistics
+        """
+        with self._lock:
+            return {
+                "enabled": True,
+                "backend": type(self.backend).__name__,
+                "pending": len(self._pending),
+                "saves": self.saves,
+                "writes": self.writes,
+                "batches": self.batches,
+                "loads": self.loads,
+                "errors": self.errors
+            }
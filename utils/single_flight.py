@@ -0,0 +1,112 @@
+"""
+Single-flight coalescing of identical in-flight requests
+"""
+
+from typing import Any, Dict, Hashable, Optional, Tuple
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """
+    Lets concurrent identical requests share one in-progress computation.
+    The first caller for a key becomes the leader and does the work; callers
+    arriving before it finishes wait for the leader's value instead of
+    repeating the work. Unlike a cache, nothing is kept once the leader is done.
+    All callers must run on the same event loop.
+    """
+    
+    def __init__(self, wait_timeout_seconds: float = 120.0):
+        """
+        Initialize the single-flight group.
+        
+        Args:
+            wait_timeout_seconds: Longest a follower waits before giving up on the leader
+        """
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        
+    def join(self, key: Hashable) -> Tuple[bool, asyncio.Future]:
+        """
+        Join the flight for a key, starting one if none is in progress.
+        
+        Args:
+            key: Identity of the request
+            
+        Returns:
+            Tuple of (True if the caller is the leader, the flight's future)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.done():
+                return False, flight
+                
+            flight = asyncio.get_running_loop().create_future()
+            self._flights[key] = flight
+            self.leaders += 1
+            return True, flight
+            
+    async def wait(self, flight: asyncio.Future) -> Optional[Any]:
+        """
+        Wait for the leader of a flight.
+        
+        Args:
+            flight: Future returned by join
+            
+        Returns:
+            The leader's value, or None if the leader failed or timed out
+        """
+        try:
+            # Shield so one follower giving up does not cancel the flight for the rest
+            value = await asyncio.wait_for(asyncio.shield(flight), self.wait_timeout_seconds)
+        except asyncio.TimeoutError:
+            value = None
+            
+        with self._lock:
+            if value is None:
+                self.abandoned += 1
+            else:
+                self.coalesced += 1
+        return value
+        
+    def finish(self, key: Hashable, value: Optional[Any]):
+        """
+        End the flight for a key and hand its value to the waiting followers.
+        
+        Args:
+            key: Identity of the request
+            value: Result to share, or None if the leader failed
+        """
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            
+        if flight is not None:
+            # Thread-safe in case the leader is finalized off the loop thread
+            flight.get_loop().call_soon_threadsafe(self._resolve, flight, value)
+            
+    @staticmethod
+    def _resolve(flight: asyncio.Future, value: Optional[Any]):
+        """
+        Set the flight's result unless it is already done.
+        """
+        if not flight.done():
+            flight.set_result(value)
+            
+    def get_stats(self) -> Dict:
+        """
+        Get coalescing counters.
+        
+        Returns:
+            Dictionary with single-flight statistics
+        """
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "abandoned": self.abandoned
+            }